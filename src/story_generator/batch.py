@@ -0,0 +1,282 @@
+"""Batch story generation from a JSONL file of requests.
+
+Each input line is a JSON object such as:
+    {"id": "subscriber-42", "prompt": "a dragon who is afraid of the dark", "age": 6, "genre": "FANTASY"}
+
+Finished stories are appended to the output JSONL as soon as they complete.
+The output file doubles as the checkpoint: when a run is restarted, requests
+whose id already appears in the output are skipped, so finished stories are
+never paid for twice. Failed requests go to a separate errors file and are
+retried on the next run.
+
+Usage:
+    python -m src.story_generator.batch requests.jsonl stories.jsonl --workers 50
+
+With --prejudge, stories that local checks find clearly below the quality
+thresholds are revised without a judge call, and a calibration report of the
+local estimates against the judge's scores is printed at the end; once it shows
+the estimates track the judge, --trust-prejudge also approves clearly good
+stories without one. With --plan-library plans.sqlite3, outlines for repeated
+requests are reused across runs instead of being planned again. --archive also saves every story with its
+per-revision scores, tokens, and latency to an indexed SQLite archive. Adding
+--dedup DIR (with --archive) serves near-duplicates of approved requests
+straight from the archive and reuses the plans of looser matches. With
+--speculative, paragraphs are checked as stories stream and drafts that open
+with clearly upsetting content are cut short and rewritten.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from typing import Dict, Iterator, Optional, Set, Tuple
+from .core.pipeline import StoryPipeline, StoryRequest, StoryResult
+from .core.planner import validate_plan
+from .core.prejudge import PreJudge
+from .utils.plan_library import PlanLibrary
+from .utils.story_archive import StoryArchive
+from .utils.near_duplicates import NearDuplicateIndex
+from .config.metrics import DEFAULT_METRICS_STORAGE
+from .utils.llm_utils import initialize_async_openai_client
+from .utils.http_client import ClientInitializationError, aclose_async_client
+from .utils.instrumentation import format_profile, llm_context
+from .utils.rate_limiter import PRIORITY_BATCH
+
+DEFAULT_WORKERS = 20
+
+def read_requests(path: str) -> Iterator[Tuple[str, StoryRequest]]:
+    """Stream (id, request) pairs from a JSONL file without loading it all."""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+                request_id = str(record.get("id", f"line-{line_number}"))
+                yield request_id, StoryRequest(
+                    request=record["prompt"],
+                    age=int(record["age"]),
+                    genre=record.get("genre")
+                )
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"⚠️ Skipping invalid request on line {line_number}: {e}")
+
+def load_completed_ids(path: str) -> Set[str]:
+    """Return the ids of stories already written to the output file."""
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                completed.add(json.loads(line)["id"])
+            except (ValueError, KeyError):
+                # A crash can leave a truncated last line; that story is redone
+                continue
+    return completed
+
+def result_to_record(request_id: str, result: StoryResult) -> Dict:
+    """Convert a pipeline result into a JSON-serializable record."""
+    record = {
+        "id": request_id,
+        "prompt": result.request.request,
+        "age": result.request.age,
+        "genre": result.request.genre,
+    }
+    if result.error:
+        record["error"] = result.error
+        return record
+    record.update({
+        "plan": result.plan,
+        "story": result.story,
+        "scores": result.metrics.as_dict(),
+        "overall_score": result.metrics.overall_score,
+        "feedback": result.feedback,
+        "judgment": result.judgment,
+        "revisions": result.revisions,
+    })
+    if result.duplicate_of:
+        record["duplicate_of"] = result.duplicate_of
+    return record
+
+def _trim_partial_line(path: str):
+    """Cut off a last line a crash left unfinished, so the next record starts on a line of its own."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b"\n":
+            return
+        # Search backwards for the end of the last complete line
+        position = end
+        while position > 0:
+            start = max(0, position - 4096)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b"\n")
+            if newline >= 0:
+                position = start + newline + 1
+                break
+            position = start
+        f.truncate(position)
+    print(f"⚠️ Dropped an unfinished last line from {path}; that story will be redone.")
+
+def _append_record(f, record: Dict):
+    """Append one record and make sure it reaches disk before moving on.
+
+    Blocking; run_batch calls it in a worker thread, one writer per file at a time.
+    """
+    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+async def run_batch(
+    input_path: str,
+    output_path: str,
+    errors_path: str,
+    workers: int = DEFAULT_WORKERS,
+    profile: bool = False,
+    prejudge: Optional[PreJudge] = None,
+    plan_library: Optional[PlanLibrary] = None,
+    archive: Optional[StoryArchive] = None,
+    dedup: Optional[NearDuplicateIndex] = None,
+    speculative: bool = False
+) -> Tuple[int, int, int]:
+    """Run every pending request in the input file through the pipeline.
+
+    Returns the number of stories written, failed, and skipped as already done.
+    """
+    for path in (output_path, errors_path):
+        _trim_partial_line(path)
+    completed = load_completed_ids(output_path)
+    pipeline = StoryPipeline(
+        initialize_async_openai_client(),
+        max_concurrency=workers,
+        prejudge=prejudge,
+        plan_library=plan_library,
+        archive=archive,
+        dedup=dedup,
+        speculative=speculative
+    )
+    queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+    counts = {"written": 0, "failed": 0, "skipped": 0}
+    out_lock, errors_lock = asyncio.Lock(), asyncio.Lock()
+
+    with open(output_path, "a", encoding="utf-8") as out, \
+            open(errors_path, "a", encoding="utf-8") as errors:
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    queue.task_done()
+                    return
+                request_id, story_request = item
+                try:
+                    # Interactive sessions sharing the process are served first
+                    with llm_context(priority=PRIORITY_BATCH):
+                        result = await pipeline.run(story_request)
+                except Exception as e:
+                    result = StoryResult(request=story_request, error=str(e))
+                record = result_to_record(request_id, result)
+                # The write and fsync happen in a thread so other stories keep streaming
+                if result.error:
+                    async with errors_lock:
+                        await asyncio.to_thread(_append_record, errors, record)
+                    counts["failed"] += 1
+                    print(f"❌ {request_id}: {result.error}")
+                else:
+                    async with out_lock:
+                        await asyncio.to_thread(_append_record, out, record)
+                    counts["written"] += 1
+                    print(f"✅ {request_id} ({counts['written']} done)")
+                if profile:
+                    print(format_profile(result.spans))
+                queue.task_done()
+
+        tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+
+        # Feed the bounded queue lazily so huge inputs never sit in memory
+        for request_id, story_request in read_requests(input_path):
+            if request_id in completed:
+                counts["skipped"] += 1
+                continue
+            completed.add(request_id)
+            await queue.put((request_id, story_request))
+
+        for _ in tasks:
+            await queue.put(None)
+        await asyncio.gather(*tasks)
+
+    await aclose_async_client()
+
+    return counts["written"], counts["failed"], counts["skipped"]
+
+def main():
+    """Command-line entry point for batch generation."""
+    parser = argparse.ArgumentParser(description="Generate bedtime stories from a JSONL file of requests.")
+    parser.add_argument("input", help="JSONL file with one request per line")
+    parser.add_argument("output", help="JSONL file finished stories are appended to")
+    parser.add_argument("--errors", help="JSONL file for failed requests (default: <output>.errors.jsonl)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Number of stories generated at once (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print a latency, token, and cost breakdown for each story")
+    parser.add_argument("--prejudge", action="store_true",
+                        help="Revise clearly weak stories without a judge call and report calibration")
+    parser.add_argument("--trust-prejudge", action="store_true",
+                        help="With --prejudge, also skip the judge for clearly good stories (calibrate first)")
+    parser.add_argument("--plan-library", metavar="PATH",
+                        help="SQLite file of outlines reused for repeated requests")
+    parser.add_argument("--archive", nargs="?", const=DEFAULT_METRICS_STORAGE, metavar="PATH",
+                        help=f"Also save stories and scores to a SQLite archive (default: {DEFAULT_METRICS_STORAGE})")
+    parser.add_argument("--speculative", action="store_true",
+                        help="Check paragraphs while stories stream and cut short clearly upsetting drafts")
+    parser.add_argument("--dedup", metavar="DIR",
+                        help="Near-duplicate index directory; serves repeat requests from the archive")
+    args = parser.parse_args()
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.dedup and not args.archive:
+        parser.error("--dedup needs --archive")
+    if args.trust_prejudge and not args.prejudge:
+        parser.error("--trust-prejudge needs --prejudge")
+    errors_path = args.errors or f"{os.path.splitext(args.output)[0]}.errors.jsonl"
+    prejudge = PreJudge(trust_accepts=args.trust_prejudge) if args.prejudge else None
+    plan_library = PlanLibrary(args.plan_library, validator=validate_plan) if args.plan_library else None
+    archive = StoryArchive(args.archive) if args.archive else None
+    dedup = NearDuplicateIndex(args.dedup) if args.dedup else None
+
+    try:
+        written, failed, skipped = asyncio.run(
+            run_batch(args.input, args.output, errors_path, workers=args.workers, profile=args.profile,
+                      prejudge=prejudge, plan_library=plan_library, archive=archive, dedup=dedup,
+                      speculative=args.speculative)
+        )
+    except ClientInitializationError as e:
+        print(f"❌ {e}")
+        return
+    finally:
+        if archive is not None:
+            archive.close()
+        if plan_library is not None:
+            plan_library.close()
+        if dedup is not None:
+            dedup.compact()
+            dedup.close()
+    print(f"\n🌙 Batch complete: {written} stories written, {failed} failed, {skipped} already done.")
+    if prejudge is not None:
+        print("\n📏 Pre-judge calibration (stories the judge also scored):")
+        print(prejudge.calibration.format())
+    if plan_library is not None:
+        stats = plan_library.get_stats()
+        print(f"\n📚 Plan library: {stats['hits']} reused, {stats['misses']} planned, hit rate {stats['hit_rate']:.0%}")
+    if dedup is not None:
+        print(f"\n🔁 Near-duplicates: {dedup.report()}")
+
+if __name__ == "__main__":
+    main()
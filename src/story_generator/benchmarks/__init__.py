@@ -0,0 +1,9 @@
+"""Offline benchmarks for the story pipeline.
+
+A deterministic mock LLM replays recorded plan, story, and judge responses
+with configurable latency and failure rates, so throughput and regressions
+can be measured without spending API money.
+"""
+
+from .mock_llm import MockLLM, MockOpenAI, MockAsyncOpenAI, MockAPIError, LatencyModel
+from .scenarios import BenchmarkResult, run_scenario, SCENARIOS
@@ -0,0 +1,83 @@
+"""Run the offline benchmark suite.
+
+Usage:
+    python -m src.story_generator.benchmarks --scenarios pipeline,main --concurrency 1,10,100 --stories 200
+"""
+
+import argparse
+import json
+from .mock_llm import MockLLM, LatencyModel
+from .scenarios import run_scenario, SCENARIOS
+from ..utils.llm_utils import configure_response_cache
+from ..utils.rate_limiter import set_rate_limits
+from ..config.settings import MODEL_NAME
+
+# Budgets used when none are given: effectively unlimited, so the mock's latency is measured
+UNLIMITED_PER_MINUTE = 1e12
+
+def _int_list(value: str):
+    return [int(item) for item in value.split(",") if item]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the story pipeline against a mock LLM.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated scenarios to run (default: {','.join(SCENARIOS)})")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 10, 50],
+                        help="Comma-separated concurrency levels (default: 1,10,50)")
+    parser.add_argument("--stories", type=int, default=50, help="Stories per scenario and level")
+    parser.add_argument("--latency", type=float, default=0.2, help="Median seconds to first token")
+    parser.add_argument("--seconds-per-token", type=float, default=0.001)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--unsafe-rate", type=float, default=0.0,
+                        help="Share of stories that trip the safety filter")
+    parser.add_argument("--revision-rate", type=float, default=0.0,
+                        help="Share of judge passes that ask for a revision")
+    parser.add_argument("--distress-rate", type=float, default=0.0,
+                        help="Share of stories that open with an upsetting (but not forbidden) paragraph")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rpm", type=float, default=UNLIMITED_PER_MINUTE,
+                        help="Requests-per-minute budget for the rate limiter (default: unlimited)")
+    parser.add_argument("--tpm", type=float, default=UNLIMITED_PER_MINUTE,
+                        help="Tokens-per-minute budget for the rate limiter (default: unlimited)")
+    parser.add_argument("--candidates", type=int, default=1,
+                        help="Best-of-N candidates per story in the pipeline and main scenarios")
+    parser.add_argument("--speculative", action="store_true",
+                        help="Judge paragraphs while stories stream in the pipeline scenario")
+    parser.add_argument("--cache", action="store_true", help="Keep the response cache enabled")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines")
+    args = parser.parse_args()
+
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    if not args.cache:
+        configure_response_cache(memory_entries=0)
+    set_rate_limits(MODEL_NAME, args.rpm, args.tpm)
+
+    if not args.json:
+        print(f"{'scenario':<10} {'conc':>5} {'stories/s':>10} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} "
+              f"{'tokens':>7} {'errors':>6} {'local cpu ms':>13}")
+    for scenario in scenarios:
+        for concurrency in args.concurrency:
+            llm = MockLLM(
+                latency=LatencyModel(median_seconds=args.latency, seconds_per_token=args.seconds_per_token),
+                failure_rate=args.failure_rate,
+                rate_limit_rate=args.rate_limit_rate,
+                unsafe_story_rate=args.unsafe_rate,
+                revision_rate=args.revision_rate,
+                distress_rate=args.distress_rate,
+                seed=args.seed
+            )
+            result = run_scenario(scenario, llm, concurrency, args.stories, args.candidates, args.speculative)
+            if args.json:
+                print(json.dumps(result.as_dict()))
+                continue
+            print(f"{scenario:<10} {concurrency:>5} {result.stories_per_second:>10.2f} "
+                  f"{result.percentile(0.5):>7.3f} {result.percentile(0.95):>7.3f} "
+                  f"{result.percentile(0.99):>7.3f} {result.tokens_per_story:>7.0f} "
+                  f"{result.errors:>6} {sum(result.local_cpu.values()) * 1000:>13.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Recorded model responses replayed by the mock LLM."""
+
+import json
+
+PLAN = {
+    "title": "Pip and the Night Lights",
+    "characters": {
+        "main": {
+            "name": "Pip",
+            "description": "A small green dragon who sleeps in a cozy cave",
+            "emotional_journey": "From feeling afraid of the dark to feeling safe and proud"
+        },
+        "supporting": [
+            {"name": "Mo", "role": "A wise old owl who helps Pip"},
+            {"name": "Lulu", "role": "A firefly who shares her light"}
+        ]
+    },
+    "plot_outline": {
+        "setup": "Pip cannot fall asleep because the cave is so dark",
+        "challenge": "Pip must walk to the pond at night to find Mo",
+        "resolution": "Lulu and her friends light the path and Pip sees the dark is full of friends",
+        "ending": "Pip curls up by the pond and falls asleep under the stars"
+    },
+    "theme": {
+        "main_message": "The dark is calm and full of friends",
+        "teaching_moments": ["Asking for help is brave", "New things can feel less scary when we look closely"]
+    },
+    "engagement_elements": ["Counting the fireflies", "Guessing the night sounds"],
+    "vocabulary": {
+        "new_words": [
+            {"word": "glimmer", "context": "The fireflies glimmer on the path"},
+            {"word": "hush", "context": "The forest is in a soft hush at night"}
+        ]
+    },
+    "cognitive_elements": ["Noticing how light changes what we see", "Remembering the order of the path"]
+}
+
+STORY = """Once upon a time, in a cozy cave by a quiet pond, there lived a small green dragon named Pip.
+Pip loved warm days, soft moss, and big round pebbles. But when the sun went down, Pip did not like the dark at all.
+
+One night Pip could not sleep. "Mo will know what to do," Pip said. Mo was a wise old owl who lived by the pond.
+Pip took a deep breath and stepped out of the cave. The path was dark, and Pip felt very small.
+
+Then a tiny light began to glimmer. "Hello," said a firefly. "I am Lulu. Do you need some help?"
+"Yes please," said Pip. "I want to find Mo, but it is so dark."
+Lulu smiled and called her friends. One, two, three, four, five little lights came to help.
+
+Together they walked down the path. Pip heard a soft sound. "What is that?" Pip asked.
+"That is a frog singing," said Lulu. Pip listened. The song was slow and calm.
+Pip heard the wind in the leaves and the water by the pond. The forest was in a soft hush.
+
+At the pond, Mo was waiting. "Hello, Pip," said Mo. "You were brave to come out at night."
+"I was not brave," said Pip. "I asked for help."
+Mo laughed kindly. "Asking for help is one of the bravest things of all."
+
+Pip looked up. The sky was full of stars, and the fireflies danced over the water.
+The dark did not feel empty now. It was full of friends.
+
+Pip curled up on the warm moss by the pond. Lulu glowed softly, and Mo hummed a sleepy tune.
+Pip yawned a big dragon yawn and closed both eyes. Good night, Pip. Good night, friends."""
+
+# A story that trips the forbidden content filter, used to exercise the fallback path
+UNSAFE_STORY = STORY.replace("a frog singing", "a ghost with a knife")
+
+# A story whose opening is upsetting without naming a forbidden topic, used to exercise speculative judging
+DISTRESSING_LINE = "Pip was terrified of the dark. Pip screamed and screamed, trapped and alone, in panic and pain."
+DISTRESSING_STORY = STORY.replace("Pip did not like the dark at all.", DISTRESSING_LINE, 1)
+
+JUDGE = {
+    "scores": {
+        "character_relatability": 0.86,
+        "plot_structure": 0.84,
+        "moral_lesson_clarity": 0.9,
+        "engagement_level": 0.8,
+        "language_development": 0.78,
+        "cognitive_elements": 0.72,
+        "age_appropriate_vocabulary": 0.9,
+        "attention_span_fit": 0.85,
+        "emotional_safety": 0.96,
+        "originality": 0.7,
+        "imagination": 0.8,
+        "surprise_factor": 0.62,
+        "world_building": 0.74,
+        "character_uniqueness": 0.76
+    },
+    "feedback": [
+        "Add one more playful moment with the fireflies",
+        "Describe the pond with one more sensory detail"
+    ],
+    "judgment": "APPROVED"
+}
+
+# Same evaluation with a failing emotional safety score, used to exercise revisions
+JUDGE_NEEDS_REVISION = {
+    **JUDGE,
+    "scores": {**JUDGE["scores"], "emotional_safety": 0.7},
+    "judgment": "NEEDS_REVISION"
+}
+
+PLAN_RESPONSE = "```json\n" + json.dumps(PLAN, indent=2) + "\n```"
+JUDGE_RESPONSE = json.dumps(JUDGE, indent=2)
+JUDGE_NEEDS_REVISION_RESPONSE = json.dumps(JUDGE_NEEDS_REVISION, indent=2)
+
+# A revision that rewrites one paragraph of STORY
+PATCH = {"edits": [{"paragraph": 2, "text": STORY.split("\n\n")[1].replace("Pip", "Little Pip", 1)}]}
+PATCH_RESPONSE = json.dumps(PATCH, indent=2)
+
+REQUESTS = [
+    ("a dragon who is afraid of the dark", 6),
+    ("a bunny who learns to share", 5),
+    ("a robot who wants to paint the sky", 8),
+    ("a lost kitten finding its way home", 7),
+    ("two friends building a treehouse", 9),
+    ("a turtle who wins a race by helping others", 10),
+]
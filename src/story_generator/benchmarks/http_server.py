@@ -0,0 +1,145 @@
+"""Local HTTP stand-in for the OpenAI chat completions endpoint.
+
+Point a real client at it to benchmark the full network path without cost:
+    OpenAI(api_key="mock", base_url="http://127.0.0.1:8089/v1")
+
+Usage:
+    python -m src.story_generator.benchmarks.http_server --port 8089 --failure-rate 0.01
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .mock_llm import MockLLM, MockAPIError, LatencyModel, _split_chunks
+
+def _make_handler(llm: MockLLM):
+    class MockCompletionsHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass  # Keep benchmark output clean
+
+        def _send_json(self, status: int, body: dict, headers: dict = None):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _send_event(self, body) -> None:
+            data = body if isinstance(body, str) else json.dumps(body)
+            self.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "Not found"}})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            try:
+                text, prompt_tokens, completion_tokens, first_token, generation = llm.prepare(
+                    request.get("messages", []), request.get("max_tokens") or 1000
+                )
+            except MockAPIError as e:
+                headers = {"Retry-After": str(e.retry_after)} if e.retry_after is not None else {}
+                self._send_json(e.status_code, {"error": {"message": str(e), "type": "mock_error"}}, headers)
+                return
+
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            model = request.get("model", "mock")
+            created = int(time.time())
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+
+            if not request.get("stream"):
+                time.sleep(first_token + generation)
+                self._send_json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": usage
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            chunks = _split_chunks(text)
+            time.sleep(first_token)
+            try:
+                for piece in chunks:
+                    time.sleep(generation / len(chunks))
+                    self._send_event({
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+                    })
+                if (request.get("stream_options") or {}).get("include_usage"):
+                    self._send_event({
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [],
+                        "usage": usage
+                    })
+                self._send_event("[DONE]")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Client cancelled the stream
+            self.close_connection = True
+
+    return MockCompletionsHandler
+
+def start_mock_server(llm: MockLLM = None, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the mock endpoint on a background thread; port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), _make_handler(llm or MockLLM()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a mock OpenAI chat completions endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.4, help="Median seconds to first token")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    llm = MockLLM(
+        latency=LatencyModel(median_seconds=args.latency),
+        failure_rate=args.failure_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed
+    )
+    server = ThreadingHTTPServer((args.host, args.port), _make_handler(llm))
+    server.daemon_threads = True
+    print(f"Mock LLM listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Deterministic stand-in for the OpenAI chat completions API.
+
+MockLLM replays the recorded responses in fixtures.py, choosing the planner,
+judge, repair, or story response from the system prompt. It sleeps for a
+latency drawn from a seeded log-normal distribution plus a per-token cost,
+and fails at configurable rates. MockOpenAI and MockAsyncOpenAI expose it
+through the same client.chat.completions.create() surface the agents use,
+including streaming.
+"""
+
+import asyncio
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Dict, List, Tuple
+from . import fixtures
+from ..utils.prompt_builder import count_tokens
+
+class MockAPIError(Exception):
+    """Simulated API failure carrying an HTTP status code like the real client's errors."""
+
+    def __init__(self, message: str, status_code: int, retry_after: float = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(status_code=status_code, headers=headers)
+
+@dataclass
+class LatencyModel:
+    median_seconds: float = 0.4  # Time to first token, median
+    sigma: float = 0.5  # Log-normal spread of the time to first token
+    seconds_per_token: float = 0.004  # Generation speed
+
+    def sample(self, rng: random.Random, completion_tokens: int) -> Tuple[float, float]:
+        """Return (time to first token, time spent generating) for one call."""
+        first_token = self.median_seconds * math.exp(rng.gauss(0.0, self.sigma))
+        return first_token, completion_tokens * self.seconds_per_token
+
+class MockLLM:
+    def __init__(
+        self,
+        latency: LatencyModel = None,
+        failure_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        unsafe_story_rate: float = 0.0,
+        revision_rate: float = 0.0,
+        distress_rate: float = 0.0,
+        seed: int = 0
+    ):
+        self.latency = latency or LatencyModel()
+        self.failure_rate = failure_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.unsafe_story_rate = unsafe_story_rate
+        self.revision_rate = revision_rate
+        self.distress_rate = distress_rate
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._calls = 0
+        self.stats = {"calls": 0, "failures": 0, "rate_limited": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def _next_rng(self) -> random.Random:
+        """Give each call its own generator so results depend only on the seed and call order."""
+        with self._lock:
+            self._calls += 1
+            return random.Random(self.seed * 1_000_003 + self._calls)
+
+    def _pick_response(self, messages: List[Dict], rng: random.Random) -> str:
+        system = messages[0]["content"] if messages else ""
+        user = messages[-1]["content"] if messages else ""
+        if "story planner" in system:
+            return fixtures.PLAN_RESPONSE
+        if "story judge" in system:
+            if rng.random() < self.revision_rate or fixtures.DISTRESSING_LINE in user:
+                return fixtures.JUDGE_NEEDS_REVISION_RESPONSE
+            return fixtures.JUDGE_RESPONSE
+        if "story editor" in system:
+            return fixtures.PATCH_RESPONSE
+        if "malformed JSON" in system:
+            return fixtures.JUDGE_RESPONSE if '"scores"' in user else fixtures.PLAN_RESPONSE
+        if rng.random() < self.unsafe_story_rate:
+            return fixtures.UNSAFE_STORY
+        # A writer told which paragraph upset the reader takes the hint
+        if rng.random() < self.distress_rate and "too upsetting" not in user:
+            return fixtures.DISTRESSING_STORY
+        return fixtures.STORY
+
+    def prepare(self, messages: List[Dict], max_tokens: int) -> Tuple[str, int, int, float, float]:
+        """Choose a response and its timing, or raise a simulated failure.
+
+        Returns (text, prompt tokens, completion tokens, first-token delay, generation time).
+        """
+        rng = self._next_rng()
+        prompt_tokens = sum(count_tokens(message["content"]) for message in messages)
+        roll = rng.random()
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["prompt_tokens"] += prompt_tokens
+        if roll < self.rate_limit_rate:
+            with self._lock:
+                self.stats["rate_limited"] += 1
+            raise MockAPIError("Rate limit reached (simulated)", 429, retry_after=round(rng.uniform(0.05, 0.5), 2))
+        if roll < self.rate_limit_rate + self.failure_rate:
+            with self._lock:
+                self.stats["failures"] += 1
+            raise MockAPIError("Internal server error (simulated)", 500)
+
+        text = self._pick_response(messages, rng)
+        completion_tokens = count_tokens(text)
+        if completion_tokens > max_tokens:
+            # Truncate roughly where the real model would stop
+            text = text[:int(len(text) * max_tokens / completion_tokens)]
+            completion_tokens = max_tokens
+        with self._lock:
+            self.stats["completion_tokens"] += completion_tokens
+        first_token, generation = self.latency.sample(rng, completion_tokens)
+        return text, prompt_tokens, completion_tokens, first_token, generation
+
+def _split_chunks(text: str, size: int = 16) -> List[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+def _completion(text: str, prompt_tokens: int, completion_tokens: int):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text), finish_reason="stop")],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    )
+
+def _chunk(text: str):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+
+def _usage_chunk(prompt_tokens: int, completion_tokens: int):
+    return SimpleNamespace(
+        choices=[],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    )
+
+class _MockStream:
+    def __init__(self, text: str, prompt_tokens: int, completion_tokens: int, first_token: float, generation: float):
+        self.chunks = _split_chunks(text)
+        self.usage = (prompt_tokens, completion_tokens)
+        self.first_token = first_token
+        self.per_chunk = generation / len(self.chunks)
+        self.closed = False
+
+    def __iter__(self):
+        time.sleep(self.first_token)
+        for text in self.chunks:
+            if self.closed:
+                return
+            time.sleep(self.per_chunk)
+            yield _chunk(text)
+        yield _usage_chunk(*self.usage)
+
+    async def __aiter__(self):
+        await asyncio.sleep(self.first_token)
+        for text in self.chunks:
+            if self.closed:
+                return
+            await asyncio.sleep(self.per_chunk)
+            yield _chunk(text)
+        yield _usage_chunk(*self.usage)
+
+    def close(self):
+        self.closed = True
+
+class _AsyncMockStream(_MockStream):
+    async def close(self):
+        self.closed = True
+
+class _Completions:
+    def __init__(self, llm: MockLLM):
+        self.llm = llm
+
+    def create(self, model: str, messages: List[Dict], max_tokens: int = 1000,
+               temperature: float = 1.0, stream: bool = False, **kwargs):
+        text, prompt_tokens, completion_tokens, first_token, generation = self.llm.prepare(messages, max_tokens)
+        if stream:
+            return _MockStream(text, prompt_tokens, completion_tokens, first_token, generation)
+        time.sleep(first_token + generation)
+        return _completion(text, prompt_tokens, completion_tokens)
+
+class _AsyncCompletions(_Completions):
+    async def create(self, model: str, messages: List[Dict], max_tokens: int = 1000,
+                     temperature: float = 1.0, stream: bool = False, **kwargs):
+        text, prompt_tokens, completion_tokens, first_token, generation = self.llm.prepare(messages, max_tokens)
+        if stream:
+            return _AsyncMockStream(text, prompt_tokens, completion_tokens, first_token, generation)
+        await asyncio.sleep(first_token + generation)
+        return _completion(text, prompt_tokens, completion_tokens)
+
+class MockOpenAI:
+    """Drop-in replacement for openai.OpenAI backed by a MockLLM."""
+
+    def __init__(self, llm: MockLLM = None):
+        self.llm = llm or MockLLM()
+        self.chat = SimpleNamespace(completions=_Completions(self.llm))
+
+class MockAsyncOpenAI:
+    """Drop-in replacement for openai.AsyncOpenAI backed by a MockLLM."""
+
+    def __init__(self, llm: MockLLM = None):
+        self.llm = llm or MockLLM()
+        self.chat = SimpleNamespace(completions=_AsyncCompletions(self.llm))
@@ -0,0 +1,252 @@
+"""Benchmark scenarios driving the agents and pipeline against the mock LLM."""
+
+import asyncio
+import builtins
+import importlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, redirect_stdout
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+from . import fixtures
+from .mock_llm import MockLLM, MockOpenAI, MockAsyncOpenAI
+from ..core import generator as generator_module
+from ..core import judge as judge_module
+from ..core.planner import AsyncStoryPlanner
+from ..core.generator import AsyncStoryGenerator, StoryGenerator, StreamingSafetyCheck
+from ..core.judge import AsyncStoryJudge
+from ..core.speculative import SpeculativeEvaluator
+from ..core.pipeline import StoryPipeline, StoryRequest
+from ..utils import response_parser
+from ..utils.instrumentation import profile_story
+
+# The package re-exports main(), which hides the main module behind the function
+main_module = importlib.import_module("..main", __package__)
+
+@dataclass
+class BenchmarkResult:
+    scenario: str
+    concurrency: int
+    stories: int
+    errors: int
+    wall_seconds: float
+    latencies: List[float] = field(default_factory=list)
+    tokens: List[int] = field(default_factory=list)
+    local_cpu: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def stories_per_second(self) -> float:
+        return (self.stories - self.errors) / self.wall_seconds if self.wall_seconds else 0.0
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def tokens_per_story(self) -> float:
+        return sum(self.tokens) / len(self.tokens) if self.tokens else 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            "scenario": self.scenario,
+            "concurrency": self.concurrency,
+            "stories": self.stories,
+            "errors": self.errors,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "stories_per_second": round(self.stories_per_second, 2),
+            "p50_seconds": round(self.percentile(0.50), 3),
+            "p95_seconds": round(self.percentile(0.95), 3),
+            "p99_seconds": round(self.percentile(0.99), 3),
+            "tokens_per_story": round(self.tokens_per_story, 1),
+            "local_cpu_seconds": {name: round(value, 4) for name, value in self.local_cpu.items()},
+        }
+
+class LocalCpuMeter:
+    """Measures CPU time spent in local filtering, parsing, and prompt building.
+
+    Wraps the relevant functions for the duration of a run; nested wrapped calls
+    are only counted once, by the outermost one.
+    """
+
+    TARGETS = [
+        (StoryGenerator, "_contains_forbidden_content", "filtering"),
+        (StoryGenerator, "_is_age_appropriate", "filtering"),
+        (StreamingSafetyCheck, "feed", "filtering"),
+        (StreamingSafetyCheck, "finish", "filtering"),
+        (SpeculativeEvaluator, "feed_chunk", "filtering"),
+        (response_parser, "parse_json_response", "parsing"),
+        (generator_module, "assemble_prompt", "prompting"),
+        (judge_module, "assemble_prompt", "prompting"),
+    ]
+
+    def __init__(self):
+        self.totals: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _wrap(self, func: Callable, category: str) -> Callable:
+        meter = self
+
+        def timed(*args, **kwargs):
+            if getattr(meter._local, "active", False):
+                return func(*args, **kwargs)
+            meter._local.active = True
+            start = time.thread_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.thread_time() - start
+                meter._local.active = False
+                with meter._lock:
+                    meter.totals[category] = meter.totals.get(category, 0.0) + elapsed
+        return timed
+
+    @contextmanager
+    def installed(self):
+        originals = [(owner, name, getattr(owner, name)) for owner, name, _ in self.TARGETS]
+        for owner, name, category in self.TARGETS:
+            setattr(owner, name, self._wrap(getattr(owner, name), category))
+        try:
+            yield self
+        finally:
+            for owner, name, original in originals:
+                setattr(owner, name, original)
+
+def _request(index: int):
+    return fixtures.REQUESTS[index % len(fixtures.REQUESTS)]
+
+async def _run_async(
+    scenario: str,
+    unit: Callable,
+    llm: MockLLM,
+    concurrency: int,
+    stories: int
+) -> BenchmarkResult:
+    semaphore = asyncio.Semaphore(concurrency)
+    result = BenchmarkResult(scenario, concurrency, stories, errors=0, wall_seconds=0.0)
+
+    async def timed_unit(index: int):
+        async with semaphore:
+            with profile_story() as spans:
+                start = time.perf_counter()
+                try:
+                    await unit(index)
+                except Exception:
+                    result.errors += 1
+                    return
+                result.latencies.append(time.perf_counter() - start)
+            result.tokens.append(sum(span.prompt_tokens + span.completion_tokens for span in spans))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed_unit(index) for index in range(stories)))
+    result.wall_seconds = time.perf_counter() - start
+    return result
+
+def run_agent_scenario(
+    scenario: str,
+    llm: MockLLM,
+    concurrency: int,
+    stories: int,
+    candidates: int = 1,
+    speculative: bool = False
+) -> BenchmarkResult:
+    """Benchmark one agent ("planner", "generator", "judge") or the full "pipeline"."""
+    client = MockAsyncOpenAI(llm)
+    planner = AsyncStoryPlanner(client)
+    generator = AsyncStoryGenerator(client)
+    pipeline = StoryPipeline(client, max_concurrency=concurrency, candidates=candidates, speculative=speculative)
+
+    async def planner_unit(index: int):
+        request, age = _request(index)
+        await planner.create_outline(request, age)
+
+    async def generator_unit(index: int):
+        request, age = _request(index)
+        await generator.generate_story(request, age, fixtures.PLAN)
+
+    async def judge_unit(index: int):
+        _, age = _request(index)
+        await AsyncStoryJudge(client).evaluate_story(fixtures.STORY, age)
+
+    async def pipeline_unit(index: int):
+        request, age = _request(index)
+        story_result = await pipeline.run(StoryRequest(request, age))
+        if story_result.error:
+            raise RuntimeError(story_result.error)
+
+    units = {
+        "planner": planner_unit,
+        "generator": generator_unit,
+        "judge": judge_unit,
+        "pipeline": pipeline_unit,
+    }
+    return asyncio.run(_run_async(scenario, units[scenario], llm, concurrency, stories))
+
+@contextmanager
+def _scripted_cli(llm: MockLLM):
+    """Run main's interactive session unattended against the mock client."""
+    original_input = builtins.input
+    original_client = main_module.initialize_openai_client
+    request, age = fixtures.REQUESTS[0]
+    builtins.input = lambda prompt="": str(age) if "age" in prompt.lower() else request
+    main_module.initialize_openai_client = lambda: MockOpenAI(llm)
+    try:
+        yield
+    finally:
+        builtins.input = original_input
+        main_module.initialize_openai_client = original_client
+
+def run_main_scenario(llm: MockLLM, concurrency: int, stories: int, candidates: int = 1) -> BenchmarkResult:
+    """Benchmark the synchronous main() flow, one session per worker thread."""
+    result = BenchmarkResult("main", concurrency, stories, errors=0, wall_seconds=0.0)
+    lock = threading.Lock()
+
+    def session(_):
+        with profile_story() as spans:
+            start = time.perf_counter()
+            try:
+                main_module.run_story_session(candidates=candidates)
+            except Exception:
+                with lock:
+                    result.errors += 1
+                return
+            elapsed = time.perf_counter() - start
+        with lock:
+            result.latencies.append(elapsed)
+            result.tokens.append(sum(span.prompt_tokens + span.completion_tokens for span in spans))
+
+    with _scripted_cli(llm):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(session, range(stories)))
+        result.wall_seconds = time.perf_counter() - start
+    return result
+
+def run_scenario(
+    scenario: str,
+    llm: MockLLM,
+    concurrency: int,
+    stories: int,
+    candidates: int = 1,
+    speculative: bool = False
+) -> BenchmarkResult:
+    """Run a scenario while measuring CPU time spent in local processing.
+
+    candidates > 1 runs the pipeline and main scenarios in best-of-N mode;
+    speculative turns on per-paragraph judging in the pipeline scenario.
+    """
+    meter = LocalCpuMeter()
+    # Agents report progress with print(); keep it out of the benchmark output
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull), meter.installed():
+        if scenario == "main":
+            result = run_main_scenario(llm, concurrency, stories, candidates)
+        else:
+            result = run_agent_scenario(scenario, llm, concurrency, stories, candidates, speculative)
+    result.local_cpu = dict(meter.totals)
+    return result
+
+SCENARIOS = ("planner", "generator", "judge", "pipeline", "main")
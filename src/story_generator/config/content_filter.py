@@ -1,29 +1,64 @@
 """Content filtering configuration for story generation."""
 
-# Topics that are strictly forbidden in children's stories
+# Topics that are strictly forbidden in children's stories. Keywords match whole
+# words plus the suffixes in utils.keyword_matcher.INFLECTION_SUFFIXES ("killed",
+# "cruelest", "meanness"); other forms are listed explicitly. A keyword ending in
+# "*" is a stem and also matches compounds ("blood*" catches "bloodshed").
 FORBIDDEN_TOPICS = {
     "SUBSTANCES": {
         "keywords": ["drugs", "alcohol", "smoking", "marijuana", "cigarettes", "weed", "tobacco"],
         "reason": "Substance use is not appropriate for children's stories"
     },
     "VIOLENCE": {
-        "keywords": ["kill", "murder", "blood", "weapon", "gun", "knife", "death", "fighting"],
+        "keywords": [
+            "kill", "killing",
+            "murder", "murdering", "murderous",
+            "blood*",
+            "weapon*",
+            "gun*",
+            "knife*", "knives",
+            "death",
+            "fighting"
+        ],
         "reason": "Violence can be traumatic for young readers"
     },
     "ADULT_CONTENT": {
-        "keywords": ["sex", "romance", "dating", "kissing", "relationship", "love story"],
+        "keywords": ["sex*", "romance", "dating", "kissing", "relationship", "love story"],
         "reason": "Adult relationships are not appropriate for children's stories"
     },
     "SCARY_CONTENT": {
-        "keywords": ["horror", "ghost", "monster", "nightmare", "scary", "terror", "demon", "evil"],
+        "keywords": [
+            "horror", "ghost", "monster", "monstrous", "nightmare", "scary",
+            "terror*", "demon", "demonic", "evil"
+        ],
         "reason": "Frightening content can cause anxiety in children"
     },
     "INAPPROPRIATE_BEHAVIOR": {
-        "keywords": ["stealing", "lying", "cheating", "bullying", "mean", "cruel"],
+        "keywords": ["stealing", "lying", "cheating", "bullying", "mean", "cruel", "cruelty"],
         "reason": "Negative behaviors should not be glorified"
     }
 }
 
+# Harmless words that a stem or suffix above would otherwise flag
+ALLOWED_WORDS = [
+    "bloodhound", "bloodhounds", "gunny", "gunnysack", "gunnysacks", "gunwale", "gunwales",
+    "sextant", "sextants", "sextet", "sextets", "sexton", "weeded", "weeder", "weeders"
+]
+
+# Distressing words that are allowed but lower a passage's emotional safety, by weight
+DISTRESS_WORDS = {
+    "terrified": 0.08, "screamed": 0.08, "screaming": 0.08, "panic": 0.07, "trapped": 0.06,
+    "hurt": 0.05, "pain": 0.05, "sobbing": 0.05, "sobbed": 0.05, "danger": 0.04, "dangerous": 0.04,
+    "frightened": 0.04, "shouted": 0.03, "angry": 0.03, "crying": 0.03, "scared": 0.03,
+    "afraid": 0.02, "alone": 0.02, "lost": 0.02, "shadows": 0.01, "darkness": 0.01
+}
+
+# Reassuring words; each offsets some distress in the same passage
+COMFORT_WORDS = [
+    "safe", "hug", "hugged", "cozy", "warm", "gentle", "calm", "smiled", "laughed", "together",
+    "snuggled", "comforted", "brave", "kind", "friend", "home", "sleepy", "soft"
+]
+
 # Age-appropriate theme guidelines
 AGE_GUIDELINES = {
     5: {
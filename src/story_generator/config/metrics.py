@@ -1,7 +1,11 @@
 """Configuration for story evaluation metrics and specifications."""
 
+import importlib.util
+import os
+from array import array
 from dataclasses import dataclass
-from typing import Dict, List
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
 from .genres import STORY_GENRES
 
 @dataclass
@@ -12,49 +16,115 @@ class CreativityMetrics:
     world_building: float  # Richness of the story's setting and atmosphere
     character_uniqueness: float  # How distinctive and memorable characters are
 
-@dataclass
-class StoryMetrics:
+# Fixed order of the metrics, used as the storage and column index for scores
+METRIC_NAMES = (
     # Core story components
-    character_relatability: float
-    plot_structure: float
-    moral_lesson_clarity: float
-    engagement_level: float
-    language_development: float
-    cognitive_elements: float
-    age_appropriate_vocabulary: float
-    attention_span_fit: float
-    emotional_safety: float
-    
+    'character_relatability',
+    'plot_structure',
+    'moral_lesson_clarity',
+    'engagement_level',
+    'language_development',
+    'cognitive_elements',
+    'age_appropriate_vocabulary',
+    'attention_span_fit',
+    'emotional_safety',
     # Creativity components
-    originality: float
-    imagination: float
-    surprise_factor: float
-    world_building: float
-    character_uniqueness: float
+    'originality',
+    'imagination',
+    'surprise_factor',
+    'world_building',
+    'character_uniqueness'
+)
+_METRIC_INDEX = {metric: index for index, metric in enumerate(METRIC_NAMES)}
+
+class StoryMetrics:
+    """Scores of one story, packed into a double array in METRIC_NAMES order.
+
+    Built like a dataclass, StoryMetrics(character_relatability=0.8, ...),
+    and each metric reads as an attribute, but an instance is one small
+    array plus a weights reference instead of a dict of float objects.
+    """
+
+    __slots__ = ("_values", "_weights")
+
+    def __init__(self, *values: float, **scores: float):
+        if len(values) > len(METRIC_NAMES):
+            raise TypeError(f"StoryMetrics takes at most {len(METRIC_NAMES)} scores")
+        merged = dict(zip(METRIC_NAMES, values))
+        for metric, value in scores.items():
+            if metric not in _METRIC_INDEX or metric in merged:
+                raise TypeError(f"Unexpected or repeated metric: {metric}")
+            merged[metric] = value
+        missing = [metric for metric in METRIC_NAMES if metric not in merged]
+        if missing:
+            raise TypeError(f"Missing metrics: {', '.join(missing)}")
+        self._values = array("d", (float(merged[metric]) for metric in METRIC_NAMES))
+        # Genre weights the story was scored against; None means the base weights
+        self._weights: Optional["GenreWeights"] = None
+
+    def as_dict(self) -> Dict[str, float]:
+        """Return metric -> score in METRIC_NAMES order."""
+        return dict(zip(METRIC_NAMES, self._values))
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, StoryMetrics):
+            return NotImplemented
+        return self._values == other._values
+
+    def __getstate__(self):
+        # Weight tables are rebuilt from the registry rather than pickled
+        return self._values, self._weights.genre if self._weights else None, self._weights is not None
+
+    def __setstate__(self, state):
+        self._values, genre, scored = state
+        self._weights = weight_table(genre) if scored else None
+
+    def __repr__(self) -> str:
+        scores = ", ".join(f"{metric}={value}" for metric, value in self.as_dict().items())
+        return f"StoryMetrics({scores})"
+
+    @property
+    def weights(self) -> "GenreWeights":
+        return self._weights or weight_table()
+
+    def scored_for(self, genre: Optional[str]) -> "StoryMetrics":
+        """Score this story against a genre's weights from now on; returns self."""
+        self._weights = weight_table(genre)
+        return self
 
     @property
     def overall_score(self) -> float:
-        """Calculate overall score using weights from config."""
-        return sum(
-            getattr(self, metric) * weight 
-            for metric, weight in METRIC_WEIGHTS.items()
-        )
+        """Calculate overall score using the weights of the story's genre."""
+        return sum(value * weight for value, weight in zip(self._values, self.weights.vector))
 
     @property
     def creativity_score(self) -> float:
         """Calculate creativity-specific score."""
-        creativity_metrics = {
-            'originality': 0.25,
-            'imagination': 0.25,
-            'surprise_factor': 0.2,
-            'world_building': 0.15,
-            'character_uniqueness': 0.15
-        }
         return sum(
-            getattr(self, metric) * weight 
-            for metric, weight in creativity_metrics.items()
+            self._values[_METRIC_INDEX[metric]] * weight 
+            for metric, weight in CREATIVITY_WEIGHTS.items()
         )
 
+def _metric_property(index: int) -> property:
+    def get(self) -> float:
+        return self._values[index]
+
+    def set(self, value: float):
+        self._values[index] = value
+    return property(get, set)
+
+for _index, _metric in enumerate(METRIC_NAMES):
+    setattr(StoryMetrics, _metric, _metric_property(_index))
+
+# Weights of the creativity-specific score
+CREATIVITY_WEIGHTS = {
+    'originality': 0.25,
+    'imagination': 0.25,
+    'surprise_factor': 0.2,
+    'world_building': 0.15,
+    'character_uniqueness': 0.15
+}
+
 # Base weights for different components in overall score calculation
 BASE_METRIC_WEIGHTS = {
     'character_relatability': 0.11,
@@ -165,27 +235,99 @@ BASE_QUALITY_THRESHOLDS = {
     'character_uniqueness': 0.6
 }
 
+@dataclass(frozen=True)
+class GenreWeights:
+    genre: Optional[str]
+    weights: Mapping[str, float]  # Read-only metric -> weight
+    vector: Tuple[float, ...]  # The same weights in METRIC_NAMES order
+
+def _adjust_weights(base: Dict[str, float], adjustments: Dict[str, float]) -> Dict[str, float]:
+    """Apply a genre's adjustments to the base weights and renormalize."""
+    weights = base.copy()
+    # Apply adjustments
+    for metric, adjustment in adjustments.items():
+        weights[metric] = max(0.0, min(1.0, weights[metric] + adjustment))
+
+    # Normalize weights to ensure they sum to 1.0
+    total_weight = sum(weights.values())
+    if total_weight != 0:
+        weights = {k: v/total_weight for k, v in weights.items()}
+    return weights
+
+def _build_weight_registry(
+    base: Dict[str, float],
+    adjustments: Dict[str, Dict[str, float]]
+) -> Mapping[Optional[str], GenreWeights]:
+    """Precompute the frozen weights of every genre, plus the base weights under None."""
+    tables = {None: base}
+    for genre, genre_adjustments in adjustments.items():
+        tables[genre] = _adjust_weights(base, genre_adjustments)
+    return MappingProxyType({
+        genre: GenreWeights(
+            genre,
+            MappingProxyType(dict(weights)),
+            tuple(weights.get(metric, 0.0) for metric in METRIC_NAMES)
+        )
+        for genre, weights in tables.items()
+    })
+
+# Built once at import; replaced wholesale (never mutated) by reload_weight_registry()
+WEIGHT_REGISTRY = _build_weight_registry(BASE_METRIC_WEIGHTS, GENRE_METRIC_ADJUSTMENTS)
+
+def weight_table(genre: Optional[str] = None) -> GenreWeights:
+    """Return the precompiled weights for a genre; unknown or missing genres get the base weights."""
+    registry = WEIGHT_REGISTRY
+    return registry.get(genre.upper() if genre else None) or registry[None]
+
 def get_adjusted_metrics(genre: str = None) -> Dict:
     """Get metric weights adjusted for specific genre."""
-    weights = BASE_METRIC_WEIGHTS.copy()
-    if genre and genre.upper() in GENRE_METRIC_ADJUSTMENTS:
-        adjustments = GENRE_METRIC_ADJUSTMENTS[genre.upper()]
-        # Apply adjustments
-        for metric, adjustment in adjustments.items():
-            weights[metric] = max(0.0, min(1.0, weights[metric] + adjustment))
-        
-        # Normalize weights to ensure they sum to 1.0
-        total_weight = sum(weights.values())
-        if total_weight != 0:
-            weights = {k: v/total_weight for k, v in weights.items()}
-    
-    return weights
+    return dict(weight_table(genre).weights)
+
+def reload_weight_registry() -> Mapping[Optional[str], GenreWeights]:
+    """Re-read the weights in this config file and rebuild the registry.
+
+    Only the weight tables are swapped in; classes and other settings of the
+    running process are left alone.
+    """
+    global WEIGHT_REGISTRY, BASE_METRIC_WEIGHTS, GENRE_METRIC_ADJUSTMENTS, _weights_mtime
+    _weights_mtime = _config_mtime()
+    spec = importlib.util.spec_from_file_location(f"{__package__}._reloaded_metrics", __file__)
+    fresh = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(fresh)
+    BASE_METRIC_WEIGHTS = fresh.BASE_METRIC_WEIGHTS
+    GENRE_METRIC_ADJUSTMENTS = fresh.GENRE_METRIC_ADJUSTMENTS
+    WEIGHT_REGISTRY = _build_weight_registry(BASE_METRIC_WEIGHTS, GENRE_METRIC_ADJUSTMENTS)
+    return WEIGHT_REGISTRY
+
+def _config_mtime() -> int:
+    try:
+        return os.stat(__file__).st_mtime_ns
+    except OSError:
+        return 0
+
+_weights_mtime = _config_mtime()
+
+def reload_weights_if_changed() -> bool:
+    """Rebuild the registry if this config file changed on disk since it was read.
+
+    One stat call, so long-running processes can check before every story.
+    Returns True when the weights were reloaded.
+    """
+    if _config_mtime() == _weights_mtime:
+        return False
+    try:
+        reload_weight_registry()
+    except Exception as e:
+        # Keep scoring with the current weights until the file is fixed
+        print(f"⚠️ Could not reload metric weights: {e}")
+        return False
+    return True
 
 # Current active weights (will be updated based on genre)
 METRIC_WEIGHTS = BASE_METRIC_WEIGHTS.copy()
 
 # Storage configuration
-DEFAULT_METRICS_STORAGE = "story_metrics.json"
+DEFAULT_METRICS_STORAGE = "story_metrics.db"  # SQLite story archive
 
 # Maximum number of revision cycles
 MAX_REVISION_CYCLES = 3
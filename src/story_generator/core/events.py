@@ -0,0 +1,64 @@
+"""Typed progress events of a pipeline run, and their server-sent-event encoding.
+
+A run emits, in order: PLAN_READY, then for the first draft and each revision
+(REVISION_STARTED first) STORY_TOKEN pieces as the text streams, STORY_COMPLETE
+with the whole draft, and SCORES once the judge is done; FINAL closes the run.
+The story can be shown from the first STORY_TOKEN while the judge is still
+working. Patched revisions and best-of-N drafts arrive as STORY_COMPLETE only.
+"""
+
+import asyncio
+import json
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict
+
+PLAN_READY = "plan_ready"
+REVISION_STARTED = "revision_started"
+STORY_TOKEN = "story_token"
+STORY_COMPLETE = "story_complete"
+SCORES = "scores"
+FINAL = "final"
+
+EVENT_TYPES = (PLAN_READY, REVISION_STARTED, STORY_TOKEN, STORY_COMPLETE, SCORES, FINAL)
+
+# Seconds between SSE comments on a quiet stream, so proxies keep the connection open
+SSE_KEEPALIVE = 15.0
+
+@dataclass
+class StoryEvent:
+    type: str
+    data: Dict = field(default_factory=dict)
+
+    def to_sse(self) -> bytes:
+        """One server-sent event: the type as the event name, the data as JSON."""
+        return format_sse(self.type, self.data)
+
+def format_sse(event: str, data: Dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+async def sse_stream(events: AsyncIterator[StoryEvent], keepalive: float = SSE_KEEPALIVE) -> AsyncIterator[bytes]:
+    """Encode an event stream (e.g. StoryPipeline.stream) as an SSE response body.
+
+    Works as the body of any async streaming response, such as Starlette's
+    StreamingResponse(sse_stream(pipeline.stream(request)), media_type="text/event-stream").
+    """
+    iterator = events.__aiter__()
+    next_event = asyncio.ensure_future(iterator.__anext__())
+    try:
+        while True:
+            done, _ = await asyncio.wait({next_event}, timeout=keepalive)
+            if not done:
+                yield b": keepalive\n\n"
+                continue
+            try:
+                event = next_event.result()
+            except StopAsyncIteration:
+                return
+            yield event.to_sse()
+            if event.type == FINAL:
+                return
+            next_event = asyncio.ensure_future(iterator.__anext__())
+    finally:
+        if not next_event.done():
+            next_event.cancel()
+        await iterator.aclose()
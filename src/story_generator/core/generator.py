@@ -1,10 +1,29 @@
 """Story generation agent."""
 
-from typing import Dict, Optional, Tuple
-from openai import OpenAI
-from ..utils.llm_utils import call_llm
+import asyncio
+import contextvars
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+from openai import OpenAI, AsyncOpenAI
+from ..utils.llm_utils import call_llm, async_call_llm, stream_llm, async_stream_llm
+from ..utils.http_client import get_openai_client, get_async_openai_client
+from ..utils.instrumentation import llm_context
+from ..utils.response_parser import parse_with_repair, async_parse_with_repair, ResponseParseError
+from ..utils.keyword_matcher import FORBIDDEN_MATCHER, KeywordMatch, KeywordScanner
+from ..utils.prompt_builder import PromptSection, assemble_prompt, render_compact
+from ..utils.text_stats import TextStats, TextStatsBuilder
 from ..config.content_filter import FORBIDDEN_TOPICS, AGE_GUIDELINES, POSITIVE_THEMES
+from ..config.metrics import StoryMetrics
 
+if TYPE_CHECKING:
+    from .judge import StoryJudge, AsyncStoryJudge
+
+# Static instructions sent first and unchanged on every call so prompt caching can reuse them
 GENERATION_PROMPT = """You are an expert children's story writer. Create an engaging, age-appropriate bedtime story.
 
 IMPORTANT: This story MUST be appropriate for children. DO NOT include:
@@ -14,69 +33,204 @@ IMPORTANT: This story MUST be appropriate for children. DO NOT include:
 - Inappropriate behavior like bullying or lying
 - Any content that could be traumatic or anxiety-inducing
 
-USER REQUEST: {request}
-TARGET AGE: {age}
-AGE GUIDELINES: {age_guidelines}
-STORY PLAN: {plan}
-
-If provided, incorporate this feedback for improvement:
-{feedback}
-
 Create a story that:
 1. Is engaging but calming (suitable for bedtime)
 2. Has clear character development
 3. Includes gentle life lessons
 4. Uses age-appropriate language
 5. Has a satisfying, peaceful ending
-6. Focuses on positive themes like: {positive_themes}
+6. Focuses on positive themes (suggestions below, if given)
+
+If feedback is provided below, incorporate it to improve the story.
+The request details follow."""
+
+GENERATION_REQUEST = """USER REQUEST: {request}
+TARGET AGE: {age}
+LENGTH: approximately {length} words"""
+
+# Plan sections the story cannot be written without; the rest may be trimmed
+CORE_PLAN_KEYS = ("title", "characters", "plot_outline", "theme")
+
+# Default input-token budget for a generation prompt
+GENERATION_PROMPT_BUDGET = 1200
+
+# Best-of-N: candidates written at once, and the temperatures they cycle through
+DEFAULT_CANDIDATES = 3
+CANDIDATE_TEMPERATURES = (0.7, 0.9, 0.5, 1.0, 0.6, 0.8)
+
+GENERATOR_SYSTEM_PROMPT = """You are an expert children's story writer specializing in safe, 
+            age-appropriate content. You must NEVER include inappropriate topics like drugs, violence, 
+            adult relationships, or scary content. Focus only on positive, wholesome themes suitable for children."""
+
+FALLBACK_SYSTEM_PROMPT = """You are an expert children's story writer with a 
+                strong focus on safety and age-appropriateness. Generate a simple, wholesome 
+                story about friendship, kindness, or learning."""
+
+FALLBACK_PROMPT = "Create a safe, age-appropriate story for a {age}-year-old about friendship and kindness."
+
+# Static editing instructions, sent first so prompt caching can reuse them across revisions
+REVISION_PROMPT = """You are an expert children's story editor. Improve the bedtime story given at the end so it addresses the feedback.
+
+Each paragraph is numbered like [3]. Rewrite only the paragraphs that need to change and leave every other paragraph exactly as it is. A rewritten paragraph may be split into several paragraphs if the story needs more room. Keep the story safe, calm, and appropriate for the target age, with the same characters and plot.
+
+FORMAT YOUR RESPONSE AS JSON:
+{
+    "edits": [
+        {"paragraph": 3, "text": "The complete rewritten paragraph"}
+    ]
+}"""
+
+REVISION_REQUEST = """TARGET AGE: {age}
+FEEDBACK TO ADDRESS:
+{feedback}
+
+STORY:
+{story}"""
+
+REVISER_SYSTEM_PROMPT = "You are an expert children's story editor. Respond only with the requested JSON format."
+
+# Shape of a paragraph patch
+PATCH_SCHEMA = {"edits": [{"paragraph": int, "text": str}]}
+
+# Stories with fewer paragraphs are rewritten in full instead of patched
+MIN_PATCH_PARAGRAPHS = 3
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+# Longest story (in words) suitable for each age; younger kids need shorter stories
+MAX_WORDS_BY_AGE = {
+    5: 500,
+    6: 600,
+    7: 700,
+    8: 800,
+    9: 900,
+    10: 1000
+}
+
+# Share of long words allowed in stories for ages 7 and under
+COMPLEX_WORD_RATIO = 0.05
+
+def split_paragraphs(story: str) -> List[str]:
+    return [paragraph.strip() for paragraph in _PARAGRAPH_BREAK.split(story) if paragraph.strip()]
+
+def _describe_forbidden(matches: List[KeywordMatch]) -> str:
+    """Build the content warning for the first forbidden topic found."""
+    topic = matches[0].topic
+    found = ", ".join(dict.fromkeys(match.keyword for match in matches if match.topic == topic))
+    return f"Content warning: {FORBIDDEN_TOPICS[topic]['reason']} (found: {found})"
 
-The story should be approximately {length} words."""
+@dataclass
+class StoryChunk:
+    text: str
+    restart: bool = False  # True when earlier chunks are discarded for a safe replacement
+
+@dataclass
+class Candidate:
+    story: str
+    temperature: float
+    metrics: StoryMetrics
+    feedback: List[str] = field(default_factory=list)
+    judgment: str = ""
+    passes_thresholds: bool = False
+
+    @property
+    def rank(self) -> Tuple[bool, float]:
+        """Sort key: stories clearing every threshold first, then by overall score."""
+        return self.passes_thresholds, self.metrics.overall_score
+
+def _candidate_temperatures(n: int) -> List[float]:
+    return [CANDIDATE_TEMPERATURES[i % len(CANDIDATE_TEMPERATURES)] for i in range(n)]
+
+def _pick_best(candidates: List[Candidate], errors: List[Exception]) -> Candidate:
+    if not candidates:
+        raise errors[-1] if errors else ValueError("No candidate story was produced")
+    return max(candidates, key=lambda candidate: candidate.rank)
+
+class StreamingSafetyCheck:
+    """Checks a story while it streams and releases only text that passed the checks.
+
+    Forbidden keywords and the length limit are caught mid-stream so the request can be
+    cancelled early; the language complexity check runs once the story is complete.
+    """
+
+    def __init__(self, generator: "StoryGenerator", age: int):
+        self.generator = generator
+        self.age = age
+        self.max_words = MAX_WORDS_BY_AGE.get(age, 800)
+        self.scanner = KeywordScanner(FORBIDDEN_MATCHER)
+        self.stats = TextStatsBuilder()
+        self.violation = ""
+        self._released = 0
+
+    @property
+    def word_count(self) -> int:
+        return self.stats.word_count
+
+    def _release(self, offset: int) -> str:
+        if self.violation or offset <= self._released:
+            return ""
+        text = self.scanner.text[self._released:offset]
+        self._released = offset
+        return text
+
+    def feed(self, chunk: str) -> str:
+        """Check the next chunk and return any newly released safe text."""
+        matches = self.scanner.feed(chunk)
+        self.stats.feed(chunk)
+        if matches:
+            self.violation = _describe_forbidden(matches)
+        elif self.word_count > self.max_words:
+            self.violation = f"Story is too long for age {self.age} ({self.word_count}+ words)"
+        return self._release(self.scanner.safe_offset)
+
+    def finish(self) -> str:
+        """Run the end-of-story checks and return the remaining safe text."""
+        matches = self.scanner.finish()
+        if matches:
+            self.violation = _describe_forbidden(matches)
+        else:
+            is_age_appropriate, age_msg = self.generator._is_age_appropriate(
+                self.scanner.text, self.age, self.stats.finish()
+            )
+            if not is_age_appropriate:
+                self.violation = age_msg
+        return self._release(len(self.scanner.text))
 
 class StoryGenerator:
-    def __init__(self, client: OpenAI):
-        self.client = client
+    def __init__(self, client: Optional[OpenAI] = None, prompt_token_budget: int = GENERATION_PROMPT_BUDGET):
+        self.client = client or get_openai_client()
+        self.prompt_token_budget = prompt_token_budget
 
     def _contains_forbidden_content(self, text: str) -> Tuple[bool, str]:
         """Check if text contains any forbidden topics."""
-        text = text.lower()
-        for topic, info in FORBIDDEN_TOPICS.items():
-            for keyword in info["keywords"]:
-                if keyword.lower() in text:
-                    return True, f"Content warning: {info['reason']} (found: {keyword})"
-        return False, ""
-
-    def _is_age_appropriate(self, text: str, age: int) -> Tuple[bool, str]:
-        """Check if content is age-appropriate."""
+        matches = FORBIDDEN_MATCHER.find_all(text)
+        if not matches:
+            return False, ""
+        return True, _describe_forbidden(matches)
+
+    def _is_age_appropriate(self, text: str, age: int, stats: Optional[TextStats] = None) -> Tuple[bool, str]:
+        """Check if content is age-appropriate; pass stats when the text was already analyzed."""
+        stats = stats or TextStats.from_text(text)
+
         # Basic length check (younger kids need shorter stories)
-        word_count = len(text.split())
-        max_words = {
-            5: 500,
-            6: 600,
-            7: 700,
-            8: 800,
-            9: 900,
-            10: 1000
-        }
-        if word_count > max_words.get(age, 800):
-            return False, f"Story is too long for age {age} ({word_count} words)"
+        if stats.words > MAX_WORDS_BY_AGE.get(age, 800):
+            return False, f"Story is too long for age {age} ({stats.words} words)"
         
         # Check for complex language in young children's stories
-        if age <= 7:
-            complex_words = [word for word in text.split() if len(word) > 8]
-            if len(complex_words) > word_count * 0.05:  # More than 5% complex words
-                return False, f"Language may be too complex for age {age}"
+        if age <= 7 and stats.long_words > stats.words * COMPLEX_WORD_RATIO:
+            return False, f"Language may be too complex for age {age}"
         
         return True, ""
 
-    def generate_story(
-        self, 
-        request: str, 
-        age: int, 
+    def _build_prompt(
+        self,
+        request: str,
+        age: int,
         plan: Dict,
         feedback: Optional[list] = None,
         target_length: int = 500
     ) -> str:
-        """Generate or regenerate a story based on request and optional feedback."""
+        """Screen the request and build the generation prompt."""
         # First, check if the request itself contains inappropriate content
         has_forbidden, forbidden_msg = self._contains_forbidden_content(request)
         if has_forbidden:
@@ -88,46 +242,456 @@ class StoryGenerator:
         # Get age-specific guidelines
         age_guidelines = AGE_GUIDELINES.get(age, AGE_GUIDELINES[7])  # Default to age 7 if not found
         
-        # Format the prompt with safety guidelines
-        prompt = GENERATION_PROMPT.format(
-            request=safe_request,
-            age=age,
-            age_guidelines=age_guidelines,
-            plan=plan,
-            feedback="\n".join(feedback) if feedback else "No specific feedback to incorporate.",
-            length=target_length,
-            positive_themes=", ".join(POSITIVE_THEMES)
-        )
-        
-        # Generate story with strong safety emphasis in system prompt
-        response = call_llm(
-            client=self.client,
-            system_prompt_content="""You are an expert children's story writer specializing in safe, 
-            age-appropriate content. You must NEVER include inappropriate topics like drugs, violence, 
-            adult relationships, or scary content. Focus only on positive, wholesome themes suitable for children.""",
-            user_prompt_content=prompt,
-            max_tokens=2000,
-            temperature=0.7
+        core_plan = {key: value for key, value in plan.items() if key in CORE_PLAN_KEYS}
+        plan_extras = {key: value for key, value in plan.items() if key not in CORE_PLAN_KEYS}
+
+        sections = [
+            PromptSection(
+                "request",
+                GENERATION_REQUEST.format(request=safe_request, age=age, length=target_length)
+            ),
+            PromptSection(
+                "plan",
+                f"STORY PLAN:\n{render_compact(core_plan)}",
+                baseline=lambda: f"STORY PLAN: {plan}"
+            ),
+            PromptSection(
+                "plan_extras",
+                f"PLAN DETAILS:\n{render_compact(plan_extras)}" if plan_extras else "",
+                required=False,
+                priority=2,
+                baseline=lambda: ""
+            ),
+            PromptSection(
+                "age_guidelines",
+                f"AGE GUIDELINES:\n{render_compact(age_guidelines)}",
+                required=False,
+                priority=3,
+                baseline=lambda: f"AGE GUIDELINES: {age_guidelines}"
+            ),
+            PromptSection(
+                "positive_themes",
+                f"POSITIVE THEMES: {', '.join(POSITIVE_THEMES)}",
+                required=False,
+                priority=1,
+                baseline=lambda: f"Focuses on positive themes like: {', '.join(POSITIVE_THEMES)}"
+            ),
+        ]
+        if feedback:
+            sections.append(PromptSection("feedback", "FEEDBACK TO INCORPORATE:\n" + "\n".join(feedback)))
+
+        return assemble_prompt(GENERATION_PROMPT, sections, self.prompt_token_budget, kind="generation")
+
+    def _build_revision_prompt(self, paragraphs: List[str], age: int, feedback: list) -> str:
+        """Build the edit task sent instead of a full generation prompt."""
+        numbered = "\n\n".join(f"[{number}] {paragraph}" for number, paragraph in enumerate(paragraphs, 1))
+        section = PromptSection(
+            "revision",
+            REVISION_REQUEST.format(age=age, feedback="\n".join(f"- {item}" for item in feedback), story=numbered)
         )
-        
-        # Verify the generated story is safe and age-appropriate
-        has_forbidden, forbidden_msg = self._contains_forbidden_content(response)
-        is_age_appropriate, age_msg = self._is_age_appropriate(response, age)
-        
+        return assemble_prompt(REVISION_PROMPT, [section], kind="revision")
+
+    def _apply_patch(self, paragraphs: List[str], edits: List[Dict], age: int) -> Optional[str]:
+        """Splice edited paragraphs into the story; None if the patch is unusable or unsafe."""
+        replacements = {}
+        for edit in edits:
+            text = edit["text"].strip()
+            if not 1 <= edit["paragraph"] <= len(paragraphs) or not text:
+                return None
+            replacements[edit["paragraph"] - 1] = text
+        if not replacements:
+            return None
+        story = "\n\n".join(replacements.get(index, paragraph) for index, paragraph in enumerate(paragraphs))
+
+        has_forbidden, _ = self._contains_forbidden_content(story)
+        is_age_appropriate, _ = self._is_age_appropriate(story, age)
         if has_forbidden or not is_age_appropriate:
-            # If the story is inappropriate, generate a safe replacement
-            print(f"⚠️ Generated story contained inappropriate content or language.")
-            print(f"Generating a safe replacement story...")
-            
-            # Generate a new story with stricter controls
-            response = call_llm(
+            return None
+        return story
+
+    def _report_patch_failure(self):
+        print("⚠️ Could not apply targeted edits; rewriting the whole story instead.")
+
+    def _report_replacement(self, check: StreamingSafetyCheck):
+        print(f"⚠️ Generated story contained inappropriate content or language. ({check.violation})")
+        print("Generating a safe replacement story...")
+
+    def _generate_fallback(self, age: int) -> str:
+        """Generate a new story with stricter controls."""
+        with llm_context(agent="generator", stage="fallback"):
+            return call_llm(
                 client=self.client,
-                system_prompt_content="""You are an expert children's story writer with a 
-                strong focus on safety and age-appropriateness. Generate a simple, wholesome 
-                story about friendship, kindness, or learning.""",
-                user_prompt_content=f"Create a safe, age-appropriate story for a {age}-year-old about friendship and kindness.",
+                system_prompt_content=FALLBACK_SYSTEM_PROMPT,
+                user_prompt_content=FALLBACK_PROMPT.format(age=age),
                 max_tokens=1500,
                 temperature=0.5  # Lower temperature for more predictable output
             )
+
+    def stream_story(
+        self,
+        request: str,
+        age: int,
+        plan: Dict,
+        feedback: Optional[list] = None,
+        target_length: int = 500,
+        temperature: float = 0.7
+    ) -> Iterator[StoryChunk]:
+        """Generate a story, yielding text as soon as it passes the safety checks.
+
+        If the story fails a check the request is cancelled and a safe replacement
+        follows, starting with a chunk marked restart=True.
+        """
+        prompt = self._build_prompt(request, age, plan, feedback, target_length)
+        check = StreamingSafetyCheck(self, age)
         
-        return response 
\ No newline at end of file
+        # Generate story with strong safety emphasis in system prompt
+        with llm_context(agent="generator", stage="revise" if feedback else "generate"):
+            chunks = stream_llm(
+                client=self.client,
+                system_prompt_content=GENERATOR_SYSTEM_PROMPT,
+                user_prompt_content=prompt,
+                max_tokens=2000,
+                temperature=temperature
+            )
+        try:
+            for chunk in chunks:
+                text = check.feed(chunk)
+                if check.violation:
+                    break
+                if text:
+                    yield StoryChunk(text)
+            else:
+                text = check.finish()
+                if text:
+                    yield StoryChunk(text)
+        finally:
+            # Closing the stream cancels the request if we stopped early
+            chunks.close()
+
+        if check.violation:
+            self._report_replacement(check)
+            yield StoryChunk(self._generate_fallback(age), restart=True)
+
+    def generate_story(
+        self, 
+        request: str, 
+        age: int, 
+        plan: Dict,
+        feedback: Optional[list] = None,
+        target_length: int = 500,
+        temperature: float = 0.7,
+        on_chunk: Optional[Callable[[StoryChunk], None]] = None
+    ) -> str:
+        """Generate or regenerate a story based on request and optional feedback.
+
+        on_chunk sees each piece of text as it is released, e.g. to show the story as it streams.
+        """
+        parts = []
+        # Closed explicitly so an on_chunk that raises cancels the request at once
+        with closing(self.stream_story(request, age, plan, feedback, target_length, temperature)) as chunks:
+            for chunk in chunks:
+                if chunk.restart:
+                    parts = []
+                parts.append(chunk.text)
+                if on_chunk is not None:
+                    on_chunk(chunk)
+        return "".join(parts)
+
+    def revise_story(
+        self,
+        request: str,
+        age: int,
+        plan: Dict,
+        story: str,
+        feedback: list,
+        target_length: int = 500
+    ) -> str:
+        """Revise a judged story by rewriting only the paragraphs the feedback is about.
+
+        The previous story and the feedback go out as an edit task, so the cost
+        follows the size of the fix rather than the story. Short stories, and
+        patches that cannot be applied safely, are rewritten in full instead.
+        """
+        paragraphs = split_paragraphs(story)
+        if feedback and len(paragraphs) >= MIN_PATCH_PARAGRAPHS:
+            prompt = self._build_revision_prompt(paragraphs, age, feedback)
+            with llm_context(agent="generator", stage="patch"):
+                response = call_llm(
+                    client=self.client,
+                    system_prompt_content=REVISER_SYSTEM_PROMPT,
+                    user_prompt_content=prompt,
+                    max_tokens=2000,
+                    temperature=0.5,
+                    use_cache=False
+                )
+                try:
+                    patch = parse_with_repair(self.client, response, PATCH_SCHEMA)
+                except ResponseParseError:
+                    patch = {"edits": []}
+            revised = self._apply_patch(paragraphs, patch["edits"], age)
+            if revised is not None:
+                return revised
+            self._report_patch_failure()
+        return self.generate_story(request, age, plan, feedback, target_length)
+
+    def _write_candidate(
+        self,
+        index: int,
+        temperature: float,
+        request: str,
+        age: int,
+        plan: Dict,
+        judge: "StoryJudge",
+        genre: Optional[str],
+        feedback: Optional[list],
+        revision_count: int,
+        stop: threading.Event
+    ) -> Optional[Candidate]:
+        """Write and judge one candidate; gives up (returning None) once stop is set."""
+        story_id = f"candidate-{uuid.uuid4().hex}"
+        parts = []
+        try:
+            with llm_context(candidate=index), \
+                    closing(self.stream_story(request, age, plan, feedback, temperature=temperature)) as chunks:
+                for chunk in chunks:
+                    if stop.is_set():
+                        return None  # Closing the stream cancels the request
+                    if chunk.restart:
+                        parts = []
+                    parts.append(chunk.text)
+                if stop.is_set():
+                    return None
+                story = "".join(parts)
+                metrics, candidate_feedback, judgment = judge.evaluate_story(
+                    story, age, genre, revision_count=revision_count, story_id=story_id
+                )
+        finally:
+            judge.revision_history.discard(story_id)
+        return Candidate(story, temperature, metrics, candidate_feedback, judgment, not judge.needs_revision(metrics))
+
+    def generate_best_of(
+        self,
+        request: str,
+        age: int,
+        plan: Dict,
+        judge: "StoryJudge",
+        n: int = DEFAULT_CANDIDATES,
+        genre: Optional[str] = None,
+        feedback: Optional[list] = None,
+        revision_count: int = 0
+    ) -> Candidate:
+        """Write n candidates at once at varied temperatures and return the best judged one.
+
+        Candidates are judged as soon as they finish. The first one to clear every
+        quality threshold stops the others, trading a few extra tokens for not
+        waiting on a serial revision round.
+        """
+        if n < 1:
+            raise ValueError("n must be at least 1")
+        stop = threading.Event()
+        candidates: List[Candidate] = []
+        errors: List[Exception] = []
+        pool = ThreadPoolExecutor(max_workers=n)
+        try:
+            futures = [
+                # Each thread gets its own copy of the caller's llm_context()
+                pool.submit(
+                    contextvars.copy_context().run, self._write_candidate, index, temperature,
+                    request, age, plan, judge, genre, feedback, revision_count, stop
+                )
+                for index, temperature in enumerate(_candidate_temperatures(n))
+            ]
+            for future in as_completed(futures):
+                try:
+                    candidate = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                if candidate is None:
+                    continue
+                candidates.append(candidate)
+                if candidate.passes_thresholds:
+                    break
+        finally:
+            stop.set()
+            # Don't wait for stragglers; they notice stop and drop their result
+            pool.shutdown(wait=False, cancel_futures=True)
+        return _pick_best(candidates, errors)
+
+class AsyncStoryGenerator(StoryGenerator):
+    """Story generator that talks to the model without blocking the event loop."""
+
+    def __init__(self, client: Optional[AsyncOpenAI] = None, prompt_token_budget: int = GENERATION_PROMPT_BUDGET):
+        super().__init__(client or get_async_openai_client(), prompt_token_budget)
+
+    async def _generate_fallback(self, age: int) -> str:
+        """Generate a new story with stricter controls."""
+        with llm_context(agent="generator", stage="fallback"):
+            return await async_call_llm(
+                client=self.client,
+                system_prompt_content=FALLBACK_SYSTEM_PROMPT,
+                user_prompt_content=FALLBACK_PROMPT.format(age=age),
+                max_tokens=1500,
+                temperature=0.5
+            )
+
+    async def stream_story(
+        self,
+        request: str,
+        age: int,
+        plan: Dict,
+        feedback: Optional[list] = None,
+        target_length: int = 500,
+        temperature: float = 0.7
+    ) -> AsyncIterator[StoryChunk]:
+        """Generate a story, yielding text as soon as it passes the safety checks."""
+        prompt = self._build_prompt(request, age, plan, feedback, target_length)
+        check = StreamingSafetyCheck(self, age)
+
+        with llm_context(agent="generator", stage="revise" if feedback else "generate"):
+            chunks = async_stream_llm(
+                client=self.client,
+                system_prompt_content=GENERATOR_SYSTEM_PROMPT,
+                user_prompt_content=prompt,
+                max_tokens=2000,
+                temperature=temperature
+            )
+        try:
+            async for chunk in chunks:
+                text = check.feed(chunk)
+                if check.violation:
+                    break
+                if text:
+                    yield StoryChunk(text)
+            else:
+                text = check.finish()
+                if text:
+                    yield StoryChunk(text)
+        finally:
+            await chunks.aclose()
+
+        if check.violation:
+            self._report_replacement(check)
+            yield StoryChunk(await self._generate_fallback(age), restart=True)
+
+    async def generate_story(
+        self,
+        request: str,
+        age: int,
+        plan: Dict,
+        feedback: Optional[list] = None,
+        target_length: int = 500,
+        temperature: float = 0.7,
+        on_chunk: Optional[Callable[[StoryChunk], None]] = None
+    ) -> str:
+        """Generate or regenerate a story based on request and optional feedback.
+
+        on_chunk sees each piece of text as it is released, e.g. to show the story as it streams.
+        """
+        parts = []
+        # Closed explicitly so an on_chunk that raises cancels the request at once
+        chunks = self.stream_story(request, age, plan, feedback, target_length, temperature)
+        try:
+            async for chunk in chunks:
+                if chunk.restart:
+                    parts = []
+                parts.append(chunk.text)
+                if on_chunk is not None:
+                    on_chunk(chunk)
+        finally:
+            await chunks.aclose()
+        return "".join(parts)
+
+    async def revise_story(
+        self,
+        request: str,
+        age: int,
+        plan: Dict,
+        story: str,
+        feedback: list,
+        target_length: int = 500
+    ) -> str:
+        """Revise a judged story by rewriting only the paragraphs the feedback is about."""
+        paragraphs = split_paragraphs(story)
+        if feedback and len(paragraphs) >= MIN_PATCH_PARAGRAPHS:
+            prompt = self._build_revision_prompt(paragraphs, age, feedback)
+            with llm_context(agent="generator", stage="patch"):
+                response = await async_call_llm(
+                    client=self.client,
+                    system_prompt_content=REVISER_SYSTEM_PROMPT,
+                    user_prompt_content=prompt,
+                    max_tokens=2000,
+                    temperature=0.5,
+                    use_cache=False
+                )
+                try:
+                    patch = await async_parse_with_repair(self.client, response, PATCH_SCHEMA)
+                except ResponseParseError:
+                    patch = {"edits": []}
+            revised = self._apply_patch(paragraphs, patch["edits"], age)
+            if revised is not None:
+                return revised
+            self._report_patch_failure()
+        return await self.generate_story(request, age, plan, feedback, target_length)
+
+    async def _write_candidate(
+        self,
+        index: int,
+        temperature: float,
+        request: str,
+        age: int,
+        plan: Dict,
+        judge: "AsyncStoryJudge",
+        genre: Optional[str],
+        feedback: Optional[list],
+        revision_count: int
+    ) -> Candidate:
+        story_id = f"candidate-{uuid.uuid4().hex}"
+        try:
+            with llm_context(candidate=index):
+                story = await self.generate_story(request, age, plan, feedback, temperature=temperature)
+                metrics, candidate_feedback, judgment = await judge.evaluate_story(
+                    story, age, genre, revision_count=revision_count, story_id=story_id
+                )
+        finally:
+            judge.revision_history.discard(story_id)
+        return Candidate(story, temperature, metrics, candidate_feedback, judgment, not judge.needs_revision(metrics))
+
+    async def generate_best_of(
+        self,
+        request: str,
+        age: int,
+        plan: Dict,
+        judge: "AsyncStoryJudge",
+        n: int = DEFAULT_CANDIDATES,
+        genre: Optional[str] = None,
+        feedback: Optional[list] = None,
+        revision_count: int = 0
+    ) -> Candidate:
+        """Write n candidates at once and return the best judged one, cancelling the rest early."""
+        if n < 1:
+            raise ValueError("n must be at least 1")
+        tasks = [
+            asyncio.create_task(self._write_candidate(
+                index, temperature, request, age, plan, judge, genre, feedback, revision_count
+            ))
+            for index, temperature in enumerate(_candidate_temperatures(n))
+        ]
+        candidates: List[Candidate] = []
+        errors: List[Exception] = []
+        try:
+            for finished in asyncio.as_completed(tasks):
+                try:
+                    candidate = await finished
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                candidates.append(candidate)
+                if candidate.passes_thresholds:
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Let cancelled candidates close their streams before returning
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return _pick_best(candidates, errors)
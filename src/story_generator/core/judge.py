@@ -1,98 +1,105 @@
 """Story judging and evaluation agent."""
 
-from typing import Dict, List, Tuple
-from openai import OpenAI
-from ..utils.llm_utils import call_llm
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+from openai import OpenAI, AsyncOpenAI
+from ..utils.llm_utils import call_llm, async_call_llm
+from ..utils.http_client import get_openai_client, get_async_openai_client
+from ..utils.instrumentation import METRICS, llm_context
+from ..utils.prompt_builder import PromptSection, assemble_prompt, render_compact
+from ..utils.response_parser import parse_with_repair, async_parse_with_repair, ResponseParseError
 from ..config.metrics import (
-    METRIC_WEIGHTS, BASE_QUALITY_THRESHOLDS, 
+    BASE_QUALITY_THRESHOLDS,
+    METRIC_NAMES,
     StoryMetrics,
-    get_adjusted_metrics,
+    weight_table,
     MAX_REVISION_CYCLES,
     MIN_IMPROVEMENT_THRESHOLD
 )
 from ..config.genres import STORY_GENRES
+from ..utils.genre_index import GENRE_INDEX
+from .prejudge import PreJudge, PreJudgment
+from .speculative import SpeculativeResult
 
-JUDGE_PROMPT = """You are an expert children's story judge. Analyze this story and provide:
+# Static rubric sent first and unchanged on every call so prompt caching can reuse it
+JUDGE_PROMPT = """You are an expert children's story judge. Analyze the story given at the end and provide:
 1. Numerical scores (0.0-1.0) for each component
 2. Specific feedback for improvement that can be used to regenerate a better version
 3. Final judgment on story acceptability
 
-STORY:
-{story}
-
-TARGET AGE: {age}
-GENRE: {genre_info}
+Each component's weight in the overall score for this story's genre is listed with the story.
 
 Score each component from 0.0 (poor) to 1.0 (excellent):
 
 CORE METRICS:
-1. Character Relatability (Weight: {weights[character_relatability]}):
+1. Character Relatability:
 - Are characters age-appropriate and relatable?
 - Do they face realistic challenges?
 - Can children identify with their emotions?
 
-2. Plot Structure (Weight: {weights[plot_structure]}):
+2. Plot Structure:
 - Clear beginning, middle, and end?
 - Appropriate pacing for age?
 - Engaging but not overstimulating?
 
-3. Moral Lesson Clarity (Weight: {weights[moral_lesson_clarity]}):
+3. Moral Lesson Clarity:
 - Clear but not preachy message?
 - Age-appropriate complexity?
 - Positive values reinforcement?
 
-4. Engagement Level (Weight: {weights[engagement_level]}):
+4. Engagement Level:
 - Maintains interest throughout?
 - Interactive elements?
 - Memorable moments?
 
-5. Language Development (Weight: {weights[language_development]}):
+5. Language Development:
 - Age-appropriate vocabulary?
 - New word introduction?
 - Clear sentence structures?
 
-6. Cognitive Elements (Weight: {weights[cognitive_elements]}):
+6. Cognitive Elements:
 - Problem-solving opportunities?
 - Critical thinking moments?
 - Memory and prediction elements?
 
-7. Age-Appropriate Vocabulary (Weight: {weights[age_appropriate_vocabulary]}):
+7. Age-Appropriate Vocabulary:
 - Word complexity matches age?
 - New words properly contextualized?
 - Consistent language level?
 
-8. Attention Span Fit (Weight: {weights[attention_span_fit]}):
+8. Attention Span Fit:
 - Length appropriate for age?
 - Pacing matches attention capacity?
 - Engaging elements well-distributed?
 
-9. Emotional Safety (Weight: {weights[emotional_safety]}):
+9. Emotional Safety:
 - Appropriate emotional intensity?
 - Safe conflict resolution?
 - Comforting overall tone?
 
 CREATIVITY METRICS:
-10. Originality (Weight: {weights[originality]}):
+10. Originality:
 - Fresh and unique story elements?
 - Avoids common tropes?
 - Creative problem-solving?
 
-11. Imagination (Weight: {weights[imagination]}):
+11. Imagination:
 - Rich imaginative elements?
 - Creative scenarios?
 - Inspiring wonder?
 
-12. Surprise Factor (Weight: {weights[surprise_factor]}):
+12. Surprise Factor:
 - Unexpected twists?
 - Delightful surprises?
 - Novel story elements?
 
-13. World Building (Weight: {weights[world_building]}):
+13. World Building:
 - Rich setting details?
 - Immersive atmosphere?
 - Consistent story world?
 
-14. Character Uniqueness (Weight: {weights[character_uniqueness]}):
+14. Character Uniqueness:
 - Distinctive personality traits?
 - Memorable characteristics?
 - Unique character voice?
@@ -124,64 +131,195 @@ FORMAT YOUR RESPONSE AS JSON:
     "judgment": "APPROVED" or "NEEDS_REVISION"
 }}"""
 
+JUDGE_STORY = """TARGET AGE: {age}
+GENRE: {genre_info}
+METRIC WEIGHTS: {weights}
+
+STORY:
+{story}"""
+
+def _is_score(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and 0.0 <= value <= 1.0
+
+# Shape an evaluation must have before it is turned into metrics
+EVALUATION_SCHEMA = {
+    "scores": {metric: _is_score for metric in BASE_QUALITY_THRESHOLDS},
+    "feedback": [str],
+    "judgment": lambda value: value in ("APPROVED", "NEEDS_REVISION")
+}
+
+_JUDGE_PREFIX = JUDGE_PROMPT.format(thresholds=render_compact(BASE_QUALITY_THRESHOLDS))
+
+JUDGE_SYSTEM_PROMPT = "You are an expert children's story judge. Respond only with the requested JSON format."
+
+# Story id used when a caller judges one story at a time without naming it
+DEFAULT_STORY_ID = "default"
+
+# Most stories whose revision history a judge keeps at once
+DEFAULT_MAX_TRACKED_STORIES = 10_000
+
+class RevisionHistory:
+    """Per-story metrics of recent revisions, bounded in both directions.
+
+    Each story keeps only its last few evaluations (a ring buffer sized to
+    the revision limit), and once max_stories are tracked the least recently
+    judged story is evicted, so memory stays flat in a long-lived process.
+    """
+
+    def __init__(
+        self,
+        max_stories: int = DEFAULT_MAX_TRACKED_STORIES,
+        revisions_per_story: int = MAX_REVISION_CYCLES + 1
+    ):
+        self.max_stories = max_stories
+        self.revisions_per_story = revisions_per_story
+        self._stories: "OrderedDict[str, Deque[StoryMetrics]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, story_id: str, metrics: StoryMetrics):
+        with self._lock:
+            history = self._stories.get(story_id)
+            if history is None:
+                history = deque(maxlen=self.revisions_per_story)
+                self._stories[story_id] = history
+                while len(self._stories) > self.max_stories:
+                    self._stories.popitem(last=False)
+            else:
+                self._stories.move_to_end(story_id)
+            history.append(metrics)
+
+    def get(self, story_id: str) -> List[StoryMetrics]:
+        """Return a story's recorded metrics, oldest first."""
+        with self._lock:
+            return list(self._stories.get(story_id, ()))
+
+    def discard(self, story_id: str):
+        """Forget a finished story."""
+        with self._lock:
+            self._stories.pop(story_id, None)
+
+    def __len__(self) -> int:
+        return len(self._stories)
+
 class StoryJudge:
-    def __init__(self, client: OpenAI):
-        self.client = client
-        self.revision_history = []
+    def __init__(
+        self,
+        client: Optional[OpenAI] = None,
+        max_tracked_stories: int = DEFAULT_MAX_TRACKED_STORIES,
+        prejudge: Optional[PreJudge] = None
+    ):
+        """With a prejudge, clear-cut stories are settled locally without calling the model."""
+        self.client = client or get_openai_client()
+        self.revision_history = RevisionHistory(max_tracked_stories)
+        self.prejudge = prejudge
 
-    def evaluate_story(
-        self, 
-        story: str, 
-        age: int, 
-        genre: str = None,
-        revision_count: int = 0
-    ) -> Tuple[StoryMetrics, List[str], str]:
-        """Evaluate a story and provide metrics, feedback, and judgment."""
+    def _local_evaluation(self, story: str, age: int, revision_count: int) -> Tuple[Optional[Dict], Optional[PreJudgment]]:
+        """Pre-judge a story; returns (evaluation to use instead of the model's, pre-judgment)."""
+        if self.prejudge is None:
+            return None, None
+        prejudgment = self.prejudge.assess(story, age)
+        METRICS.increment("prejudge_decisions_total", (("decision", prejudgment.decision),))
+        # The last round is approved regardless, so let the model score it for real
+        if revision_count < MAX_REVISION_CYCLES and self.prejudge.skips_judge(prejudgment):
+            return {"scores": prejudgment.scores(), "feedback": prejudgment.feedback}, prejudgment
+        return None, prejudgment
+
+    def _record_calibration(self, prejudgment: Optional[PreJudgment], metrics: StoryMetrics):
+        if prejudgment is not None:
+            self.prejudge.calibration.record(prejudgment, metrics)
+
+    def _build_prompt(self, story: str, age: int, genre: str = None) -> str:
+        """Build the judging prompt for a story."""
         # Get genre info
         genre_key = genre.upper() if genre else None
         genre_info = STORY_GENRES.get(genre_key, {"name": "Not specified", "description": "General story"})
         
         # Adjust weights based on genre
-        weights = get_adjusted_metrics(genre_key)
+        weights = weight_table(genre_key).weights
         
-        prompt = JUDGE_PROMPT.format(
-            story=story,
-            age=age,
-            genre_info=f"{genre_info['name']}: {genre_info['description']}",
-            weights=weights,
-            thresholds=BASE_QUALITY_THRESHOLDS
+        compact_weights = ", ".join(f"{metric}={weight:.3f}" for metric, weight in weights.items())
+        section = PromptSection(
+            "story",
+            JUDGE_STORY.format(
+                age=age,
+                genre_info=f"{genre_info['name']}: {genre_info['description']}",
+                weights=compact_weights,
+                story=story
+            ),
+            baseline=lambda: "".join(f" (Weight: {weight})" for weight in weights.values())
+                + f"\nSTORY:\n{story}\n\nTARGET AGE: {age}\nGENRE: {genre_info['name']}: {genre_info['description']}"
         )
+        return assemble_prompt(_JUDGE_PREFIX, [section], kind="judge")
+
+    def _process_evaluation(
+        self,
+        result: Dict,
+        revision_count: int = 0,
+        genre: str = None,
+        story_id: str = DEFAULT_STORY_ID,
+        speculative: Optional[SpeculativeResult] = None
+    ) -> Tuple[StoryMetrics, List[str], str]:
+        """Turn a parsed evaluation into metrics, feedback, and judgment."""
+        if speculative is not None:
+            result = speculative.merge(result)
+        # Create metrics object, scored with the same weights the judge was given.
+        # Scores the schema does not ask for are ignored rather than wasting the call.
+        scores = result['scores']
+        metrics = StoryMetrics(**{metric: scores[metric] for metric in METRIC_NAMES}).scored_for(genre)
         
-        # Get evaluation from GPT
-        response = call_llm(
-            client=self.client,
-            system_prompt_content="You are an expert children's story judge. Respond only with the requested JSON format.",
-            user_prompt_content=prompt,
-            max_tokens=1000,
-            temperature=0.3
-        )
+        # Store metrics for improvement tracking
+        self.revision_history.record(story_id, metrics)
         
-        try:
-            # Parse the response
-            result = eval(response)
-            
-            # Create metrics object
-            metrics = StoryMetrics(**result['scores'])
-            
-            # Store metrics for improvement tracking
-            self.revision_history.append(metrics)
-            
-            # Determine if we should continue revising
-            if revision_count >= MAX_REVISION_CYCLES:
-                return metrics, result['feedback'], "APPROVED"
-                
-            if self.needs_revision(metrics) and self.has_improvement_potential(metrics):
-                return metrics, result['feedback'], "NEEDS_REVISION"
-                
+        # Determine if we should continue revising
+        if revision_count >= MAX_REVISION_CYCLES:
             return metrics, result['feedback'], "APPROVED"
             
-        except Exception as e:
-            raise ValueError(f"Failed to parse judge response: {e}")
+        if self.needs_revision(metrics) and self.has_improvement_potential(metrics, story_id):
+            return metrics, result['feedback'], "NEEDS_REVISION"
+            
+        return metrics, result['feedback'], "APPROVED"
+
+    def evaluate_story(
+        self, 
+        story: str, 
+        age: int, 
+        genre: str = None,
+        revision_count: int = 0,
+        story_id: str = DEFAULT_STORY_ID,
+        speculative: Optional[SpeculativeResult] = None
+    ) -> Tuple[StoryMetrics, List[str], str]:
+        """Evaluate a story and provide metrics, feedback, and judgment.
+
+        Give each story its own story_id when one judge serves many stories;
+        improvement is only ever compared between revisions of the same story.
+        Pass the genre the request was classified as (see GENRE_INDEX), so every
+        draft of a story is weighted the same way. Paragraph checks made while
+        the story streamed (speculative) are merged into the result.
+        """
+        local, prejudgment = self._local_evaluation(story, age, revision_count)
+        if local is not None:
+            return self._process_evaluation(local, revision_count, genre, story_id, speculative)
+
+        prompt = self._build_prompt(story, age, genre)
+        
+        # Get evaluation from GPT
+        with llm_context(agent="judge", stage="judge"):
+            response = call_llm(
+                client=self.client,
+                system_prompt_content=JUDGE_SYSTEM_PROMPT,
+                user_prompt_content=prompt,
+                max_tokens=1000,
+                temperature=0.3
+            )
+        
+            try:
+                result = parse_with_repair(self.client, response, EVALUATION_SCHEMA)
+            except ResponseParseError as e:
+                raise ValueError(f"Failed to parse judge response: {e}")
+        
+        evaluation = self._process_evaluation(result, revision_count, genre, story_id, speculative)
+        self._record_calibration(prejudgment, evaluation[0])
+        return evaluation
     
     def needs_revision(self, metrics: StoryMetrics) -> bool:
         """Check if any metrics fall below quality thresholds."""
@@ -190,13 +328,14 @@ class StoryJudge:
                 return True
         return False
     
-    def has_improvement_potential(self, metrics: StoryMetrics) -> bool:
+    def has_improvement_potential(self, metrics: StoryMetrics, story_id: str = DEFAULT_STORY_ID) -> bool:
         """Check if there's potential for meaningful improvement."""
-        if len(self.revision_history) < 2:
+        history = self.revision_history.get(story_id)
+        if len(history) < 2:
             return True
             
-        previous_metrics = self.revision_history[-2]
-        current_metrics = self.revision_history[-1]
+        previous_metrics = history[-2]
+        current_metrics = history[-1]
         
         # Calculate improvement in both overall and creativity scores
         overall_improvement = current_metrics.overall_score - previous_metrics.overall_score
@@ -206,16 +345,57 @@ class StoryJudge:
                 creativity_improvement > MIN_IMPROVEMENT_THRESHOLD)
     
     def get_genre_suggestions(self, story_idea: str) -> List[Dict]:
-        """Suggest appropriate genres based on the story idea."""
-        suggestions = []
-        for genre_key, genre_info in STORY_GENRES.items():
-            # Check if any keywords from the genre match the story idea
-            if any(keyword.lower() in story_idea.lower() 
-                  for keyword in genre_info["keywords"]):
-                suggestions.append({
-                    "key": genre_key,
-                    "name": genre_info["name"],
-                    "description": genre_info["description"],
-                    "keywords": genre_info["keywords"]
-                })
-        return suggestions if suggestions else [{"key": "FICTION", **STORY_GENRES["FICTION"]}]  # Default to fiction if no match 
\ No newline at end of file
+        """Suggest appropriate genres based on the story idea, best match first."""
+        return GENRE_INDEX.suggest(story_idea)
+
+class AsyncStoryJudge(StoryJudge):
+    """Story judge that talks to the model without blocking the event loop."""
+
+    def __init__(
+        self,
+        client: Optional[AsyncOpenAI] = None,
+        max_tracked_stories: int = DEFAULT_MAX_TRACKED_STORIES,
+        prejudge: Optional[PreJudge] = None
+    ):
+        super().__init__(client or get_async_openai_client(), max_tracked_stories, prejudge)
+
+    async def evaluate_story(
+        self,
+        story: str,
+        age: int,
+        genre: str = None,
+        revision_count: int = 0,
+        story_id: str = DEFAULT_STORY_ID,
+        speculative: Optional[SpeculativeResult] = None
+    ) -> Tuple[StoryMetrics, List[str], str]:
+        """Evaluate a story and provide metrics, feedback, and judgment.
+
+        Give each story its own story_id when one judge serves many stories;
+        improvement is only ever compared between revisions of the same story.
+        Pass the genre the request was classified as (see GENRE_INDEX), so every
+        draft of a story is weighted the same way. Paragraph checks made while
+        the story streamed (speculative) are merged into the result.
+        """
+        local, prejudgment = self._local_evaluation(story, age, revision_count)
+        if local is not None:
+            return self._process_evaluation(local, revision_count, genre, story_id, speculative)
+
+        prompt = self._build_prompt(story, age, genre)
+
+        with llm_context(agent="judge", stage="judge"):
+            response = await async_call_llm(
+                client=self.client,
+                system_prompt_content=JUDGE_SYSTEM_PROMPT,
+                user_prompt_content=prompt,
+                max_tokens=1000,
+                temperature=0.3
+            )
+
+            try:
+                result = await async_parse_with_repair(self.client, response, EVALUATION_SCHEMA)
+            except ResponseParseError as e:
+                raise ValueError(f"Failed to parse judge response: {e}")
+
+        evaluation = self._process_evaluation(result, revision_count, genre, story_id, speculative)
+        self._record_calibration(prejudgment, evaluation[0])
+        return evaluation
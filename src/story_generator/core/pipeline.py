@@ -0,0 +1,328 @@
+"""Asynchronous pipeline that runs many stories through the agents at once."""
+
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field, replace
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+from openai import AsyncOpenAI
+from .planner import AsyncStoryPlanner
+from .generator import AsyncStoryGenerator
+from .judge import AsyncStoryJudge
+from .prejudge import PreJudge
+from .speculative import SpeculativeAbort, SpeculativeEvaluator, SpeculativeResult
+from .events import (
+    StoryEvent,
+    PLAN_READY,
+    REVISION_STARTED,
+    STORY_TOKEN,
+    STORY_COMPLETE,
+    SCORES,
+    FINAL
+)
+from ..config.metrics import StoryMetrics, MAX_REVISION_CYCLES
+from ..utils.http_client import get_async_openai_client
+from ..utils.plan_library import PlanLibrary
+from ..utils.story_archive import StoryArchive
+from ..utils.near_duplicates import NearDuplicateIndex
+from ..utils.genre_index import GENRE_INDEX
+from ..utils.instrumentation import Span, llm_context, profile_story
+
+# Number of stories allowed in flight at once
+DEFAULT_MAX_CONCURRENCY = 100
+
+@dataclass
+class StoryRequest:
+    request: str
+    age: int
+    genre: Optional[str] = None
+
+@dataclass
+class StoryResult:
+    request: StoryRequest
+    plan: Optional[Dict] = None
+    story: str = ""
+    metrics: Optional[StoryMetrics] = None
+    feedback: List[str] = field(default_factory=list)
+    judgment: str = ""
+    revisions: int = 0
+    revision_metrics: List[StoryMetrics] = field(default_factory=list)  # Scores of each judged draft
+    error: Optional[str] = None
+    spans: List[Span] = field(default_factory=list)  # One per LLM call made for this story
+    duplicate_of: Optional[str] = None  # Archive story_id this story was served or seeded from
+
+    def as_dict(self) -> Dict:
+        """The outcome as plain JSON-serializable data (the FINAL event's payload)."""
+        if self.error:
+            return {"error": self.error}
+        return {
+            "plan": self.plan,
+            "story": self.story,
+            "scores": self.metrics.as_dict() if self.metrics else None,
+            "overall_score": self.metrics.overall_score if self.metrics else None,
+            "feedback": self.feedback,
+            "judgment": self.judgment,
+            "revisions": self.revisions,
+            "duplicate_of": self.duplicate_of
+        }
+
+EventCallback = Callable[[StoryEvent], None]
+
+def _ignore_event(event: StoryEvent):
+    pass
+
+class StoryPipeline:
+    def __init__(
+        self,
+        client: Optional[AsyncOpenAI] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        candidates: int = 1,
+        prejudge: Optional[PreJudge] = None,
+        plan_library: Optional[PlanLibrary] = None,
+        archive: Optional[StoryArchive] = None,
+        dedup: Optional[NearDuplicateIndex] = None,
+        speculative: bool = False
+    ):
+        """candidates > 1 writes that many stories per round and keeps the best (best-of-N).
+
+        A prejudge settles clear-cut stories locally instead of asking the judge,
+        a plan_library serves outlines for repeated requests, and finished
+        stories are queued into the archive when one is given. With both an
+        archive and a dedup index, a near-duplicate of an approved request is
+        served from the archive, and a looser match reuses its plan.
+        speculative checks each paragraph while the story streams, cutting
+        short drafts that start out clearly unsafe (see core.speculative).
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if candidates < 1:
+            raise ValueError("candidates must be at least 1")
+        self.client = client or get_async_openai_client()
+        self.max_concurrency = max_concurrency
+        self.candidates = candidates
+        self.archive = archive
+        self.dedup = dedup if archive is not None else None
+        self.speculative = speculative
+        self.planner = AsyncStoryPlanner(self.client, plan_library)
+        self.generator = AsyncStoryGenerator(self.client)
+        self.judge = AsyncStoryJudge(self.client, prejudge=prejudge)
+
+    async def run(self, story_request: StoryRequest, on_event: Optional[EventCallback] = None) -> StoryResult:
+        """Plan, generate, judge, and revise a single story.
+
+        on_event receives the run's StoryEvents as they happen (see core.events).
+        A request without a genre is classified once here, so the plan, every
+        draft's scores, and the archive all use the same genre.
+        """
+        emit = on_event or _ignore_event
+        if not story_request.genre:
+            story_request = replace(story_request, genre=GENRE_INDEX.best_genre(story_request.request))
+        result = StoryResult(request=story_request)
+        duplicate, similarity = None, 0.0
+        if self.dedup is not None:
+            # The dedup index and archive read files and SQLite, so keep them off the event loop
+            duplicate, similarity = await asyncio.to_thread(self._find_duplicate, story_request)
+        if duplicate is not None and similarity >= self.dedup.serve_threshold:
+            self._serve_archived(result, duplicate)
+            emit(StoryEvent(PLAN_READY, {"plan": result.plan, "duplicate_of": result.duplicate_of}))
+            emit(StoryEvent(STORY_COMPLETE, {"story": result.story, "revision": 0}))
+            emit(self._scores_event(result))
+            emit(StoryEvent(FINAL, result.as_dict()))
+            return result
+        # The shared judge tracks revisions per story; drop them once the story is done
+        story_id = uuid.uuid4().hex
+        start = time.perf_counter()
+        with profile_story() as spans:
+            result.spans = spans
+            try:
+                await self._run_stages(story_request, result, story_id, emit, seed=duplicate)
+            finally:
+                self.judge.revision_history.discard(story_id)
+        if self.archive is not None:
+            self.archive.record_result(result, time.perf_counter() - start, story_id)
+            if self.dedup is not None and result.judgment == "APPROVED" and not result.error:
+                await asyncio.to_thread(self.dedup.add, story_request.request, story_request.age, story_id)
+        emit(StoryEvent(FINAL, result.as_dict()))
+        return result
+
+    async def stream(self, story_request: StoryRequest) -> AsyncIterator[StoryEvent]:
+        """Run a story, yielding its events as they happen; the last one is FINAL.
+
+        Closing the iterator early cancels the run.
+        """
+        events: asyncio.Queue = asyncio.Queue()
+        task = asyncio.create_task(self.run(story_request, on_event=events.put_nowait))
+
+        def failed(task: asyncio.Task):
+            if not task.cancelled() and task.exception() is not None:
+                events.put_nowait(StoryEvent(FINAL, {"error": str(task.exception())}))
+
+        task.add_done_callback(failed)
+        try:
+            while True:
+                event = await events.get()
+                yield event
+                if event.type == FINAL:
+                    return
+        finally:
+            if not task.done():
+                task.cancel()
+
+    @staticmethod
+    def _scores_event(result: StoryResult) -> StoryEvent:
+        return StoryEvent(SCORES, {
+            "revision": result.revisions,
+            "scores": result.metrics.as_dict(),
+            "overall_score": result.metrics.overall_score,
+            "judgment": result.judgment,
+            "feedback": result.feedback
+        })
+
+    def _find_duplicate(self, story_request: StoryRequest) -> Tuple[Optional[Dict], float]:
+        """The archived story of the closest approved request, and how similar the requests are."""
+        if self.dedup is None:
+            return None, 0.0
+        match = self.dedup.lookup(story_request.request, story_request.age)
+        if match is None:
+            return None, 0.0
+        # Still queued for writing, or written for another genre: not a usable duplicate
+        row = self.archive.find(match.story_id)
+        if row is None or (story_request.genre and row["genre"] and story_request.genre.upper() != row["genre"]):
+            return None, 0.0
+        return row, match.similarity
+
+    def _serve_archived(self, result: StoryResult, row: Dict):
+        result.plan = row["plan"]
+        result.story = row["story"]
+        result.metrics = self.archive.metrics_of(row)
+        result.judgment = row["judgment"] or "APPROVED"
+        result.duplicate_of = row["story_id"]
+
+    async def _run_stages(
+        self,
+        story_request: StoryRequest,
+        result: StoryResult,
+        story_id: str,
+        emit: EventCallback,
+        seed: Optional[Dict] = None
+    ):
+        if seed is not None and seed["plan"]:
+            # A similar request's approved outline stands in for planning
+            result.plan = seed["plan"]
+            result.duplicate_of = seed["story_id"]
+        else:
+            result.plan = await self.planner.create_outline(
+                story_request.request, story_request.age, story_request.genre
+            )
+        emit(StoryEvent(PLAN_READY, {"plan": result.plan, "duplicate_of": result.duplicate_of}))
+        await self._write_and_judge(story_request, result, story_id, emit)
+
+        while result.judgment == "NEEDS_REVISION" and result.revisions < MAX_REVISION_CYCLES:
+            result.revisions += 1
+            emit(StoryEvent(REVISION_STARTED, {"revision": result.revisions, "feedback": result.feedback}))
+            with llm_context(revision=result.revisions):
+                await self._write_and_judge(story_request, result, story_id, emit, feedback=result.feedback)
+
+    async def _write_and_judge(
+        self,
+        story_request: StoryRequest,
+        result: StoryResult,
+        story_id: str,
+        emit: EventCallback,
+        feedback: Optional[List[str]] = None
+    ):
+        """Write (or rewrite) the story and judge it, best-of-N when configured."""
+        if self.candidates > 1:
+            best = await self.generator.generate_best_of(
+                story_request.request,
+                story_request.age,
+                result.plan,
+                self.judge,
+                n=self.candidates,
+                genre=story_request.genre,
+                feedback=feedback,
+                revision_count=result.revisions
+            )
+            result.story, result.metrics, result.feedback, result.judgment = (
+                best.story, best.metrics, best.feedback, best.judgment
+            )
+            result.revision_metrics.append(result.metrics)
+            emit(StoryEvent(STORY_COMPLETE, {"story": result.story, "revision": result.revisions}))
+            emit(self._scores_event(result))
+            return
+
+        speculation = None
+        if feedback and result.story:
+            # Patch the judged draft rather than writing a new story from scratch
+            result.story = await self.generator.revise_story(
+                story_request.request,
+                story_request.age,
+                result.plan,
+                result.story,
+                feedback
+            )
+        else:
+            result.story, speculation = await self._generate(story_request, result, emit, feedback)
+        emit(StoryEvent(STORY_COMPLETE, {"story": result.story, "revision": result.revisions}))
+        result.metrics, result.feedback, result.judgment = await self.judge.evaluate_story(
+            result.story,
+            story_request.age,
+            story_request.genre,
+            revision_count=result.revisions,
+            story_id=story_id,
+            speculative=speculation
+        )
+        result.revision_metrics.append(result.metrics)
+        emit(self._scores_event(result))
+
+    async def _generate(
+        self,
+        story_request: StoryRequest,
+        result: StoryResult,
+        emit: EventCallback,
+        feedback: Optional[List[str]]
+    ) -> Tuple[str, Optional[SpeculativeResult]]:
+        """Write a full draft, streaming its text; speculatively checked when enabled."""
+        evaluator = SpeculativeEvaluator(story_request.age) if self.speculative else None
+        restart = False
+
+        def on_chunk(chunk):
+            nonlocal restart
+            emit(StoryEvent(STORY_TOKEN, {
+                "text": chunk.text, "restart": chunk.restart or restart, "revision": result.revisions
+            }))
+            restart = False
+            if evaluator is not None:
+                evaluator.feed_chunk(chunk)
+
+        try:
+            story = await self.generator.generate_story(
+                story_request.request, story_request.age, result.plan, feedback=feedback, on_chunk=on_chunk
+            )
+        except SpeculativeAbort as abort:
+            # Redirect once, saying what went wrong; the new draft is left to the judge
+            evaluator = SpeculativeEvaluator(story_request.age, abort=False)
+            restart = True
+            story = await self.generator.generate_story(
+                story_request.request,
+                story_request.age,
+                result.plan,
+                feedback=list(feedback or []) + abort.feedback,
+                on_chunk=on_chunk
+            )
+        return story, evaluator.finish() if evaluator is not None else None
+
+    async def _run_guarded(self, story_request: StoryRequest, semaphore: asyncio.Semaphore) -> StoryResult:
+        """Run one story under the concurrency limit, recording any failure."""
+        async with semaphore:
+            try:
+                return await self.run(story_request)
+            except Exception as e:
+                return StoryResult(request=story_request, error=str(e))
+
+    async def run_many(self, requests: Iterable[StoryRequest]) -> List[StoryResult]:
+        """Run many stories concurrently, returning results in request order."""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        return await asyncio.gather(
+            *(self._run_guarded(story_request, semaphore) for story_request in requests)
+        )
@@ -1,8 +1,13 @@
 """Story planning agent that creates detailed outlines."""
 
-from typing import Dict
-from openai import OpenAI
-from ..utils.llm_utils import call_llm
+import asyncio
+from typing import Dict, Optional
+from openai import OpenAI, AsyncOpenAI
+from ..utils.llm_utils import call_llm, async_call_llm
+from ..utils.http_client import get_openai_client, get_async_openai_client
+from ..utils.instrumentation import llm_context
+from ..utils.plan_library import PlanLibrary
+from ..utils.response_parser import parse_with_repair, async_parse_with_repair, ResponseParseError
 
 PLANNING_PROMPT = """You are an expert children's story planner. Create a detailed story outline incorporating these key elements:
 
@@ -88,43 +93,118 @@ FORMAT YOUR RESPONSE AS:
     ]
 }}"""
 
+# Shape a plan must have before it is handed to the generator
+PLAN_SCHEMA = {
+    "title": str,
+    "characters": {
+        "main": {"name": str, "description": str, "emotional_journey": str},
+        "supporting": [{"name": str, "role": str}]
+    },
+    "plot_outline": {"setup": str, "challenge": str, "resolution": str, "ending": str},
+    "theme": {"main_message": str, "teaching_moments": [str]},
+    "engagement_elements": [str],
+    "vocabulary": {"new_words": [{"word": str, "context": str}]},
+    "cognitive_elements": [str]
+}
+
+PLANNER_SYSTEM_PROMPT = "You are an expert children's story planner. Respond only with the requested JSON format."
+
+def validate_plan(plan: Dict, age: int) -> bool:
+    """Validate that the plan meets our requirements."""
+    checks = [
+        len(plan['plot_outline']['setup']) > 0,
+        len(plan['characters']['main']['description']) > 0,
+        len(plan['theme']['teaching_moments']) > 0,
+        len(plan['engagement_elements']) > 0,
+        len(plan['vocabulary']['new_words']) <= 3,  # Max 3 new words
+        all(len(word['context']) > 0 for word in plan['vocabulary']['new_words']),
+        len(plan['cognitive_elements']) > 0
+    ]
+
+    return all(checks)
+
 class StoryPlanner:
-    def __init__(self, client: OpenAI):
-        self.client = client
+    def __init__(self, client: Optional[OpenAI] = None, library: Optional[PlanLibrary] = None):
+        """With a library, outlines for repeated requests are served from it instead of the model.
+
+        Build the library with validator=validate_plan so only usable outlines are kept.
+        """
+        self.client = client or get_openai_client()
+        self.library = library
     
-    def create_outline(self, request: str, age: int) -> Dict:
-        """Create a detailed story outline."""
-        prompt = PLANNING_PROMPT.format(
+    def _build_prompt(self, request: str, age: int) -> str:
+        """Build the planning prompt for a request."""
+        return PLANNING_PROMPT.format(
             request=request,
             age=age
         )
+
+    def create_outline(self, request: str, age: int, genre: Optional[str] = None) -> Dict:
+        """Create a detailed story outline."""
+        if self.library is not None:
+            plan = self.library.get(request, age, genre)
+            if plan is not None:
+                return plan
+
+        prompt = self._build_prompt(request, age)
         
         # Get plan from GPT
-        response = call_llm(
-            client=self.client,
-            system_prompt_content="You are an expert children's story planner. Respond only with the requested JSON format.",
-            user_prompt_content=prompt,
-            max_tokens=1000,
-            temperature=0.7  # Allow some creativity
-        )
+        with llm_context(agent="planner", stage="plan"):
+            response = call_llm(
+                client=self.client,
+                system_prompt_content=PLANNER_SYSTEM_PROMPT,
+                user_prompt_content=prompt,
+                max_tokens=1000,
+                temperature=0.7,  # Allow some creativity
+                use_cache=False
+            )
         
-        try:
-            # Parse the response as JSON
-            plan = eval(response)  # Safe since we control the input format
-            return plan
-        except Exception as e:
-            raise ValueError(f"Failed to parse planning response: {e}")
-            
+            try:
+                plan = parse_with_repair(self.client, response, PLAN_SCHEMA)
+            except ResponseParseError as e:
+                raise ValueError(f"Failed to parse planning response: {e}")
+
+        if self.library is not None:
+            self.library.add(request, age, plan, genre)
+        return plan
+
     def validate_plan(self, plan: Dict, age: int) -> bool:
         """Validate that the plan meets our requirements."""
-        checks = [
-            len(plan['plot_outline']['setup']) > 0,
-            len(plan['characters']['main']['description']) > 0,
-            len(plan['theme']['teaching_moments']) > 0,
-            len(plan['engagement_elements']) > 0,
-            len(plan['vocabulary']['new_words']) <= 3,  # Max 3 new words
-            all(len(word['context']) > 0 for word in plan['vocabulary']['new_words']),
-            len(plan['cognitive_elements']) > 0
-        ]
-        
-        return all(checks) 
\ No newline at end of file
+        return validate_plan(plan, age)
+
+class AsyncStoryPlanner(StoryPlanner):
+    """Story planner that talks to the model without blocking the event loop."""
+
+    def __init__(self, client: Optional[AsyncOpenAI] = None, library: Optional[PlanLibrary] = None):
+        super().__init__(client or get_async_openai_client(), library)
+
+    async def create_outline(self, request: str, age: int, genre: Optional[str] = None) -> Dict:
+        """Create a detailed story outline.
+
+        Plan library lookups and writes hit SQLite, so they run in a worker thread.
+        """
+        if self.library is not None:
+            plan = await asyncio.to_thread(self.library.get, request, age, genre)
+            if plan is not None:
+                return plan
+
+        prompt = self._build_prompt(request, age)
+
+        with llm_context(agent="planner", stage="plan"):
+            response = await async_call_llm(
+                client=self.client,
+                system_prompt_content=PLANNER_SYSTEM_PROMPT,
+                user_prompt_content=prompt,
+                max_tokens=1000,
+                temperature=0.7,
+                use_cache=False
+            )
+
+            try:
+                plan = await async_parse_with_repair(self.client, response, PLAN_SCHEMA)
+            except ResponseParseError as e:
+                raise ValueError(f"Failed to parse planning response: {e}")
+
+        if self.library is not None:
+            await asyncio.to_thread(self.library.add, request, age, plan, genre)
+        return plan
@@ -0,0 +1,289 @@
+"""Local heuristic pre-judge that settles clear-cut stories without an LLM call.
+
+Readability (Flesch-Kincaid grade), sentence length statistics, long-word
+ratio, length against MAX_WORDS_BY_AGE, forbidden keywords, the tone of each
+paragraph (distressing against comforting words), and simple structure
+detection give local estimates of a few StoryMetrics. Stories that are
+clearly below the quality thresholds are sent back for revision straight
+away; clearly good ones can skip the judge too (trust_accepts, the
+--trust-prejudge flag) once the calibration report shows the estimates agree
+with the LLM, but only when emotional safety was actually estimated.
+Everything else is escalated.
+
+Calibrate against the output of a batch run made without --prejudge, so
+every score in it came from the judge:
+    python -m src.story_generator.core.prejudge stories.jsonl
+"""
+
+import argparse
+import json
+import math
+import re
+import statistics
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+from .generator import MAX_WORDS_BY_AGE, COMPLEX_WORD_RATIO
+from ..config.content_filter import AGE_GUIDELINES, DISTRESS_WORDS, COMFORT_WORDS
+from ..config.metrics import StoryMetrics, BASE_QUALITY_THRESHOLDS
+from ..utils.keyword_matcher import FORBIDDEN_MATCHER, KeywordMatcher
+from ..utils.text_stats import TextStats
+
+# Decisions
+REJECT = "REJECT"  # Clearly below the thresholds; revise without asking the judge
+ACCEPT = "ACCEPT"  # Clearly above the estimated thresholds
+ESCALATE = "ESCALATE"  # Borderline; needs the LLM judge
+
+# Flesch-Kincaid grade a story may reach for each age (AGE_GUIDELINES' language levels)
+READING_GRADE_BY_AGE = {5: 2.0, 6: 3.0, 7: 4.0, 8: 5.0, 9: 6.0, 10: 7.0}
+GRADE_TOLERANCE = 1.5  # Grades above the target before the vocabulary estimate drops
+
+# Comfortable average sentence length (words) for each age
+SENTENCE_WORDS_BY_AGE = {5: 10, 6: 11, 7: 13, 8: 14, 9: 16, 10: 18}
+
+# Estimates this far below a threshold reject; this far above accept
+REJECT_MARGIN = 0.15
+ACCEPT_MARGIN = 0.05
+
+# Metrics an accepted story needs a real local estimate of before it may skip the judge
+ACCEPT_REQUIRES = ("emotional_safety",)
+
+# Distress offset by each comforting word in the same paragraph
+COMFORT_CREDIT = 0.01
+
+_DISTRESS = "DISTRESS"
+_COMFORT = "COMFORT"
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+TONE_MATCHER = KeywordMatcher(
+    [(word, _DISTRESS) for word in DISTRESS_WORDS] + [(word, _COMFORT) for word in COMFORT_WORDS]
+)
+
+_OPENING = re.compile(r"^\W*(once upon a time|one (day|night|morning|evening)|long ago|in a\b|there (was|lived))", re.I)
+_ENDING = re.compile(r"(the end|happily ever after|sweet dreams|good ?night|fell asleep|drifted off|asleep)\W*$", re.I)
+
+def _clamp(value: float) -> float:
+    return max(0.0, min(1.0, value))
+
+def estimate_vocabulary(stats: TextStats, age: int) -> Tuple[float, str]:
+    """Vocabulary estimate from reading grade and long-word share, with advice when it is too hard."""
+    target_grade = READING_GRADE_BY_AGE.get(age, 5.0)
+    grade_gap = max(0.0, stats.grade_level - target_grade - GRADE_TOLERANCE)
+    long_word_excess = max(0.0, stats.long_word_ratio - COMPLEX_WORD_RATIO)
+    advice = ""
+    if grade_gap > 0 or long_word_excess > 0:
+        advice = (
+            f"reads at grade {stats.grade_level:.1f}, aim for about grade {target_grade:.0f} "
+            f"({AGE_GUIDELINES.get(age, {}).get('language_level', 'simple language')})"
+        )
+    return _clamp(0.95 - 0.12 * grade_gap - 4.0 * long_word_excess), advice
+
+def estimate_tone(passage: str) -> Tuple[float, List[str]]:
+    """Emotional safety of one passage from its distressing and comforting words, and the distress found."""
+    tones = TONE_MATCHER.find_all(passage)
+    distress = [match.keyword for match in tones if match.topic == _DISTRESS]
+    comfort = sum(1 for match in tones if match.topic == _COMFORT)
+    weight = sum(DISTRESS_WORDS[word] for word in distress)
+    return _clamp(1.0 - max(0.0, weight - COMFORT_CREDIT * comfort)), distress
+
+@dataclass
+class PreJudgment:
+    decision: str
+    estimates: Dict[str, float]  # Locally estimated metrics
+    feedback: List[str] = field(default_factory=list)
+    stats: Optional[TextStats] = None
+
+    def scores(self) -> Dict[str, float]:
+        """Full score set for a story that skips the judge.
+
+        Metrics that cannot be estimated locally are reported at their threshold;
+        see unestimated() for which ones those are.
+        """
+        return {**BASE_QUALITY_THRESHOLDS, **self.estimates}
+
+    def unestimated(self) -> List[str]:
+        """Metrics scores() fills in at their threshold because nothing local assessed them."""
+        return [metric for metric in BASE_QUALITY_THRESHOLDS if metric not in self.estimates]
+
+class PreJudge:
+    """Scores a story locally and decides whether the LLM judge is needed."""
+
+    def __init__(self, trust_accepts: bool = False):
+        # Skipping the judge for accepted stories is opt-in (--trust-prejudge), after calibration
+        self.trust_accepts = trust_accepts
+        self.calibration = CalibrationReport()
+
+    def estimate(
+        self,
+        story: str,
+        age: int,
+        stats: Optional[TextStats] = None
+    ) -> Tuple[Dict[str, float], List[str], TextStats]:
+        """Estimate the metrics local signals can speak to, with feedback for low ones."""
+        stats = stats or TextStats.from_text(story)
+        feedback = []
+        estimates = {}
+
+        estimates["age_appropriate_vocabulary"], advice = estimate_vocabulary(stats, age)
+        if advice:
+            feedback.append(f"Use simpler words and shorter sentences: the story {advice}.")
+
+        # Attention span: length against the age limit, and sentence length
+        max_words = MAX_WORDS_BY_AGE.get(age, 800)
+        length_ratio = stats.words / max_words
+        comfortable = SENTENCE_WORDS_BY_AGE.get(age, 14)
+        sentence_excess = max(0.0, stats.words_per_sentence - comfortable)
+        attention = 0.95 - 1.5 * max(0.0, length_ratio - 1.0) - 0.6 * max(0.0, 0.3 - length_ratio) - 0.03 * sentence_excess
+        estimates["attention_span_fit"] = _clamp(attention)
+        if length_ratio > 1.0:
+            feedback.append(f"Shorten the story to under {max_words} words for age {age} (it has {stats.words}).")
+        elif length_ratio < 0.3:
+            feedback.append(f"The story is very short ({stats.words} words); develop the plot a little more.")
+        if sentence_excess > 0:
+            feedback.append(
+                f"Sentences average {stats.words_per_sentence:.0f} words; keep them nearer {comfortable} for age {age}."
+            )
+
+        # Structure: paragraphs, a clear opening, and a settled ending
+        stripped = story.strip()
+        has_opening = bool(_OPENING.search(stripped[:200]))
+        has_ending = bool(_ENDING.search(stripped[-200:]))
+        structure = 0.45 + 0.1 * min(stats.paragraphs, 3) + 0.05 * has_opening + 0.15 * has_ending
+        estimates["plot_structure"] = _clamp(structure)
+        if stats.paragraphs < 3:
+            feedback.append("Break the story into paragraphs with a clear beginning, middle, and end.")
+        if not has_ending:
+            feedback.append("Close with a calm, settled ending that leads gently to sleep.")
+
+        # Safety: a forbidden keyword is decisive; otherwise the most upsetting paragraph counts
+        matches = FORBIDDEN_MATCHER.find_all(story)
+        if matches:
+            estimates["emotional_safety"] = 0.3
+            found = ", ".join(dict.fromkeys(match.keyword for match in matches))
+            feedback.append(f"Remove content that is not suitable for children (found: {found}).")
+        else:
+            tones = [estimate_tone(paragraph) for paragraph in _PARAGRAPH_BREAK.split(stripped) if paragraph.strip()]
+            safety, distress = min(tones, default=(1.0, []))
+            estimates["emotional_safety"] = safety
+            if safety < BASE_QUALITY_THRESHOLDS["emotional_safety"]:
+                found = ", ".join(dict.fromkeys(distress))
+                feedback.append(f"Keep any tension mild and resolve it gently (too upsetting: {found}).")
+
+        return estimates, feedback, stats
+
+    def assess(self, story: str, age: int, stats: Optional[TextStats] = None) -> PreJudgment:
+        """Decide whether a story is clearly bad, clearly good, or needs the judge."""
+        estimates, feedback, stats = self.estimate(story, age, stats)
+        margins = [value - BASE_QUALITY_THRESHOLDS[metric] for metric, value in estimates.items()]
+        if min(margins) < -REJECT_MARGIN:
+            decision = REJECT
+        elif min(margins) >= ACCEPT_MARGIN:
+            decision = ACCEPT
+        else:
+            decision = ESCALATE
+        return PreJudgment(decision, estimates, feedback, stats)
+
+    def skips_judge(self, judgment: PreJudgment) -> bool:
+        if judgment.decision == REJECT:
+            return True
+        # Filled-in thresholds are not passes: never approve safety that nothing checked
+        return (
+            judgment.decision == ACCEPT
+            and self.trust_accepts
+            and not set(ACCEPT_REQUIRES).intersection(judgment.unestimated())
+        )
+
+class CalibrationReport:
+    """Compares local estimates with the LLM judge's scores for the same stories."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pairs: Dict[str, List[Tuple[float, float]]] = {}
+        self.decisions: Dict[Tuple[str, bool], int] = {}  # (local decision, judge wanted revision) -> count
+
+    def record(self, judgment: PreJudgment, metrics: StoryMetrics):
+        needs_revision = any(
+            getattr(metrics, metric) < threshold for metric, threshold in BASE_QUALITY_THRESHOLDS.items()
+        )
+        with self._lock:
+            for metric, estimate in judgment.estimates.items():
+                self.pairs.setdefault(metric, []).append((estimate, getattr(metrics, metric)))
+            key = (judgment.decision, needs_revision)
+            self.decisions[key] = self.decisions.get(key, 0) + 1
+
+    def metric_summary(self) -> Dict[str, Dict[str, float]]:
+        """Per metric: count, bias (mean estimate - judge), mean absolute error, and correlation."""
+        summary = {}
+        with self._lock:
+            for metric, pairs in sorted(self.pairs.items()):
+                errors = [estimate - actual for estimate, actual in pairs]
+                correlation = float("nan")
+                if len(pairs) > 1:
+                    estimates, actuals = zip(*pairs)
+                    if statistics.pstdev(estimates) > 0 and statistics.pstdev(actuals) > 0:
+                        correlation = _pearson(estimates, actuals)
+                summary[metric] = {
+                    "count": len(pairs),
+                    "bias": statistics.fmean(errors),
+                    "mae": statistics.fmean(abs(error) for error in errors),
+                    "correlation": correlation,
+                }
+        return summary
+
+    def decision_agreement(self) -> Dict[str, Dict[str, int]]:
+        """How often the judge agreed with each local decision."""
+        with self._lock:
+            return {
+                decision: {
+                    "judge_revise": self.decisions.get((decision, True), 0),
+                    "judge_approve": self.decisions.get((decision, False), 0),
+                }
+                for decision in (REJECT, ACCEPT, ESCALATE)
+            }
+
+    def format(self) -> str:
+        header = f"{'metric':<28} {'n':>5} {'bias':>7} {'mae':>6} {'corr':>6}"
+        lines = [header, "-" * len(header)]
+        for metric, row in self.metric_summary().items():
+            lines.append(
+                f"{metric:<28} {row['count']:>5} {row['bias']:>+7.3f} {row['mae']:>6.3f} {row['correlation']:>6.2f}"
+            )
+        lines.append("")
+        lines.append(f"{'local decision':<16} {'judge: revise':>14} {'judge: approve':>15}")
+        for decision, counts in self.decision_agreement().items():
+            lines.append(f"{decision:<16} {counts['judge_revise']:>14} {counts['judge_approve']:>15}")
+        return "\n".join(lines)
+
+def _pearson(xs: Iterable[float], ys: Iterable[float]) -> float:
+    xs, ys = list(xs), list(ys)
+    mean_x, mean_y = statistics.fmean(xs), statistics.fmean(ys)
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    spread = math.sqrt(sum((x - mean_x) ** 2 for x in xs) * sum((y - mean_y) ** 2 for y in ys))
+    return covariance / spread if spread else float("nan")
+
+def calibrate(records: Iterable[Dict], prejudge: Optional[PreJudge] = None) -> CalibrationReport:
+    """Pre-judge already judged stories ({"story", "age", "scores"}) and compare with their scores."""
+    prejudge = prejudge or PreJudge()
+    for record in records:
+        if not record.get("story") or not record.get("scores"):
+            continue
+        judgment = prejudge.assess(record["story"], int(record["age"]))
+        prejudge.calibration.record(judgment, StoryMetrics(**record["scores"]))
+    return prejudge.calibration
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the local pre-judge against judged stories.")
+    parser.add_argument("stories", help="Batch output JSONL with story, age, and scores")
+    args = parser.parse_args()
+
+    def records():
+        with open(args.stories, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+    print(calibrate(records()).format())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Speculative judging: cheap per-paragraph checks while a story streams.
+
+Each paragraph is scored for emotional safety (distressing against comforting
+words) and vocabulary (reading grade) the moment it is complete, so by the
+last token the local half of the evaluation is already done and the judge's
+LLM pass starts straight away. When one of the first paragraphs clearly fails
+the emotional_safety threshold, the draft is cut short and written again with
+that problem spelled out, instead of paying for the rest of a story the judge
+would send back.
+
+Once the judge has scored the full story, the paragraph results are merged
+in: decisive local estimates cap the judge's scores, and metrics that need
+revision get feedback naming the paragraphs to fix, which the paragraph
+patcher can act on directly.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List
+from .prejudge import REJECT_MARGIN, estimate_tone, estimate_vocabulary
+from ..config.metrics import BASE_QUALITY_THRESHOLDS
+from ..utils.instrumentation import METRICS
+from ..utils.text_stats import TextStats
+
+# Paragraphs that can cut a draft short; later trouble is left to the revision round
+ABORT_WINDOW = 3
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+@dataclass
+class ParagraphCheck:
+    number: int  # 1-based, as in revision patches
+    words: int
+    emotional_safety: float
+    age_appropriate_vocabulary: float
+    distress: List[str] = field(default_factory=list)
+    vocabulary_advice: str = ""
+
+    def feedback(self, metric: str) -> str:
+        if metric == "emotional_safety":
+            return (
+                f"Paragraph {self.number} is too upsetting for bedtime ({', '.join(dict.fromkeys(self.distress))}); "
+                "keep any tension mild and resolve it gently."
+            )
+        return f"Paragraph {self.number} {self.vocabulary_advice}; use simpler words there."
+
+class SpeculativeAbort(Exception):
+    """Raised from a stream callback to cut a draft short; feedback says what to write differently."""
+
+    def __init__(self, check: ParagraphCheck):
+        self.check = check
+        self.feedback = [check.feedback("emotional_safety")]
+        super().__init__(self.feedback[0])
+
+@dataclass
+class SpeculativeResult:
+    paragraphs: List[ParagraphCheck]
+    estimates: Dict[str, float]  # Whole-story estimates built from the paragraphs
+
+    def below_threshold(self, metric: str) -> List[ParagraphCheck]:
+        threshold = BASE_QUALITY_THRESHOLDS[metric]
+        return [check for check in self.paragraphs if getattr(check, metric) < threshold]
+
+    def merge(self, evaluation: Dict) -> Dict:
+        """Merge into a judge evaluation ({"scores": ..., "feedback": ...}).
+
+        Estimates clearly below a threshold cap the judge's score, and every
+        metric left below its threshold gets feedback on the paragraphs at fault.
+        """
+        scores = dict(evaluation["scores"])
+        feedback = list(evaluation["feedback"])
+        for metric, estimate in self.estimates.items():
+            threshold = BASE_QUALITY_THRESHOLDS[metric]
+            if estimate < threshold - REJECT_MARGIN:
+                scores[metric] = min(scores[metric], estimate)
+            if scores[metric] < threshold:
+                feedback.extend(check.feedback(metric) for check in self.below_threshold(metric))
+        return {"scores": scores, "feedback": list(dict.fromkeys(feedback))}
+
+class SpeculativeEvaluator:
+    """Scores one draft paragraph by paragraph as its text streams in."""
+
+    def __init__(self, age: int, abort: bool = True):
+        self.age = age
+        self.abort = abort
+        self.paragraphs: List[ParagraphCheck] = []
+        self._buffer = ""
+
+    def feed_chunk(self, chunk) -> None:
+        """Take a StoryChunk; raises SpeculativeAbort when an early paragraph clearly fails."""
+        if chunk.restart:
+            # A safe replacement story follows; it is already written under strict rules
+            self.paragraphs = []
+            self._buffer = ""
+            self.abort = False
+        self.feed(chunk.text)
+
+    def feed(self, text: str):
+        self._buffer += text
+        *complete, self._buffer = _PARAGRAPH_BREAK.split(self._buffer)
+        for paragraph in complete:
+            self._check(paragraph, self.abort)
+
+    def _check(self, paragraph: str, abort: bool):
+        if not paragraph.strip():
+            return
+        stats = TextStats.from_text(paragraph)
+        safety, distress = estimate_tone(paragraph)
+        vocabulary, advice = estimate_vocabulary(stats, self.age)
+        check = ParagraphCheck(
+            number=len(self.paragraphs) + 1,
+            words=stats.words,
+            emotional_safety=safety,
+            age_appropriate_vocabulary=vocabulary,
+            distress=distress,
+            vocabulary_advice=advice
+        )
+        self.paragraphs.append(check)
+        threshold = BASE_QUALITY_THRESHOLDS["emotional_safety"] - REJECT_MARGIN
+        if abort and check.number <= ABORT_WINDOW and check.emotional_safety < threshold:
+            METRICS.increment("speculative_aborts_total", ())
+            raise SpeculativeAbort(check)
+
+    def finish(self) -> SpeculativeResult:
+        """Check the last paragraph and summarize the draft."""
+        self._check(self._buffer, abort=False)
+        self._buffer = ""
+        words = sum(check.words for check in self.paragraphs)
+        estimates = {}
+        if self.paragraphs:
+            # One upsetting paragraph is enough to unsettle a child; hard words average out
+            estimates["emotional_safety"] = min(check.emotional_safety for check in self.paragraphs)
+            estimates["age_appropriate_vocabulary"] = sum(
+                check.age_appropriate_vocabulary * check.words for check in self.paragraphs
+            ) / max(words, 1)
+        return SpeculativeResult(self.paragraphs, estimates)
@@ -20,25 +20,97 @@ where children could make choices that influence the story's direction.
 
 """
 
-from .core.planner import StoryPlanner
-from .core.generator import StoryGenerator
+import argparse
+import time
+from typing import Optional
+from .core.planner import StoryPlanner, validate_plan
+from .core.generator import StoryChunk, StoryGenerator
 from .core.judge import StoryJudge
+from .core.prejudge import PreJudge
+from .config.genres import STORY_GENRES
+from .config.metrics import DEFAULT_METRICS_STORAGE
+from .utils.plan_library import PlanLibrary
+from .utils.genre_index import GENRE_INDEX
+from .utils.story_archive import ArchiveRecord, StoryArchive
 from .utils.llm_utils import initialize_openai_client
+from .utils.http_client import ClientInitializationError
+from .utils.instrumentation import llm_context, profile_story, format_profile
 
 def main():
     """Main application logic."""
+    parser = argparse.ArgumentParser(description="Magical Bedtime Story Generator")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print a latency, token, and cost breakdown of every model call")
+    parser.add_argument("--candidates", type=int, default=1,
+                        help="Write this many stories at once and keep the best one (default: 1)")
+    parser.add_argument("--prejudge", action="store_true",
+                        help="Check stories locally first and skip the judge for clearly weak ones")
+    parser.add_argument("--trust-prejudge", action="store_true",
+                        help="With --prejudge, also skip the judge for clearly good stories (calibrate first)")
+    parser.add_argument("--plan-library", metavar="PATH",
+                        help="SQLite file of outlines reused for repeated requests")
+    parser.add_argument("--archive", nargs="?", const=DEFAULT_METRICS_STORAGE, metavar="PATH",
+                        help=f"Save the story and its scores to a SQLite archive (default: {DEFAULT_METRICS_STORAGE})")
+    args = parser.parse_args()
+    if args.candidates < 1:
+        parser.error("--candidates must be at least 1")
+    if args.trust_prejudge and not args.prejudge:
+        parser.error("--trust-prejudge needs --prejudge")
+
+    plan_library = PlanLibrary(args.plan_library, validator=validate_plan) if args.plan_library else None
+    try:
+        with profile_story() as spans:
+            record = run_story_session(
+                candidates=args.candidates,
+                prejudge=PreJudge(trust_accepts=args.trust_prejudge) if args.prejudge else None,
+                plan_library=plan_library
+            )
+    finally:
+        if plan_library is not None:
+            plan_library.close()
+
+    if args.archive and record is not None:
+        record.prompt_tokens = sum(span.prompt_tokens for span in spans)
+        record.completion_tokens = sum(span.completion_tokens for span in spans)
+        record.cost = sum(span.cost for span in spans)
+        archive = StoryArchive(args.archive)
+        archive.record(record)
+        archive.close()
+        print(f"🗄️ Story saved to {args.archive}")
+
+    if args.profile:
+        print("\n⏱️ Story profile:")
+        print(format_profile(spans))
+
+def run_story_session(
+    candidates: int = 1,
+    prejudge: Optional[PreJudge] = None,
+    plan_library: Optional[PlanLibrary] = None
+) -> Optional[ArchiveRecord]:
+    """Interactively plan, write, judge, and improve one story.
+
+    With candidates > 1 each story is written several times at once and the
+    judge's favourite is kept, instead of waiting on serial revision rounds.
+    A prejudge sends clearly weak stories back for revision without a judge call,
+    and a plan_library reuses outlines planned for the same request before.
+    Returns a record of the finished story, or None if no story was written.
+    """
     # Give Introduction
     print("🌟 Welcome to the Magical Bedtime Story Generator! 🌟")
     print("By: Kassi Winter, creating perfect bedtime stories for ages 5-10!")
     print("-" * 60)
 
     # Initialize OpenAI client
-    client = initialize_openai_client()
+    try:
+        client = initialize_openai_client()
+    except ClientInitializationError as e:
+        print(f"❌ {e}")
+        return
 
     # Initialize our agents
-    planner = StoryPlanner(client)
+    planner = StoryPlanner(client, plan_library)
     generator = StoryGenerator(client)
-    judge = StoryJudge(client)
+    judge = StoryJudge(client, prejudge=prejudge)
 
     # Get story request
     user_input = input("What kind of magical bedtime story would you like to hear tonight? 🌙\n> ")
@@ -56,27 +128,47 @@ def main():
         except ValueError:
             print("Please enter a valid number.")
 
-    print("\n1. 📝 Planning your story...")
-    story_plan = planner.create_outline(user_input, age)
-    
-    print("\n2. ✨ Creating your story...")
-    story = generator.generate_story(user_input, age, story_plan)
+    start = time.perf_counter()
+    genre = GENRE_INDEX.best_genre(user_input)
+    print(f"\n1. 📝 Planning your {STORY_GENRES[genre]['name'].lower()} story...")
+    story_plan = planner.create_outline(user_input, age, genre)
     
-    print("\n3. 🎯 Evaluating the story...")
-    metrics, feedback, judgment = judge.evaluate_story(story, age)
-    
-    print("\n--- Your Personalized Bedtime Story ---")
-    print(story)
-    print("--- End of Story ---")
+    if candidates > 1:
+        print(f"\n2. ✨ Creating {candidates} stories at once and judging them...")
+        best = generator.generate_best_of(user_input, age, story_plan, judge, n=candidates, genre=genre)
+        story, metrics, feedback, judgment = best.story, best.metrics, best.feedback, best.judgment
+
+        print("\n--- Your Personalized Bedtime Story ---")
+        print(story)
+        print("--- End of Story ---")
+    else:
+        print("\n2. ✨ Creating your story...")
+        # Show the story as it is written instead of after it has been judged
+        print("\n--- Your Personalized Bedtime Story ---")
+        story = generator.generate_story(user_input, age, story_plan, on_chunk=_print_chunk)
+        print("\n--- End of Story ---")
+
+        print("\n3. 🎯 Evaluating the story...")
+        metrics, feedback, judgment = judge.evaluate_story(story, age, genre)
     
-    print(f"\n📊 Story Evaluation Scores:")
-    for metric, value in vars(metrics).items():
+    print("\n📊 Story Evaluation Scores:")
+    for metric, value in metrics.as_dict().items():
         if not metric.startswith('_'):  # Skip internal attributes
             print(f"- {metric.replace('_', ' ').title()}: {value:.2f}")
     print(f"Overall Score: {metrics.overall_score:.2f}")
 
     # Check both the LLM judgment and metric thresholds
     needs_revision = judgment == "NEEDS_REVISION" or judge.needs_revision(metrics)
+    record = ArchiveRecord(
+        request=user_input,
+        age=age,
+        story=story,
+        metrics=metrics,
+        genre=genre,
+        plan=story_plan,
+        judgment=judgment,
+        revision_metrics=[metrics]
+    )
 
     if needs_revision:
         print("\n✍️ Making some improvements based on feedback...")
@@ -85,21 +177,38 @@ def main():
             print(f"- {item}")
             
         print("\n4. 🌟 Generating improved version...")
-        improved_story = generator.generate_story(
-            user_input, 
-            age, 
-            story_plan,
-            feedback=feedback
-        )
+        with llm_context(revision=1):
+            if candidates > 1:
+                best = generator.generate_best_of(
+                    user_input, age, story_plan, judge, n=candidates, genre=genre, feedback=feedback,
+                    revision_count=1
+                )
+                improved_story, improved_metrics = best.story, best.metrics
+            else:
+                improved_story = generator.revise_story(
+                    user_input, 
+                    age, 
+                    story_plan,
+                    story,
+                    feedback
+                )
         
         print("\n--- Your Improved Bedtime Story ---")
         print(improved_story)
         print("--- End of Story ---")
         
-        # Re-evaluate the improved story
-        improved_metrics, improved_feedback, improved_judgment = judge.evaluate_story(improved_story, age)
-        print(f"\n📊 Improved Story Evaluation Scores:")
-        for metric, value in vars(improved_metrics).items():
+        # Re-evaluate the improved story (best-of-N already judged it)
+        if candidates == 1:
+            with llm_context(revision=1):
+                improved_metrics, improved_feedback, improved_judgment = judge.evaluate_story(
+                    improved_story, age, genre
+                )
+        else:
+            improved_judgment = best.judgment
+        record.story, record.metrics, record.judgment = improved_story, improved_metrics, improved_judgment
+        record.revision_metrics.append(improved_metrics)
+        print("\n📊 Improved Story Evaluation Scores:")
+        for metric, value in improved_metrics.as_dict().items():
             if not metric.startswith('_'):
                 print(f"- {metric.replace('_', ' ').title()}: {value:.2f}")
         print(f"Overall Score: {improved_metrics.overall_score:.2f}")
@@ -107,6 +216,13 @@ def main():
         print("\n✨ Perfect! The story meets all quality criteria!")
 
     print("\n🌙 Sweet dreams! Your perfect bedtime story is ready! 💫")
+    record.latency = time.perf_counter() - start
+    return record
+
+def _print_chunk(chunk: StoryChunk):
+    if chunk.restart:
+        print("\n\n(Let's start over with a gentler story...)\n")
+    print(chunk.text, end="", flush=True)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
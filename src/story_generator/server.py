@@ -0,0 +1,588 @@
+"""HTTP/JSON story server backed by a pool of worker processes.
+
+The front process accepts jobs over HTTP and keeps a bounded job table; worker
+processes each hold a warm async OpenAI client and run several stories at once
+through the pipeline, pulling the next job only when they have a free slot.
+
+Endpoints:
+    POST /stories              {"prompt": "...", "age": 7, "genre": "FANTASY", "deadline": 120}
+                               -> 202 {"id": ..., "status": "queued"}
+                                  429 when the queue is full, 503 while draining
+    GET  /stories/<id>         -> the job's status, and its story once done
+    GET  /stories/<id>/stream  -> server-sent events as the job progresses: status changes
+                                  plus the pipeline's plan_ready, story_token, story_complete,
+                                  scores, and revision_started events (see core.events)
+    GET  /health               -> worker, queue, and job counts
+
+Workers pick up edits to the metric weights in config/metrics.py before their
+next job, without a restart (see config.metrics.reload_weights_if_changed).
+
+Every job has a deadline (seconds from submission); a job still queued or
+running when it passes is reported as expired. SIGINT/SIGTERM stop new
+submissions, let queued and running jobs finish (up to --drain-timeout), then
+stop the workers.
+
+Usage:
+    python -m src.story_generator.server --port 8080 --workers 4 --concurrency 25
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from openai import AsyncOpenAI
+from .batch import result_to_record
+from .core.pipeline import StoryPipeline, StoryRequest
+from .core.events import StoryEvent, FINAL, STORY_TOKEN, SSE_KEEPALIVE, format_sse
+from .core.planner import validate_plan
+from .core.prejudge import PreJudge
+from .config.genres import STORY_GENRES
+from .config.metrics import reload_weights_if_changed
+from .utils.plan_library import PlanLibrary
+from .utils.story_archive import StoryArchive
+from .utils.llm_utils import initialize_async_openai_client
+from .utils.http_client import aclose_async_client
+from .utils.instrumentation import METRICS, llm_context
+from .utils.rate_limiter import PRIORITY_INTERACTIVE
+
+DEFAULT_PORT = 8080
+DEFAULT_WORKERS = max(1, min(4, os.cpu_count() or 1))
+DEFAULT_CONCURRENCY = 25  # Stories in flight per worker process
+DEFAULT_QUEUE_SIZE = 200  # Jobs waiting for a worker before submissions are rejected
+DEFAULT_DEADLINE = 300.0  # Seconds a job may take from submission to finished story
+DEFAULT_DRAIN_TIMEOUT = 120.0
+
+# Finished jobs kept for polling; the oldest are forgotten beyond this
+MAX_FINISHED_JOBS = 10000
+MAX_BODY_BYTES = 64 * 1024
+TOKEN_REPLAY_SECONDS = 60.0  # How long a finished job's story_token events stay replayable
+MIN_AGE, MAX_AGE = 5, 10
+DEADLINE_GRACE = 5.0  # Seconds past a deadline before the front process gives up on a worker's report
+MAINTENANCE_INTERVAL = 1.0  # Seconds between checks for dead workers, overdue jobs, and old tokens
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+EXPIRED = "expired"
+FINISHED = (DONE, FAILED, EXPIRED)
+
+@dataclass
+class Job:
+    id: str
+    request: StoryRequest
+    deadline: float  # Wall-clock time.time(), comparable across processes
+    submitted_at: float = field(default_factory=time.time)
+    status: str = QUEUED
+    worker: Optional[int] = None  # pid of the worker running it
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    events: List[Dict] = field(default_factory=list)  # Everything a stream replays, in order
+
+    def as_dict(self) -> Dict:
+        body = {
+            "id": self.id,
+            "status": self.status,
+            "prompt": self.request.request,
+            "age": self.request.age,
+            "genre": self.request.genre,
+            "submitted_at": self.submitted_at,
+            "deadline": self.deadline
+        }
+        if self.result is not None:
+            body["result"] = self.result
+        if self.error is not None:
+            body["error"] = self.error
+        return body
+
+class QueueFull(Exception):
+    pass
+
+class Draining(Exception):
+    pass
+
+class JobTable:
+    """Jobs by id, with queued/running counts for backpressure and a condition streams wait on."""
+
+    def __init__(self, queue_size: int = DEFAULT_QUEUE_SIZE, max_finished: int = MAX_FINISHED_JOBS):
+        self.queue_size = queue_size
+        self.max_finished = max_finished
+        self.changed = threading.Condition()
+        self.draining = False
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._finished: "OrderedDict[str, float]" = OrderedDict()  # Finished job id -> finish time
+        self._unpruned: "deque[Tuple[float, str]]" = deque()
+        self.counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0, EXPIRED: 0, "rejected": 0}
+
+    def submit(self, request: StoryRequest, deadline: float) -> Job:
+        with self.changed:
+            if self.draining:
+                raise Draining()
+            if self.counts[QUEUED] >= self.queue_size:
+                self.counts["rejected"] += 1
+                METRICS.increment("server_jobs_total", (("status", "rejected"),))
+                raise QueueFull()
+            job = Job(uuid.uuid4().hex, request, time.time() + deadline)
+            self._jobs[job.id] = job
+            self.counts[QUEUED] += 1
+            self._status_event(job)
+            return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self.changed:
+            return self._jobs.get(job_id)
+
+    def update(self, job_id: str, event: str, payload=None):
+        """Apply a worker event: a status change, or any other event to pass on to streams."""
+        with self.changed:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return
+            if event == RUNNING:
+                job.worker = payload
+                self._set_status(job, RUNNING)
+            elif event == DONE:
+                job.result = payload
+                self._set_status(job, DONE, {"result": payload})
+            elif event in (FAILED, EXPIRED):
+                job.error = payload
+                self._set_status(job, event, {"error": payload})
+            else:
+                job.events.append({"event": event, "data": payload})
+                self.changed.notify_all()
+
+    def _set_status(self, job: Job, status: str, data: Optional[Dict] = None):
+        self.counts[job.status] -= 1
+        self.counts[status] += 1
+        job.status = status
+        self._status_event(job, data)
+
+    def _status_event(self, job: Job, data: Optional[Dict] = None):
+        job.events.append({"event": "status", "data": {"id": job.id, "status": job.status, **(data or {})}})
+        METRICS.increment("server_jobs_total", (("status", job.status),))
+        if job.status in FINISHED:
+            self._finished[job.id] = time.time()
+            self._unpruned.append((self._finished[job.id], job.id))
+            while len(self._finished) > self.max_finished:
+                forgotten, _ = self._finished.popitem(last=False)
+                self._jobs.pop(forgotten, None)
+        self.changed.notify_all()
+
+    def fail_worker(self, pid: int, error: str):
+        """Fail the jobs a worker was running when it died."""
+        with self.changed:
+            for job in [job for job in self._jobs.values() if job.status == RUNNING and job.worker == pid]:
+                job.error = error
+                self._set_status(job, FAILED, {"error": error})
+
+    def expire_overdue(self, grace: float = DEADLINE_GRACE):
+        """Expire jobs no worker reported on in time, e.g. taken by a worker that then died."""
+        now = time.time()
+        with self.changed:
+            for job in [job for job in self._jobs.values() if job.status not in FINISHED and now > job.deadline + grace]:
+                job.error = "Deadline passed"
+                self._set_status(job, EXPIRED, {"error": job.error})
+
+    def prune_tokens(self, age: float = TOKEN_REPLAY_SECONDS):
+        """Drop story_token events of jobs finished a while ago; story_complete holds the text."""
+        cutoff = time.time() - age
+        with self.changed:
+            while self._unpruned and self._unpruned[0][0] < cutoff:
+                _, job_id = self._unpruned.popleft()
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    job.events = [event for event in job.events if event["event"] != STORY_TOKEN]
+
+    def fail_unfinished(self, error: str):
+        with self.changed:
+            for job in [job for job in self._jobs.values() if job.status not in FINISHED]:
+                job.error = error
+                self._set_status(job, FAILED, {"error": error})
+
+    def wait_idle(self, timeout: float) -> bool:
+        """Wait until nothing is queued or running; False on timeout."""
+        with self.changed:
+            return self.changed.wait_for(lambda: not self.counts[QUEUED] and not self.counts[RUNNING], timeout)
+
+    def snapshot(self) -> Dict:
+        with self.changed:
+            return {**self.counts, "draining": self.draining, "queue_size": self.queue_size}
+
+@dataclass
+class WorkerOptions:
+    """Settings each worker process builds its pipeline from (must pickle)."""
+    concurrency: int = DEFAULT_CONCURRENCY
+    prejudge: bool = False
+    plan_library: Optional[str] = None
+    archive: Optional[str] = None
+    speculative: bool = False
+    trust_prejudge: bool = False
+
+def _worker_main(
+    jobs: multiprocessing.Queue,
+    events: multiprocessing.Queue,
+    options: WorkerOptions,
+    client_factory: Callable[[], AsyncOpenAI]
+):
+    # The front process decides when to stop; a terminal Ctrl+C or a service manager's SIGTERM
+    # to the whole group must not kill jobs mid-story. drain() kills workers that overrun it.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    asyncio.run(_serve_jobs(jobs, events, options, client_factory))
+
+async def _serve_jobs(
+    jobs: multiprocessing.Queue,
+    events: multiprocessing.Queue,
+    options: WorkerOptions,
+    client_factory: Callable[[], AsyncOpenAI]
+):
+    """Pull jobs while a slot is free and run them until the stop sentinel arrives."""
+    plan_library = PlanLibrary(options.plan_library, validator=validate_plan) if options.plan_library else None
+    archive = StoryArchive(options.archive) if options.archive else None
+    pipeline = StoryPipeline(
+        client_factory(),
+        max_concurrency=options.concurrency,
+        prejudge=PreJudge(trust_accepts=options.trust_prejudge) if options.prejudge else None,
+        plan_library=plan_library,
+        archive=archive,
+        speculative=options.speculative
+    )
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(options.concurrency)
+    running = set()
+
+    def finished(task: asyncio.Task):
+        running.discard(task)
+        slots.release()
+
+    while True:
+        await slots.acquire()
+        job = await loop.run_in_executor(None, jobs.get)
+        if job is None:
+            break
+        reload_weights_if_changed()
+        task = asyncio.create_task(_run_job(pipeline, job, events))
+        running.add(task)
+        task.add_done_callback(finished)
+    if running:
+        await asyncio.gather(*running, return_exceptions=True)
+    if archive is not None:
+        archive.close()
+    if plan_library is not None:
+        plan_library.close()
+    await aclose_async_client()
+
+async def _run_job(pipeline: StoryPipeline, job: Tuple, events: multiprocessing.Queue):
+    job_id, request, deadline = job
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        events.put((job_id, EXPIRED, "Deadline passed while queued"))
+        return
+    events.put((job_id, RUNNING, os.getpid()))
+
+    def relay(event: StoryEvent):
+        # The job's final status carries the result, so FINAL itself is not relayed
+        if event.type != FINAL:
+            events.put((job_id, event.type, event.data))
+
+    try:
+        with llm_context(priority=PRIORITY_INTERACTIVE):
+            result = await asyncio.wait_for(pipeline.run(request, on_event=relay), remaining)
+    except asyncio.TimeoutError:
+        events.put((job_id, EXPIRED, "Deadline passed while generating"))
+        return
+    except Exception as e:
+        events.put((job_id, FAILED, str(e)))
+        return
+    if result.error:
+        events.put((job_id, FAILED, result.error))
+    else:
+        events.put((job_id, DONE, result_to_record(job_id, result)))
+
+class StoryServer:
+    """Front process: job table, worker pool, and the thread relaying worker events."""
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        options: Optional[WorkerOptions] = None,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        default_deadline: float = DEFAULT_DEADLINE,
+        client_factory: Callable[[], AsyncOpenAI] = initialize_async_openai_client
+    ):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.options = options or WorkerOptions()
+        self.default_deadline = default_deadline
+        self.client_factory = client_factory
+        self.table = JobTable(queue_size)
+        # Spawned, not forked: the front process runs threads and must not hand them to workers
+        self._context = multiprocessing.get_context("spawn")
+        self._jobs = self._context.Queue()
+        self._events = self._context.Queue()
+        self._workers: List[Optional[multiprocessing.Process]] = [None] * workers
+        self._stopping = threading.Event()
+        self._relay = threading.Thread(target=self._relay_events, name="story-server-events", daemon=True)
+
+    def start(self):
+        for slot in range(len(self._workers)):
+            self._start_worker(slot)
+        self._relay.start()
+
+    def _start_worker(self, slot: int):
+        worker = self._context.Process(
+            target=_worker_main,
+            args=(self._jobs, self._events, self.options, self.client_factory),
+            name=f"story-worker-{slot}",
+            daemon=True
+        )
+        worker.start()
+        self._workers[slot] = worker
+
+    def _relay_events(self):
+        # Maintenance runs on its own clock; a busy event stream must not starve it
+        next_maintenance = time.monotonic() + MAINTENANCE_INTERVAL
+        while True:
+            if time.monotonic() >= next_maintenance:
+                self._check_workers()
+                self.table.expire_overdue()
+                self.table.prune_tokens()
+                next_maintenance = time.monotonic() + MAINTENANCE_INTERVAL
+            try:
+                item = self._events.get(timeout=max(0.0, next_maintenance - time.monotonic()))
+            except queue.Empty:
+                continue
+            if item is None:
+                return
+            self.table.update(*item)
+
+    def _check_workers(self):
+        """Replace workers that died, failing the jobs they were running."""
+        if self._stopping.is_set():
+            return
+        for slot, worker in enumerate(self._workers):
+            if not worker.is_alive():
+                print(f"⚠️ Worker {worker.pid} exited with code {worker.exitcode}; restarting it")
+                self.table.fail_worker(worker.pid, "Worker process died")
+                self._start_worker(slot)
+
+    def submit(self, request: StoryRequest, deadline: Optional[float] = None) -> Job:
+        """Queue a story; raises QueueFull or Draining."""
+        job = self.table.submit(request, deadline or self.default_deadline)
+        self._jobs.put((job.id, request, job.deadline))
+        return job
+
+    def health(self) -> Dict:
+        return {"workers": sum(1 for worker in self._workers if worker.is_alive()), **self.table.snapshot()}
+
+    def drain(self, timeout: float = DEFAULT_DRAIN_TIMEOUT) -> bool:
+        """Stop accepting jobs, finish the accepted ones, and stop the workers.
+
+        Returns False if jobs were still unfinished after the timeout; those are failed.
+        """
+        with self.table.changed:
+            self.table.draining = True
+        idle = self.table.wait_idle(timeout)
+        self._stopping.set()
+        for _ in self._workers:
+            self._jobs.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5.0 if idle else 0.5)
+            if worker.is_alive():
+                # Workers ignore SIGTERM, so terminate() would not stop them
+                worker.kill()
+                worker.join()
+        self._events.put(None)
+        self._relay.join()
+        if not idle:
+            self.table.fail_unfinished("Server shut down before the job finished")
+        return idle
+
+def _make_handler(server: StoryServer):
+    class StoryRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass  # Job results are the useful log; access lines would drown them
+
+        def _send_json(self, status: int, body: Dict, headers: Optional[Dict] = None):
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _send_error(self, status: int, message: str, headers: Optional[Dict] = None):
+            self._send_json(status, {"error": message}, headers)
+
+        def _read_request(self) -> Tuple[StoryRequest, Optional[float]]:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY_BYTES:
+                raise ValueError("Request body too large")
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("Request body must be a JSON object")
+            prompt = body.get("prompt")
+            if not isinstance(prompt, str) or not prompt.strip():
+                raise ValueError("'prompt' must be a non-empty string")
+            age = body.get("age")
+            if not isinstance(age, int) or not MIN_AGE <= age <= MAX_AGE:
+                raise ValueError(f"'age' must be a whole number from {MIN_AGE} to {MAX_AGE}")
+            genre = body.get("genre")
+            if genre is not None and (not isinstance(genre, str) or genre.upper() not in STORY_GENRES):
+                raise ValueError(f"'genre' must be one of {', '.join(STORY_GENRES)}")
+            deadline = body.get("deadline")
+            if deadline is not None and (not isinstance(deadline, (int, float)) or deadline <= 0):
+                raise ValueError("'deadline' must be a positive number of seconds")
+            return StoryRequest(prompt.strip(), age, genre.upper() if genre else None), deadline
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/stories":
+                self._send_error(404, "Not found")
+                return
+            try:
+                request, deadline = self._read_request()
+            except (ValueError, TypeError) as e:
+                self._send_error(400, str(e))
+                return
+            try:
+                job = server.submit(request, deadline)
+            except QueueFull:
+                self._send_error(429, "Too many stories queued; try again shortly", {"Retry-After": "1"})
+                return
+            except Draining:
+                self._send_error(503, "Server is shutting down", {"Retry-After": "5"})
+                return
+            self._send_json(202, {"id": job.id, "status": job.status}, {"Location": f"/stories/{job.id}"})
+
+        def do_GET(self):
+            parts = [part for part in self.path.split("?")[0].split("/") if part]
+            if parts == ["health"]:
+                self._send_json(200, server.health())
+                return
+            if len(parts) not in (2, 3) or parts[0] != "stories" or (len(parts) == 3 and parts[2] != "stream"):
+                self._send_error(404, "Not found")
+                return
+            job = server.table.get(parts[1])
+            if job is None:
+                self._send_error(404, "Unknown story id")
+                return
+            if len(parts) == 3:
+                self._stream(job)
+            else:
+                with server.table.changed:
+                    body = job.as_dict()
+                self._send_json(200, body)
+
+        def _stream(self, job: Job):
+            """Replay the job's events as SSE, then follow new ones until it finishes."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            sent = 0
+            table = server.table
+            try:
+                while True:
+                    with table.changed:
+                        table.changed.wait_for(
+                            lambda: len(job.events) > sent or job.status in FINISHED, SSE_KEEPALIVE
+                        )
+                        pending = job.events[sent:]
+                        sent += len(pending)
+                        finished = job.status in FINISHED and sent >= len(job.events)
+                    if not pending:
+                        self.wfile.write(b": keepalive\n\n")
+                    for event in pending:
+                        self.wfile.write(format_sse(event["event"], event["data"]))
+                    self.wfile.flush()
+                    if finished:
+                        return
+            except (BrokenPipeError, ConnectionResetError):
+                return  # The client stopped listening; the job itself carries on
+
+    return StoryRequestHandler
+
+def main():
+    """Command-line entry point for the story server."""
+    parser = argparse.ArgumentParser(description="Serve bedtime stories over HTTP from a pool of worker processes.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Worker processes, each with its own client (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Stories in flight per worker (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=f"Waiting jobs before new ones are rejected with 429 (default: {DEFAULT_QUEUE_SIZE})")
+    parser.add_argument("--deadline", type=float, default=DEFAULT_DEADLINE,
+                        help=f"Default seconds a job may take (default: {DEFAULT_DEADLINE:g})")
+    parser.add_argument("--drain-timeout", type=float, default=DEFAULT_DRAIN_TIMEOUT,
+                        help=f"Seconds to let accepted jobs finish on shutdown (default: {DEFAULT_DRAIN_TIMEOUT:g})")
+    parser.add_argument("--prejudge", action="store_true",
+                        help="Check stories locally first and skip the judge for clearly weak ones")
+    parser.add_argument("--trust-prejudge", action="store_true",
+                        help="With --prejudge, also skip the judge for clearly good stories (calibrate first)")
+    parser.add_argument("--plan-library", metavar="PATH",
+                        help="SQLite file of outlines reused for repeated requests")
+    parser.add_argument("--archive", metavar="PATH",
+                        help="SQLite archive every finished story is saved to")
+    parser.add_argument("--speculative", action="store_true",
+                        help="Check paragraphs while stories stream and cut short clearly upsetting drafts")
+    args = parser.parse_args()
+    for name in ("workers", "concurrency", "queue_size"):
+        if getattr(args, name) < 1:
+            parser.error(f"--{name.replace('_', '-')} must be at least 1")
+    if args.trust_prejudge and not args.prejudge:
+        parser.error("--trust-prejudge needs --prejudge")
+
+    server = StoryServer(
+        workers=args.workers,
+        options=WorkerOptions(
+            args.concurrency, args.prejudge, args.plan_library, args.archive, args.speculative, args.trust_prejudge
+        ),
+        queue_size=args.queue_size,
+        default_deadline=args.deadline
+    )
+    server.start()
+    httpd = ThreadingHTTPServer((args.host, args.port), _make_handler(server))
+    httpd.daemon_threads = True
+
+    def shut_down():
+        print(f"\n🌙 Draining: finishing accepted stories (up to {args.drain_timeout:g}s)...")
+        if not server.drain(args.drain_timeout):
+            print("⚠️ Some stories did not finish in time and were failed.")
+        httpd.shutdown()
+
+    draining = threading.Event()
+
+    def on_signal(signum, frame):
+        if not draining.is_set():
+            draining.set()
+            threading.Thread(target=shut_down, name="story-server-drain").start()
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+    print(f"📡 Serving stories on http://{args.host}:{args.port} "
+          f"with {args.workers} workers x {args.concurrency} stories")
+    httpd.serve_forever()
+    httpd.server_close()
+    print("👋 Server stopped.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""Content-addressed caching of language model responses."""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Default size of the in-memory tier (number of responses)
+DEFAULT_MEMORY_ENTRIES = 1024
+
+# Default limits for the on-disk tier
+DEFAULT_DISK_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Rows removed per eviction query, and hits whose access times are written together
+EVICTION_BATCH = 64
+TOUCH_BATCH = 64
+
+def make_cache_key(
+    model: str,
+    system_prompt_content: str,
+    user_prompt_content: str,
+    temperature: float,
+    max_tokens: int
+) -> str:
+    """Hash the full request into a stable cache key."""
+    payload = json.dumps(
+        [model, system_prompt_content, user_prompt_content, temperature, max_tokens],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """Interface for response caches; subclasses store responses by key."""
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get() for the event loop; caches that do I/O run it off the loop."""
+        return self.get(key)
+
+    async def aset(self, key: str, value: str):
+        self.set(key, value)
+
+class LRUCache(ResponseCache):
+    """Bounded in-memory cache that evicts the least recently used response."""
+
+    def __init__(self, max_entries: int = DEFAULT_MEMORY_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SQLiteCache(ResponseCache):
+    """Persistent cache with time-to-live and total-size eviction.
+
+    The total size is kept as a running count, and expired or least recently
+    used rows are removed a batch at a time through indexes, so a set() costs
+    the same however large the cache grows. Access times of hits are written
+    in batches rather than committed on every get().
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = DEFAULT_DISK_MAX_BYTES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}  # key -> access time not yet written
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created_at)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, size, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, size, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._delete([(key, size)])
+                self._conn.commit()
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= TOUCH_BATCH:
+                self._write_touches()
+                self._conn.commit()
+            return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now)
+            )
+            self._touched.pop(key, None)
+            self._total_bytes += size - (old[0] if old else 0)
+            self._write_touches()
+            self._evict(now)
+            self._conn.commit()
+
+    def _write_touches(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _delete(self, rows):
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key, _ in rows])
+        for key, size in rows:
+            self._total_bytes -= size
+            self._touched.pop(key, None)
+
+    def _evict(self, now: float):
+        """Drop expired responses, then the least recently used until under the size limit."""
+        while True:
+            expired = self._conn.execute(
+                "SELECT key, size FROM responses WHERE created_at < ? LIMIT ?",
+                (now - self.ttl_seconds, EVICTION_BATCH)
+            ).fetchall()
+            self._delete(expired)
+            if len(expired) < EVICTION_BATCH:
+                break
+        while self._total_bytes > self.max_bytes:
+            oldest = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at LIMIT ?", (EVICTION_BATCH,)
+            ).fetchall()
+            if not oldest:
+                break
+            for row in oldest:
+                self._delete([row])
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    async def aget(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: str):
+        await asyncio.to_thread(self.set, key, value)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._touched.clear()
+            self._total_bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._write_touches()
+            self._conn.commit()
+            self._conn.close()
+
+class TieredCache(ResponseCache):
+    """In-memory LRU in front of an optional persistent tier, with hit/miss counters."""
+
+    def __init__(self, memory: Optional[LRUCache] = None, disk: Optional[ResponseCache] = None):
+        self.memory = memory if memory is not None else LRUCache()
+        self.disk = disk
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                # Promote so the next lookup is served from memory
+                self.memory.set(key, value)
+                self._count("disk_hits")
+                return value
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: str):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get() that leaves the disk tier's I/O off the event loop."""
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+        if self.disk is not None:
+            value = await self.disk.aget(key)
+            if value is not None:
+                self.memory.set(key, value)
+                self._count("disk_hits")
+                return value
+        self._count("misses")
+        return None
+
+    async def aset(self, key: str, value: str):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await self.disk.aset(key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def get_stats(self) -> Dict:
+        """Return hit/miss counters and the overall hit rate."""
+        with self._lock:
+            stats = dict(self.stats)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hits"] = hits
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
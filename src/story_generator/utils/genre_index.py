@@ -0,0 +1,131 @@
+"""Inverted index from request words and phrases to story genres.
+
+Built once from config.genres. Classifying a request is one pass over its
+tokens: every n-gram up to the longest keyword is looked up, and each hit adds
+a weight to the genres listing that keyword. Keywords shared by several genres
+count for less, and multi-word phrases count for a little more (capped, so one
+long phrase cannot outweigh several single-word hits), so suggestions come
+back ranked. Matching is on whole words ("cat" does not match "education"),
+with simple plurals folded ("dragons" matches "dragon").
+
+Classify a batch request file (fills in missing genres):
+    python -m src.story_generator.utils.genre_index requests.jsonl classified.jsonl
+"""
+
+import argparse
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+from ..config.genres import STORY_GENRES
+
+# Genre used when nothing in the text matches
+DEFAULT_GENRE = "FICTION"
+
+# Most a multi-word phrase can weigh; a single word weighs 1
+MAX_PHRASE_WEIGHT = 1.5
+
+_TOKEN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+@dataclass
+class GenreSuggestion:
+    key: str
+    score: float
+    matched: List[str] = field(default_factory=list)
+
+    def as_dict(self) -> Dict:
+        """Suggestion in get_genre_suggestions' format: the genre's definition plus score."""
+        return {"key": self.key, **STORY_GENRES[self.key], "score": self.score, "matched": self.matched}
+
+class GenreIndex:
+    def __init__(self, genres: Dict[str, Dict] = STORY_GENRES, default: str = DEFAULT_GENRE):
+        self.default = default
+        self._order = {key: position for position, key in enumerate(genres)}
+        # phrase (tuple of tokens) -> ((genre, weight), ...)
+        owners: Dict[Tuple[str, ...], List[str]] = {}
+        for key, info in genres.items():
+            for keyword in info["keywords"]:
+                phrase = tuple(_TOKEN.findall(keyword.lower()))
+                if phrase and key not in owners.setdefault(phrase, []):
+                    owners[phrase].append(key)
+        self._postings: Dict[Tuple[str, ...], Tuple[Tuple[str, float], ...]] = {
+            phrase: tuple((key, min(len(phrase), MAX_PHRASE_WEIGHT) / len(keys)) for key in keys)
+            for phrase, keys in owners.items()
+        }
+        self._vocabulary = frozenset(token for phrase in self._postings for token in phrase)
+        self._max_phrase = max((len(phrase) for phrase in self._postings), default=1)
+
+    def _tokens(self, text: str) -> List[str]:
+        """Lowercased word tokens with plurals folded onto indexed words."""
+        tokens = []
+        for token in _TOKEN.findall(text.lower()):
+            if token not in self._vocabulary:
+                if token.endswith("es") and token[:-2] in self._vocabulary:
+                    token = token[:-2]
+                elif token.endswith("s") and token[:-1] in self._vocabulary:
+                    token = token[:-1]
+            tokens.append(token)
+        return tokens
+
+    def classify(self, text: str, limit: Optional[int] = None) -> List[GenreSuggestion]:
+        """Genres matching the text, best first; empty when nothing matches."""
+        tokens = self._tokens(text)
+        scores: Dict[str, float] = {}
+        matched: Dict[str, List[str]] = {}
+        for start in range(len(tokens)):
+            for length in range(1, min(self._max_phrase, len(tokens) - start) + 1):
+                phrase = tuple(tokens[start:start + length])
+                for key, weight in self._postings.get(phrase, ()):
+                    scores[key] = scores.get(key, 0.0) + weight
+                    keyword = " ".join(phrase)
+                    if keyword not in matched.setdefault(key, []):
+                        matched[key].append(keyword)
+        ranked = sorted(scores, key=lambda key: (-scores[key], self._order[key]))
+        suggestions = [GenreSuggestion(key, round(scores[key], 4), matched[key]) for key in ranked]
+        return suggestions[:limit] if limit is not None else suggestions
+
+    def best_genre(self, text: str) -> str:
+        """The top-ranked genre for the text, or the default genre."""
+        suggestions = self.classify(text, limit=1)
+        return suggestions[0].key if suggestions else self.default
+
+    def suggest(self, text: str) -> List[Dict]:
+        """Ranked suggestion dicts, falling back to the default genre."""
+        suggestions = self.classify(text) or [GenreSuggestion(self.default, 0.0)]
+        return [suggestion.as_dict() for suggestion in suggestions]
+
+    def classify_many(self, texts: Iterable[str], limit: Optional[int] = None) -> List[List[GenreSuggestion]]:
+        return [self.classify(text, limit) for text in texts]
+
+    def classify_records(self, records: Iterable[Dict], limit: int = 3) -> Iterable[Dict]:
+        """Add ranked suggestions to batch request records and fill in missing genres."""
+        for record in records:
+            suggestions = self.classify(record.get("prompt", ""), limit)
+            record["genre_suggestions"] = [{"key": s.key, "score": s.score} for s in suggestions]
+            if not record.get("genre"):
+                record["genre"] = suggestions[0].key if suggestions else self.default
+            yield record
+
+GENRE_INDEX = GenreIndex()
+
+def main():
+    parser = argparse.ArgumentParser(description="Assign genres to a JSONL file of story requests.")
+    parser.add_argument("input", help="JSONL file with one request per line")
+    parser.add_argument("output", help="JSONL file to write the classified requests to")
+    args = parser.parse_args()
+
+    def records():
+        with open(args.input, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    count = 0
+    with open(args.output, "w", encoding="utf-8") as out:
+        for record in GENRE_INDEX.classify_records(records()):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    print(f"🏷️ Classified {count} requests.")
+
+if __name__ == "__main__":
+    main()
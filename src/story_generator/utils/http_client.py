@@ -0,0 +1,184 @@
+"""Shared, pooled OpenAI clients.
+
+Every agent draws its client from here so that connections (and their TLS
+handshakes) are reused across calls instead of being set up per request.
+Clients are per-process singletons: after a fork the child discards the
+parent's clients, whose sockets it must not share, and lazily builds its own.
+Async clients are kept per event loop because pooled connections are bound
+to the loop that opened them.
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from dataclasses import dataclass, replace
+from typing import Optional
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from ..config.settings import OPENAI_API_KEY
+
+try:
+    import h2  # Optional: enables HTTP/2 multiplexing
+except ImportError:
+    h2 = None
+
+# Connection pool sizing
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 50
+DEFAULT_KEEPALIVE_EXPIRY = 60.0  # Seconds an idle connection is kept open
+
+# Timeouts in seconds; reads are long because stories stream for a while
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 120.0
+DEFAULT_WRITE_TIMEOUT = 10.0
+DEFAULT_POOL_TIMEOUT = 30.0  # Waiting for a free connection when the pool is full
+
+# Retries are scheduled by the rate limiter, which knows the shared budgets
+DEFAULT_MAX_RETRIES = 0
+
+class ClientInitializationError(RuntimeError):
+    """Raised when an OpenAI client cannot be created."""
+
+@dataclass(frozen=True)
+class ClientConfig:
+    max_connections: int = DEFAULT_MAX_CONNECTIONS
+    max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE_CONNECTIONS
+    keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY
+    connect_timeout: float = DEFAULT_CONNECT_TIMEOUT
+    read_timeout: float = DEFAULT_READ_TIMEOUT
+    write_timeout: float = DEFAULT_WRITE_TIMEOUT
+    pool_timeout: float = DEFAULT_POOL_TIMEOUT
+    http2: bool = True
+    max_retries: int = DEFAULT_MAX_RETRIES
+    base_url: Optional[str] = None
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+    @property
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.write_timeout,
+            pool=self.pool_timeout
+        )
+
+    @property
+    def use_http2(self) -> bool:
+        """HTTP/2 needs the optional h2 package; fall back to HTTP/1.1 keep-alive without it."""
+        return self.http2 and h2 is not None
+
+_lock = threading.Lock()
+_config = ClientConfig()
+_sync_client: Optional[OpenAI] = None
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+def _reset_after_fork():
+    """Forget the parent's clients in a forked child; their sockets belong to the parent."""
+    global _lock, _sync_client, _async_clients
+    _lock = threading.Lock()
+    _sync_client = None
+    _async_clients = weakref.WeakKeyDictionary()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def configure_clients(config: Optional[ClientConfig] = None, **overrides) -> ClientConfig:
+    """Change pool and timeout settings; clients built afterwards use them.
+
+    Existing clients are closed (sync) or dropped (async) so the next call
+    to get_openai_client() or get_async_openai_client() picks up the change.
+    """
+    global _config, _sync_client, _async_clients
+    with _lock:
+        _config = replace(config or _config, **overrides)
+        if _sync_client is not None:
+            _sync_client.close()
+        _sync_client = None
+        _async_clients = weakref.WeakKeyDictionary()
+        return _config
+
+def create_openai_client(config: Optional[ClientConfig] = None) -> OpenAI:
+    """Build a new OpenAI client with its own connection pool."""
+    config = config or _config
+    try:
+        http_client = httpx.Client(limits=config.limits, timeout=config.timeout, http2=config.use_http2)
+        return OpenAI(
+            api_key=OPENAI_API_KEY,
+            base_url=config.base_url,
+            timeout=config.timeout,
+            max_retries=config.max_retries,
+            http_client=http_client
+        )
+    except Exception as e:
+        raise ClientInitializationError(f"Error initializing OpenAI client: {e}") from e
+
+def create_async_openai_client(config: Optional[ClientConfig] = None) -> AsyncOpenAI:
+    """Build a new asynchronous OpenAI client with its own connection pool."""
+    config = config or _config
+    try:
+        http_client = httpx.AsyncClient(limits=config.limits, timeout=config.timeout, http2=config.use_http2)
+        return AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            base_url=config.base_url,
+            timeout=config.timeout,
+            max_retries=config.max_retries,
+            http_client=http_client
+        )
+    except Exception as e:
+        raise ClientInitializationError(f"Error initializing OpenAI client: {e}") from e
+
+def get_openai_client() -> OpenAI:
+    """Return this process's shared OpenAI client, creating it on first use.
+
+    The client is thread-safe, so worker threads share one connection pool.
+    """
+    global _sync_client
+    client = _sync_client
+    if client is not None:
+        return client
+    with _lock:
+        if _sync_client is None:
+            _sync_client = create_openai_client()
+        return _sync_client
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """Return the shared asynchronous client for the running event loop.
+
+    Outside a running loop there is nothing to bind the pool to, so a new
+    unshared client is returned.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return create_async_openai_client()
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = create_async_openai_client()
+            _async_clients[loop] = client
+        return client
+
+def close_clients():
+    """Close the shared sync client and forget all async clients."""
+    global _sync_client, _async_clients
+    with _lock:
+        if _sync_client is not None:
+            _sync_client.close()
+        _sync_client = None
+        _async_clients = weakref.WeakKeyDictionary()
+
+async def aclose_async_client():
+    """Close the shared asynchronous client of the running event loop, if any."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.pop(loop, None)
+    if client is not None:
+        await client.close()
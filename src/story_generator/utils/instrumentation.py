@@ -0,0 +1,296 @@
+"""Latency, token, and cost instrumentation for language model calls.
+
+Every call_llm invocation records a Span tagged with the agent, stage, revision
+number, and model active in the surrounding llm_context(). Spans feed the
+process-wide METRICS registry, which can be exported as Prometheus text or
+OpenTelemetry-style JSON, and the per-story profile collected by
+profile_story().
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# USD per 1K (prompt, completion) tokens; unknown models are reported at zero cost
+MODEL_PRICES = {
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4-turbo": (0.01, 0.03),
+}
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+
+_context: ContextVar[Dict[str, Any]] = ContextVar("llm_context", default={})
+_story_spans: ContextVar[Tuple[List["Span"], ...]] = ContextVar("story_spans", default=())
+
+@contextmanager
+def llm_context(**tags):
+    """Tag every LLM call made inside the block (agent, stage, revision, ...)."""
+    token = _context.set({**_context.get(), **tags})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+def current_context() -> Dict[str, Any]:
+    """Return the tags active for the current call."""
+    return dict(_context.get())
+
+@dataclass
+class Span:
+    model: str
+    agent: str = "unknown"
+    stage: str = "unknown"
+    revision: int = 0
+    duration: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached: bool = False
+    cancelled: bool = False
+    error: Optional[str] = None
+    tags: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def cost(self) -> float:
+        prompt_price, completion_price = MODEL_PRICES.get(self.model, (0.0, 0.0))
+        return (self.prompt_tokens * prompt_price + self.completion_tokens * completion_price) / 1000
+
+    @property
+    def labels(self) -> Tuple[Tuple[str, str], ...]:
+        return (("agent", self.agent), ("stage", self.stage), ("model", self.model))
+
+class Histogram:
+    """Fixed-bucket histogram with bucket-interpolated quantiles."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate the q-th quantile (0-1) from the bucket counts."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+class MetricsRegistry:
+    """Process-wide counters, gauges, and latency histograms labelled by agent, stage, and model."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: Dict[Tuple, Histogram] = {}
+        self.counters: Dict[Tuple[str, Tuple], float] = {}
+        self.gauges: Dict[Tuple[str, Tuple], float] = {}
+
+    def _add(self, name: str, labels: Tuple, amount: float):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0.0) + amount
+
+    def increment(self, name: str, labels: Tuple, amount: float = 1):
+        """Add to a counter outside of span recording (retries, rate limits, ...)."""
+        with self._lock:
+            self._add(name, labels, amount)
+
+    def set_gauge(self, name: str, labels: Tuple, value: float):
+        with self._lock:
+            self.gauges[(name, labels)] = value
+
+    def record(self, span: Span):
+        labels = span.labels
+        if span.error:
+            status = "error"
+        elif span.cached:
+            status = "cached"
+        else:
+            status = "cancelled" if span.cancelled else "ok"
+        with self._lock:
+            self._add("llm_calls_total", labels + (("status", status),), 1)
+            if not span.cached:
+                self.latency.setdefault(labels, Histogram()).observe(span.duration)
+                self._add("llm_prompt_tokens_total", labels, span.prompt_tokens)
+                self._add("llm_completion_tokens_total", labels, span.completion_tokens)
+                self._add("llm_cost_usd_total", labels, span.cost)
+
+    def reset(self):
+        with self._lock:
+            self.latency.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        def fmt(labels: Tuple) -> str:
+            return ",".join(f'{key}="{value}"' for key, value in labels)
+
+        lines = []
+        with self._lock:
+            counter_names = sorted({name for name, _ in self.counters})
+            for name in counter_names:
+                lines.append(f"# TYPE {name} counter")
+                for (counter_name, labels), value in sorted(self.counters.items()):
+                    if counter_name == name:
+                        lines.append(f"{name}{{{fmt(labels)}}} {value:g}")
+            for name in sorted({name for name, _ in self.gauges}):
+                lines.append(f"# TYPE {name} gauge")
+                for (gauge_name, labels), value in sorted(self.gauges.items()):
+                    if gauge_name == name:
+                        lines.append(f"{name}{{{fmt(labels)}}} {value:g}")
+            if self.latency:
+                lines.append("# TYPE llm_latency_seconds histogram")
+            for labels, histogram in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f'llm_latency_seconds_bucket{{{fmt(labels)},le="{le}"}} {cumulative}')
+                lines.append(f"llm_latency_seconds_sum{{{fmt(labels)}}} {histogram.sum:g}")
+                lines.append(f"llm_latency_seconds_count{{{fmt(labels)}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> Dict:
+        """Return metrics in an OpenTelemetry-style JSON structure."""
+        metrics = []
+        with self._lock:
+            for name in sorted({name for name, _ in self.counters}):
+                metrics.append({
+                    "name": name,
+                    "sum": {
+                        "isMonotonic": True,
+                        "dataPoints": [
+                            {"attributes": dict(labels), "value": value}
+                            for (counter_name, labels), value in self.counters.items()
+                            if counter_name == name
+                        ]
+                    }
+                })
+            for name in sorted({name for name, _ in self.gauges}):
+                metrics.append({
+                    "name": name,
+                    "gauge": {
+                        "dataPoints": [
+                            {"attributes": dict(labels), "value": value}
+                            for (gauge_name, labels), value in self.gauges.items()
+                            if gauge_name == name
+                        ]
+                    }
+                })
+            metrics.append({
+                "name": "llm_latency_seconds",
+                "unit": "s",
+                "histogram": {
+                    "dataPoints": [
+                        {
+                            "attributes": dict(labels),
+                            "count": histogram.count,
+                            "sum": histogram.sum,
+                            "explicitBounds": list(histogram.buckets),
+                            "bucketCounts": list(histogram.counts),
+                            "p50": histogram.quantile(0.5),
+                            "p99": histogram.quantile(0.99),
+                        }
+                        for labels, histogram in self.latency.items()
+                    ]
+                }
+            })
+        return {"scopeMetrics": [{"scope": {"name": "story_generator"}, "metrics": metrics}]}
+
+METRICS = MetricsRegistry()
+
+def record_span(span: Span):
+    """Feed a finished span to the registry and any active story profiles."""
+    METRICS.record(span)
+    for spans in _story_spans.get():
+        spans.append(span)
+
+def start_span(model: str) -> Span:
+    """Create a span tagged with the current llm_context()."""
+    tags = current_context()
+    return Span(
+        model=model,
+        agent=tags.pop("agent", "unknown"),
+        stage=tags.pop("stage", "unknown"),
+        revision=tags.pop("revision", 0),
+        tags=tags
+    )
+
+@contextmanager
+def timed_span(span: Span) -> Iterator[Span]:
+    """Time the block and record the span when it ends, however it ends."""
+    start = time.perf_counter()
+    try:
+        yield span
+    except (GeneratorExit, asyncio.CancelledError):
+        # The caller stopped early (e.g. a streamed story failed a safety check)
+        span.cancelled = True
+        raise
+    except BaseException as e:
+        span.error = type(e).__name__
+        raise
+    finally:
+        span.duration = time.perf_counter() - start
+        record_span(span)
+
+def track_llm_call(model: str):
+    """Time an LLM call; the caller fills in token usage on the yielded span."""
+    return timed_span(start_span(model))
+
+@contextmanager
+def profile_story() -> Iterator[List[Span]]:
+    """Collect the spans of every LLM call made for one story.
+
+    Profiles nest: a call is recorded in every profile active around it.
+    """
+    spans: List[Span] = []
+    token = _story_spans.set(_story_spans.get() + (spans,))
+    try:
+        yield spans
+    finally:
+        _story_spans.reset(token)
+
+def format_profile(spans: List[Span]) -> str:
+    """Summarise a story's spans per agent and stage as a small table."""
+    rows: Dict[Tuple[str, str, int], List[Span]] = {}
+    for span in spans:
+        rows.setdefault((span.agent, span.stage, span.revision), []).append(span)
+
+    header = f"{'agent':<10} {'stage':<10} {'rev':>3} {'calls':>5} {'seconds':>8} {'prompt':>7} {'output':>7} {'cost $':>8}"
+    lines = [header, "-" * len(header)]
+    for (agent, stage, revision), group in rows.items():
+        lines.append(
+            f"{agent:<10} {stage:<10} {revision:>3} {len(group):>5} "
+            f"{sum(span.duration for span in group):>8.2f} "
+            f"{sum(span.prompt_tokens for span in group):>7} "
+            f"{sum(span.completion_tokens for span in group):>7} "
+            f"{sum(span.cost for span in group):>8.4f}"
+        )
+    lines.append("-" * len(header))
+    lines.append(
+        f"{'total':<25} {len(spans):>5} {sum(span.duration for span in spans):>8.2f} "
+        f"{sum(span.prompt_tokens for span in spans):>7} "
+        f"{sum(span.completion_tokens for span in spans):>7} "
+        f"{sum(span.cost for span in spans):>8.4f}"
+    )
+    return "\n".join(lines)
@@ -0,0 +1,203 @@
+"""Compiled multi-keyword matcher used by the content safety checks."""
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Tuple
+from ..config.content_filter import ALLOWED_WORDS, FORBIDDEN_TOPICS
+
+# Endings that still count as the keyword itself; the default only accepts plurals
+PLURAL_SUFFIXES = ("s", "es")
+INFLECTION_SUFFIXES = PLURAL_SUFFIXES + ("ed", "ly", "er", "est", "ness")
+
+# Trailing marker for a stem keyword, which matches any word starting with it
+STEM_MARKER = "*"
+
+@dataclass(frozen=True)
+class KeywordMatch:
+    keyword: str
+    topic: str
+    start: int  # Offset of the first character in the scanned text
+    end: int  # Offset just past the last character (including any suffix)
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+def _word_stop(text: str, end: int) -> int:
+    """Return the offset of the first non-word character at or after `end`."""
+    while end < len(text) and _is_word_char(text[end]):
+        end += 1
+    return end
+
+def _fold(ch: str) -> str:
+    """Lowercase a single character without changing text offsets."""
+    lowered = ch.lower()
+    return lowered if len(lowered) == 1 else ch
+
+class KeywordMatcher:
+    """Aho-Corasick automaton that finds whole-word keywords in one pass.
+
+    Matching is case-insensitive and respects word boundaries, so "kill" does not
+    match inside "skill". A word made of the keyword plus one of `suffixes` still
+    counts as the keyword ("weapons" matches "weapon"), and a keyword ending in
+    STEM_MARKER matches every word that starts with it ("blood*" matches
+    "bloodshed"). Whole words listed in `allowed_words` are never reported.
+    """
+
+    def __init__(self, keywords: Iterable[Tuple[str, str]], suffixes: Tuple[str, ...] = PLURAL_SUFFIXES,
+                 allowed_words: Iterable[str] = ()):
+        self.suffixes = frozenset(suffixes)
+        self.allowed_words = frozenset(word.lower() for word in allowed_words)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[int]] = [[]]
+        self._depth: List[int] = [0]
+        self._patterns: List[Tuple[str, str]] = []
+        self._stems: List[bool] = []
+
+        for keyword, topic in keywords:
+            keyword = keyword.lower().strip()
+            is_stem = keyword.endswith(STEM_MARKER)
+            keyword = keyword.rstrip(STEM_MARKER).strip()
+            if not keyword:
+                continue
+            node = 0
+            for ch in keyword:
+                next_node = self._goto[node].get(ch)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._outputs.append([])
+                    self._depth.append(self._depth[node] + 1)
+                    self._goto[node][ch] = next_node
+                node = next_node
+            self._outputs[node].append(len(self._patterns))
+            self._patterns.append((keyword, topic))
+            self._stems.append(is_stem)
+
+        self._build_failure_links()
+
+    @classmethod
+    def from_topics(cls, topics: Dict[str, Dict], suffixes: Tuple[str, ...] = PLURAL_SUFFIXES,
+                    allowed_words: Iterable[str] = ()) -> "KeywordMatcher":
+        """Build a matcher from a FORBIDDEN_TOPICS-style mapping."""
+        return cls(
+            ((keyword, topic) for topic, info in topics.items() for keyword in info["keywords"]),
+            suffixes=suffixes,
+            allowed_words=allowed_words
+        )
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0)
+                if self._fail[child] == child:
+                    self._fail[child] = 0
+                self._outputs[child].extend(self._outputs[self._fail[child]])
+
+    def _word_end(self, text: str, pattern_index: int, start: int, end: int, stop: int) -> int:
+        """Return where the keyword's word ends, or -1 if the word is not a match.
+
+        `end` is where the keyword itself ends and `stop` where its word does.
+        """
+        if stop > end and not self._stems[pattern_index] and text[end:stop].lower() not in self.suffixes:
+            return -1
+        if text[start:stop].lower() in self.allowed_words:
+            return -1
+        return stop
+
+    def _step(self, node: int, ch: str) -> int:
+        """Advance the automaton by one character."""
+        ch = _fold(ch)
+        while node and ch not in self._goto[node]:
+            node = self._fail[node]
+        return self._goto[node].get(ch, 0)
+
+    def _candidates(self, text: str, node: int, end: int) -> Iterator[Tuple[int, int]]:
+        """Yield (pattern, start) for keywords ending at `end` that begin on a word boundary."""
+        for pattern_index in self._outputs[node]:
+            start = end - len(self._patterns[pattern_index][0])
+            if start > 0 and _is_word_char(text[start - 1]):
+                continue
+            yield pattern_index, start
+
+    def iter_matches(self, text: str) -> Iterator[KeywordMatch]:
+        """Yield whole-word keyword matches in the order their keywords end."""
+        node = 0
+        for index, ch in enumerate(text):
+            node = self._step(node, ch)
+            for pattern_index, start in self._candidates(text, node, index + 1):
+                end = self._word_end(text, pattern_index, start, index + 1, _word_stop(text, index + 1))
+                if end < 0:
+                    continue
+                keyword, topic = self._patterns[pattern_index]
+                yield KeywordMatch(keyword, topic, start, end)
+
+    def find_all(self, text: str) -> List[KeywordMatch]:
+        """Return every whole-word keyword match in the text, sorted by position."""
+        return sorted(self.iter_matches(text), key=lambda match: (match.start, match.end))
+
+    def search(self, text: str) -> bool:
+        """Return True as soon as the text is found to contain any keyword."""
+        return next(self.iter_matches(text), None) is not None
+
+class KeywordScanner:
+    """Incremental front end to a KeywordMatcher for text that arrives in chunks.
+
+    Matches are reported as soon as the word they sit in has ended, and
+    safe_offset marks how much of the text can no longer be part of a match.
+    """
+
+    def __init__(self, matcher: KeywordMatcher):
+        self.matcher = matcher
+        self.text = ""
+        self._node = 0
+        self._pending: List[Tuple[int, int, int]] = []  # (pattern, start, keyword end)
+
+    def feed(self, chunk: str) -> List[KeywordMatch]:
+        """Scan the next chunk and return matches that are now confirmed."""
+        base = len(self.text)
+        self.text += chunk
+        for index, ch in enumerate(chunk, start=base):
+            self._node = self.matcher._step(self._node, ch)
+            for pattern_index, start in self.matcher._candidates(self.text, self._node, index + 1):
+                self._pending.append((pattern_index, start, index + 1))
+        return self._resolve(final=False)
+
+    def finish(self) -> List[KeywordMatch]:
+        """Signal the end of the text and return any remaining matches."""
+        return self._resolve(final=True)
+
+    def _resolve(self, final: bool) -> List[KeywordMatch]:
+        matches = []
+        still_pending = []
+        for pattern_index, start, keyword_end in self._pending:
+            stop = _word_stop(self.text, keyword_end)
+            if not final and stop == len(self.text):
+                still_pending.append((pattern_index, start, keyword_end))
+                continue
+            end = self.matcher._word_end(self.text, pattern_index, start, keyword_end, stop)
+            if end >= 0:
+                keyword, topic = self.matcher._patterns[pattern_index]
+                matches.append(KeywordMatch(keyword, topic, start, end))
+        self._pending = still_pending
+        return matches
+
+    @property
+    def safe_offset(self) -> int:
+        """Length of the prefix that cannot belong to any keyword match."""
+        offset = len(self.text) - self.matcher._depth[self._node]
+        for _, start, _ in self._pending:
+            offset = min(offset, start)
+        return offset
+
+# Matcher for the forbidden topics, compiled once and shared by every safety check
+FORBIDDEN_MATCHER = KeywordMatcher.from_topics(
+    FORBIDDEN_TOPICS, suffixes=INFLECTION_SUFFIXES, allowed_words=ALLOWED_WORDS
+)
@@ -1,41 +1,310 @@
 """Utilities for interacting with language models."""
 
-from openai import OpenAI
+from typing import AsyncIterator, Iterator, Optional, Union
+from openai import OpenAI, AsyncOpenAI
 from openai.types.chat import ChatCompletion
+from .http_client import get_openai_client, get_async_openai_client
+from .instrumentation import Span, start_span, record_span, timed_span, track_llm_call
+from .prompt_builder import count_tokens
+from .rate_limiter import SCHEDULER
+from .cache import (
+    ResponseCache, TieredCache, LRUCache, SQLiteCache,
+    make_cache_key, DEFAULT_MEMORY_ENTRIES
+)
 from ..config.settings import (
-    OPENAI_API_KEY,
     MODEL_NAME,
     MAX_TOKENS_STORY,
     TEMPERATURE_STORYTELLER
 )
 
-def initialize_openai_client():
-    """Initialize and return an OpenAI client."""
-    try:
-        client = OpenAI(api_key=OPENAI_API_KEY)
-        return client
-    except Exception as e:
-        print(f"Error initializing OpenAI client: {e}")
-        exit()
+class LLMCallError(Exception):
+    """Raised when a model call fails for good, after any retries."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+def _call_error(error: Exception) -> LLMCallError:
+    return LLMCallError(f"Error calling OpenAI API: {str(error)}", getattr(error, "status_code", None))
+
+# Shared response cache consulted by every call unless bypassed
+_response_cache: Optional[ResponseCache] = TieredCache()
+
+def configure_response_cache(
+    memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+    disk_path: Optional[str] = None,
+    **disk_options
+) -> Optional[ResponseCache]:
+    """Replace the shared response cache; memory_entries=0 disables caching."""
+    global _response_cache
+    if memory_entries <= 0:
+        _response_cache = None
+    else:
+        disk = SQLiteCache(disk_path, **disk_options) if disk_path else None
+        _response_cache = TieredCache(LRUCache(memory_entries), disk)
+    return _response_cache
+
+def set_response_cache(cache: Optional[ResponseCache]):
+    """Install a custom cache implementation (or None to disable caching)."""
+    global _response_cache
+    _response_cache = cache
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the shared response cache."""
+    return _response_cache
+
+def initialize_openai_client() -> OpenAI:
+    """Return the shared, pooled OpenAI client.
+
+    Raises ClientInitializationError if the client cannot be created.
+    """
+    return get_openai_client()
+
+def initialize_async_openai_client() -> AsyncOpenAI:
+    """Return the shared, pooled asynchronous OpenAI client for the running event loop."""
+    return get_async_openai_client()
+
+def _build_messages(system_prompt_content: str, user_prompt_content: str) -> list:
+    """Build the chat message list sent to the model."""
+    return [
+        {"role": "system", "content": system_prompt_content},
+        {"role": "user", "content": user_prompt_content}
+    ]
+
+def _cache_lookup(
+    use_cache: bool,
+    system_prompt_content: str,
+    user_prompt_content: str,
+    temperature: float,
+    max_tokens: int
+):
+    """Return (cache, key, cached response) for a call; cache is None when bypassed."""
+    cache = _response_cache if use_cache else None
+    if cache is None:
+        return None, None, None
+    key = make_cache_key(MODEL_NAME, system_prompt_content, user_prompt_content, temperature, max_tokens)
+    cached = cache.get(key)
+    if cached is not None:
+        _record_cache_hit()
+    return cache, key, cached
+
+async def _async_cache_lookup(
+    use_cache: bool,
+    system_prompt_content: str,
+    user_prompt_content: str,
+    temperature: float,
+    max_tokens: int
+):
+    """_cache_lookup without blocking the event loop on the disk tier."""
+    cache = _response_cache if use_cache else None
+    if cache is None:
+        return None, None, None
+    key = make_cache_key(MODEL_NAME, system_prompt_content, user_prompt_content, temperature, max_tokens)
+    cached = await cache.aget(key)
+    if cached is not None:
+        _record_cache_hit()
+    return cache, key, cached
+
+def _record_cache_hit():
+    span = start_span(MODEL_NAME)
+    span.cached = True
+    record_span(span)
+
+def _record_usage(span, response: ChatCompletion):
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        span.prompt_tokens = usage.prompt_tokens
+        span.completion_tokens = usage.completion_tokens
+
+def _estimate_prompt_tokens(system_prompt_content: str, user_prompt_content: str) -> int:
+    return count_tokens(system_prompt_content) + count_tokens(user_prompt_content)
+
+def _used_tokens(response: ChatCompletion) -> Optional[int]:
+    usage = getattr(response, "usage", None)
+    return usage.prompt_tokens + usage.completion_tokens if usage is not None else None
 
 def call_llm(
     client: OpenAI,
     system_prompt_content: str,
     user_prompt_content: str,
     max_tokens: int = MAX_TOKENS_STORY,
-    temperature: float = TEMPERATURE_STORYTELLER
-) -> str:
-    """Call the language model and return its response."""
+    temperature: float = TEMPERATURE_STORYTELLER,
+    use_cache: bool = True,
+    stream: bool = False
+) -> Union[str, Iterator[str]]:
+    """Call the language model and return its response.
+
+    Set use_cache=False for creative calls that should produce a fresh response each time.
+    With stream=True an iterator of text chunks is returned instead (never cached);
+    closing the iterator early cancels the request.
+    """
+    if stream:
+        return stream_llm(client, system_prompt_content, user_prompt_content, max_tokens, temperature)
+    cache, key, cached = _cache_lookup(use_cache, system_prompt_content, user_prompt_content, temperature, max_tokens)
+    if cached is not None:
+        return cached
+
+    def request() -> ChatCompletion:
+        with track_llm_call(MODEL_NAME) as span:
+            response = client.chat.completions.create(
+                model=MODEL_NAME,
+                messages=_build_messages(system_prompt_content, user_prompt_content),
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+            _record_usage(span, response)
+        return response
+
+    estimate = _estimate_prompt_tokens(system_prompt_content, user_prompt_content) + max_tokens
     try:
-        response: ChatCompletion = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {"role": "system", "content": system_prompt_content},
-                {"role": "user", "content": user_prompt_content}
-            ],
-            max_tokens=max_tokens,
-            temperature=temperature
-        )
-        return response.choices[0].message.content or ""
+        response, _ = SCHEDULER.call(MODEL_NAME, estimate, request, _used_tokens)
+        content = response.choices[0].message.content or ""
     except Exception as e:
-        raise Exception(f"Error calling OpenAI API: {str(e)}") 
\ No newline at end of file
+        raise _call_error(e) from e
+    if cache is not None and content:
+        cache.set(key, content)
+    return content
+
+async def async_call_llm(
+    client: AsyncOpenAI,
+    system_prompt_content: str,
+    user_prompt_content: str,
+    max_tokens: int = MAX_TOKENS_STORY,
+    temperature: float = TEMPERATURE_STORYTELLER,
+    use_cache: bool = True,
+    stream: bool = False
+) -> Union[str, AsyncIterator[str]]:
+    """Asynchronously call the language model and return its response.
+
+    With stream=True an async iterator of text chunks is returned instead.
+    """
+    if stream:
+        return async_stream_llm(client, system_prompt_content, user_prompt_content, max_tokens, temperature)
+    cache, key, cached = await _async_cache_lookup(
+        use_cache, system_prompt_content, user_prompt_content, temperature, max_tokens
+    )
+    if cached is not None:
+        return cached
+
+    async def request() -> ChatCompletion:
+        with track_llm_call(MODEL_NAME) as span:
+            response = await client.chat.completions.create(
+                model=MODEL_NAME,
+                messages=_build_messages(system_prompt_content, user_prompt_content),
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+            _record_usage(span, response)
+        return response
+
+    estimate = _estimate_prompt_tokens(system_prompt_content, user_prompt_content) + max_tokens
+    try:
+        response, _ = await SCHEDULER.async_call(MODEL_NAME, estimate, request, _used_tokens)
+        content = response.choices[0].message.content or ""
+    except Exception as e:
+        raise _call_error(e) from e
+    if cache is not None and content:
+        await cache.aset(key, content)
+    return content
+
+def stream_llm(
+    client: OpenAI,
+    system_prompt_content: str,
+    user_prompt_content: str,
+    max_tokens: int = MAX_TOKENS_STORY,
+    temperature: float = TEMPERATURE_STORYTELLER
+) -> Iterator[str]:
+    """Stream the model's response as text chunks; closing the iterator cancels the request."""
+    # The span is tagged now, while the caller's llm_context() is active
+    return _stream_chunks(
+        client, start_span(MODEL_NAME), system_prompt_content, user_prompt_content, max_tokens, temperature
+    )
+
+def _stream_chunks(
+    client: OpenAI,
+    span: Span,
+    system_prompt_content: str,
+    user_prompt_content: str,
+    max_tokens: int,
+    temperature: float
+) -> Iterator[str]:
+    prompt_estimate = _estimate_prompt_tokens(system_prompt_content, user_prompt_content)
+    with timed_span(span):
+        try:
+            response, reservation = SCHEDULER.call(
+                MODEL_NAME,
+                prompt_estimate + max_tokens,
+                lambda: client.chat.completions.create(
+                    model=MODEL_NAME,
+                    messages=_build_messages(system_prompt_content, user_prompt_content),
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+            )
+        except Exception as e:
+            raise _call_error(e) from e
+        try:
+            for chunk in response:
+                if getattr(chunk, "usage", None) is not None:
+                    _record_usage(span, chunk)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    # Roughly one token per chunk; replaced by real usage if the stream completes
+                    span.completion_tokens += 1
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise _call_error(e) from e
+        finally:
+            response.close()
+            SCHEDULER.settle(reservation, (span.prompt_tokens or prompt_estimate) + span.completion_tokens)
+
+def async_stream_llm(
+    client: AsyncOpenAI,
+    system_prompt_content: str,
+    user_prompt_content: str,
+    max_tokens: int = MAX_TOKENS_STORY,
+    temperature: float = TEMPERATURE_STORYTELLER
+) -> AsyncIterator[str]:
+    """Asynchronously stream the model's response; closing the iterator cancels the request."""
+    return _async_stream_chunks(
+        client, start_span(MODEL_NAME), system_prompt_content, user_prompt_content, max_tokens, temperature
+    )
+
+async def _async_stream_chunks(
+    client: AsyncOpenAI,
+    span: Span,
+    system_prompt_content: str,
+    user_prompt_content: str,
+    max_tokens: int,
+    temperature: float
+) -> AsyncIterator[str]:
+    prompt_estimate = _estimate_prompt_tokens(system_prompt_content, user_prompt_content)
+    with timed_span(span):
+        try:
+            response, reservation = await SCHEDULER.async_call(
+                MODEL_NAME,
+                prompt_estimate + max_tokens,
+                lambda: client.chat.completions.create(
+                    model=MODEL_NAME,
+                    messages=_build_messages(system_prompt_content, user_prompt_content),
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+            )
+        except Exception as e:
+            raise _call_error(e) from e
+        try:
+            async for chunk in response:
+                if getattr(chunk, "usage", None) is not None:
+                    _record_usage(span, chunk)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    span.completion_tokens += 1
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise _call_error(e) from e
+        finally:
+            await response.close()
+            SCHEDULER.settle(reservation, (span.prompt_tokens or prompt_estimate) + span.completion_tokens)
@@ -0,0 +1,163 @@
+"""Columnar store for scoring many stories at once.
+
+Scores are kept as an N x len(METRIC_NAMES) float32 array whose columns
+follow METRIC_NAMES, so re-scoring tens of thousands of archived stories
+under new weights is a single matrix product instead of a Python loop per
+story. Requires numpy.
+
+Example:
+    store = MetricsStore.from_jsonl("stories.jsonl")
+    scores = store.overall_scores()            # each story under its own genre
+    by_genre = store.overall_scores(genre_weight_matrix()[1])  # N x genres
+    best = store.top_k()                       # TOP_STORIES_COUNT row indices
+"""
+
+import json
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from ..config.metrics import (
+    StoryMetrics,
+    METRIC_NAMES,
+    CREATIVITY_WEIGHTS,
+    BASE_QUALITY_THRESHOLDS,
+    GENRE_METRIC_ADJUSTMENTS,
+    TOP_STORIES_COUNT,
+    weight_table
+)
+
+METRIC_INDEX = {name: index for index, name in enumerate(METRIC_NAMES)}
+
+# Genre codes stored per row; code 0 means no genre (base weights)
+GENRE_KEYS: Tuple[Optional[str], ...] = (None,) + tuple(GENRE_METRIC_ADJUSTMENTS)
+_GENRE_CODES = {genre: code for code, genre in enumerate(GENRE_KEYS)}
+
+DEFAULT_CAPACITY = 1024
+
+def weight_vector(weights: Dict[str, float]) -> np.ndarray:
+    """Lay out a metric -> value mapping as a vector in METRIC_NAMES order; missing metrics are 0."""
+    vector = np.zeros(len(METRIC_NAMES), dtype=np.float32)
+    for metric, value in weights.items():
+        vector[METRIC_INDEX[metric]] = value
+    return vector
+
+def genre_weight_matrix(genres: Optional[Sequence[Optional[str]]] = None) -> Tuple[List[Optional[str]], np.ndarray]:
+    """Return (genres, G x metrics weight matrix) from the weight registry; defaults to GENRE_KEYS."""
+    genres = list(GENRE_KEYS if genres is None else genres)
+    return genres, np.array([weight_table(genre).vector for genre in genres], dtype=np.float32)
+
+def _genre_code(genre: Optional[str]) -> int:
+    return _GENRE_CODES.get(genre.upper() if genre else None, 0)
+
+class MetricsStore:
+    """Append-only columnar table of story scores with vectorized scoring."""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self._data = np.empty((max(capacity, 1), len(METRIC_NAMES)), dtype=np.float32)
+        self._genres = np.zeros(max(capacity, 1), dtype=np.int16)
+        self._size = 0
+        self.ids: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def values(self) -> np.ndarray:
+        """The N x metrics score array (a view; do not resize)."""
+        return self._data[:self._size]
+
+    @property
+    def genres(self) -> List[Optional[str]]:
+        return [GENRE_KEYS[code] for code in self._genres[:self._size]]
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        if needed <= len(self._data):
+            return
+        capacity = max(needed, len(self._data) * 2)
+        data = np.empty((capacity, len(METRIC_NAMES)), dtype=np.float32)
+        data[:self._size] = self._data[:self._size]
+        genres = np.zeros(capacity, dtype=np.int16)
+        genres[:self._size] = self._genres[:self._size]
+        self._data, self._genres = data, genres
+
+    def add_scores(self, scores: Dict[str, float], story_id: Optional[str] = None, genre: Optional[str] = None) -> int:
+        """Append one story's scores (metric -> value) and return its row index."""
+        self._reserve(1)
+        row = self._size
+        self._data[row] = [scores[metric] for metric in METRIC_NAMES]
+        self._genres[row] = _genre_code(genre)
+        self.ids.append(story_id)
+        self._size += 1
+        return row
+
+    def append(self, metrics: StoryMetrics, story_id: Optional[str] = None, genre: Optional[str] = None) -> int:
+        """Append a StoryMetrics and return its row index."""
+        return self.add_scores(metrics.as_dict(), story_id, genre)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> "MetricsStore":
+        """Build a store from batch output records ({"id", "genre", "scores", ...}); records without scores are skipped."""
+        store = cls()
+        for record in records:
+            if record.get("scores"):
+                store.add_scores(record["scores"], record.get("id"), record.get("genre"))
+        return store
+
+    @classmethod
+    def from_jsonl(cls, path: str) -> "MetricsStore":
+        """Load the scores of every story in a batch output file."""
+        def records():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue  # A truncated last line from an interrupted run
+        return cls.from_records(records())
+
+    def metrics(self, row: int) -> StoryMetrics:
+        """Rebuild the StoryMetrics of one row, scored for the row's genre."""
+        metrics = StoryMetrics(**dict(zip(METRIC_NAMES, self._data[row].tolist())))
+        return metrics.scored_for(GENRE_KEYS[self._genres[row]])
+
+    def overall_scores(self, weights: Union[None, Dict[str, float], np.ndarray] = None) -> np.ndarray:
+        """Weighted overall score of every story.
+
+        weights may be None (each story under its own genre's weights), a
+        metric -> weight dict or vector (returns N scores), or a G x metrics
+        matrix such as genre_weight_matrix()[1] (returns N x G scores).
+        """
+        if weights is None:
+            _, matrix = genre_weight_matrix()
+            return np.einsum("ij,ij->i", self.values, matrix[self._genres[:self._size]])
+        if isinstance(weights, dict):
+            weights = weight_vector(weights)
+        weights = np.asarray(weights, dtype=np.float32)
+        return self.values @ weights.T
+
+    def creativity_scores(self) -> np.ndarray:
+        return self.values @ weight_vector(CREATIVITY_WEIGHTS)
+
+    def below_thresholds(self, thresholds: Dict[str, float] = BASE_QUALITY_THRESHOLDS) -> np.ndarray:
+        """N x metrics boolean mask of scores under their threshold; unlisted metrics never are."""
+        limits = np.full(len(METRIC_NAMES), -np.inf, dtype=np.float32)
+        for metric, threshold in thresholds.items():
+            limits[METRIC_INDEX[metric]] = threshold
+        return self.values < limits
+
+    def needs_revision(self, thresholds: Dict[str, float] = BASE_QUALITY_THRESHOLDS) -> np.ndarray:
+        """Per-story equivalent of StoryJudge.needs_revision."""
+        return self.below_thresholds(thresholds).any(axis=1)
+
+    def top_k(self, k: int = TOP_STORIES_COUNT, scores: Optional[np.ndarray] = None) -> np.ndarray:
+        """Row indices of the k best stories, best first (by overall score unless scores are given)."""
+        if scores is None:
+            scores = self.overall_scores()
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp)
+        if k < len(scores):
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(len(scores))
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
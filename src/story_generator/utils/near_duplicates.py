@@ -0,0 +1,284 @@
+"""Near-duplicate index over requests whose stories were approved.
+
+Requests are reduced to MinHash signatures of their normalized words and
+word pairs (one SHAKE-128 digest per shingle supplies all the hash functions), and banded locality-sensitive hashing finds past requests that
+are probably similar without comparing against every entry. Candidates are
+then checked against the estimated Jaccard similarity, and only stories for
+the same age band count.
+
+On disk, signatures live in an append-only file and each band's bucket keys
+in sorted arrays, both memory-mapped, so a lookup is a binary search per
+band no matter how many millions of entries the index holds. Entries added
+since the last compact() sit in a small in-memory overlay.
+
+Files in the index directory:
+    signatures.bin  header, then one record per entry (story id, age, signature)
+    bands.bin       header, then for each band its sorted keys and entry numbers
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from .instrumentation import METRICS, Histogram
+from .plan_library import normalize_request
+
+# Signature size and LSH banding; 16 bands of 4 rows find 99% of pairs above 0.7 similarity
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 16
+
+# Similarity at which an approved story is served as is, or its plan reused as a seed.
+# Below about 0.7, requests that differ in one key word ("a cat who..." / "a dog who...",
+# "afraid" / "not afraid") still match, and their plans do not carry over.
+DEFAULT_SERVE_THRESHOLD = 0.8
+DEFAULT_SEED_THRESHOLD = 0.7
+
+# Ages whose stories are interchangeable
+AGE_BANDS = {5: 0, 6: 0, 7: 1, 8: 1, 9: 2, 10: 2}
+
+# Lookup latency buckets in seconds
+LOOKUP_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+_SIGNATURES_MAGIC = b"SGSIG1\0\0"
+_BANDS_MAGIC = b"SGBND1\0\0"
+_SIGNATURES_HEADER = struct.Struct("<8sII")  # magic, num_perm, reserved
+_BANDS_HEADER = struct.Struct("<8sIII")  # magic, bands, entries covered, reserved
+
+def _shingles(request: str) -> List[str]:
+    """Normalized words and adjacent word pairs of a request."""
+    words = [word for word in normalize_request(request).split() if len(word) > 1]
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+@dataclass
+class DuplicateMatch:
+    story_id: str
+    age: int
+    similarity: float  # Estimated Jaccard similarity of the two requests
+
+class NearDuplicateIndex:
+    """MinHash/LSH index from requests to the archive story_id of an approved story."""
+
+    def __init__(
+        self,
+        directory: str,
+        num_perm: int = DEFAULT_NUM_PERM,
+        bands: int = DEFAULT_BANDS,
+        serve_threshold: float = DEFAULT_SERVE_THRESHOLD,
+        seed_threshold: float = DEFAULT_SEED_THRESHOLD,
+        seed: bytes = b"story-dedup"
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.directory = directory
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.serve_threshold = serve_threshold
+        self.seed_threshold = seed_threshold
+        self._seed = seed
+        self._record = struct.Struct(f"<16sH{num_perm}I")
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "served": 0, "seeded": 0, "misses": 0, "added": 0}
+        self.latency = Histogram(LOOKUP_BUCKETS)
+
+        os.makedirs(directory, exist_ok=True)
+        self._signatures_path = os.path.join(directory, "signatures.bin")
+        self._bands_path = os.path.join(directory, "bands.bin")
+        if not os.path.exists(self._signatures_path):
+            with open(self._signatures_path, "wb") as f:
+                f.write(_SIGNATURES_HEADER.pack(_SIGNATURES_MAGIC, num_perm, 0))
+        self._file = open(self._signatures_path, "r+b")
+        magic, stored_perm, _ = _SIGNATURES_HEADER.unpack(self._file.read(_SIGNATURES_HEADER.size))
+        if magic != _SIGNATURES_MAGIC or stored_perm != num_perm:
+            raise ValueError(f"{self._signatures_path} is not an index with num_perm={num_perm}")
+        self._entries = (os.path.getsize(self._signatures_path) - _SIGNATURES_HEADER.size) // self._record.size
+        # Drop a record torn by a crash mid-append, or every later record would be misaligned
+        self._file.truncate(_SIGNATURES_HEADER.size + self._entries * self._record.size)
+
+        self._signatures_map: Optional[mmap.mmap] = None
+        self._bands_map: Optional[mmap.mmap] = None
+        self._band_views: List[Tuple[memoryview, memoryview]] = []
+        self._compacted = 0  # Entries covered by bands.bin
+        self._overlay: Dict[Tuple[int, int], List[int]] = {}  # (band, key) -> entries added since compaction
+        self._overlay_records: Dict[int, Tuple[str, int, Tuple[int, ...]]] = {}
+        self._map_files()
+
+    # Signatures
+
+    def signature(self, request: str) -> Tuple[int, ...]:
+        """Per hash function, the smallest 32-bit hash over the request's shingles."""
+        shingles = _shingles(request) or [request.strip().lower()]
+        size = 4 * self.num_perm
+        return tuple(map(min, zip(*(
+            array("I", hashlib.shake_128(self._seed + shingle.encode("utf-8")).digest(size))
+            for shingle in shingles
+        ))))
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> List[int]:
+        return [
+            _hash64(struct.pack(f"<{self.rows}I", *signature[band * self.rows:(band + 1) * self.rows]))
+            for band in range(self.bands)
+        ]
+
+    @staticmethod
+    def similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+        return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+    # Storage
+
+    def _map_files(self):
+        """Map the signature and band files and load uncompacted entries into the overlay."""
+        self._close_maps()
+        if self._entries:
+            self._signatures_map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._compacted = 0
+        if os.path.exists(self._bands_path) and os.path.getsize(self._bands_path) >= _BANDS_HEADER.size:
+            with open(self._bands_path, "rb") as f:
+                self._bands_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, bands, entries, _ = _BANDS_HEADER.unpack_from(self._bands_map, 0)
+            if magic == _BANDS_MAGIC and bands == self.bands and entries <= self._entries:
+                self._compacted = entries
+                view = memoryview(self._bands_map)
+                offset = _BANDS_HEADER.size
+                for _ in range(bands):
+                    keys = view[offset:offset + 8 * entries].cast("Q")
+                    offset += 8 * entries
+                    numbers = view[offset:offset + 4 * entries].cast("I")
+                    offset += 4 * entries
+                    self._band_views.append((keys, numbers))
+        self._overlay = {}
+        self._overlay_records = {}
+        for number in range(self._compacted, self._entries):
+            self._index_overlay(number, self._read_record(number))
+
+    def _close_maps(self):
+        for keys, numbers in self._band_views:
+            keys.release()
+            numbers.release()
+        self._band_views = []
+        for mapped in (self._signatures_map, self._bands_map):
+            if mapped is not None:
+                mapped.close()
+        self._signatures_map = self._bands_map = None
+
+    def _read_record(self, number: int) -> Tuple[str, int, Tuple[int, ...]]:
+        if number in self._overlay_records:
+            return self._overlay_records[number]
+        story_id, age, *signature = self._record.unpack_from(
+            self._signatures_map, _SIGNATURES_HEADER.size + number * self._record.size
+        )
+        return uuid.UUID(bytes=story_id).hex, age, tuple(signature)
+
+    def _index_overlay(self, number: int, record: Tuple[str, int, Tuple[int, ...]]):
+        self._overlay_records[number] = record
+        for band, key in enumerate(self._band_keys(record[2])):
+            self._overlay.setdefault((band, key), []).append(number)
+
+    def _candidates(self, signature: Tuple[int, ...]) -> set:
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            if self._band_views:
+                keys, numbers = self._band_views[band]
+                position = bisect_left(keys, key)
+                while position < len(keys) and keys[position] == key:
+                    candidates.add(numbers[position])
+                    position += 1
+            candidates.update(self._overlay.get((band, key), ()))
+        return candidates
+
+    # Public API
+
+    def add(self, request: str, age: int, story_id: str):
+        """Index an approved story's request; story_id is the archive's (uuid hex) story id."""
+        signature = self.signature(request)
+        with self._lock:
+            self._file.seek(_SIGNATURES_HEADER.size + self._entries * self._record.size)
+            self._file.write(self._record.pack(uuid.UUID(hex=story_id).bytes, age, *signature))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            number = self._entries
+            self._entries += 1
+            self._index_overlay(number, (story_id, age, signature))
+            self.stats["added"] += 1
+
+    def find(self, request: str, age: int, limit: int = 1) -> List[DuplicateMatch]:
+        """Approved stories for the same age band whose requests are at least seed_threshold similar."""
+        signature = self.signature(request)
+        band = AGE_BANDS.get(age, age)
+        with self._lock:
+            matches = []
+            for number in self._candidates(signature):
+                story_id, stored_age, stored_signature = self._read_record(number)
+                if AGE_BANDS.get(stored_age, stored_age) != band:
+                    continue
+                similarity = self.similarity(signature, stored_signature)
+                if similarity >= self.seed_threshold:
+                    matches.append(DuplicateMatch(story_id, stored_age, similarity))
+        matches.sort(key=lambda match: (-match.similarity, match.age != age))
+        return matches[:limit]
+
+    def lookup(self, request: str, age: int) -> Optional[DuplicateMatch]:
+        """Best match for a request, counted in the dedup report."""
+        start = time.perf_counter()
+        matches = self.find(request, age)
+        elapsed = time.perf_counter() - start
+        match = matches[0] if matches else None
+        result = "misses" if match is None else "served" if match.similarity >= self.serve_threshold else "seeded"
+        with self._lock:
+            self.stats["lookups"] += 1
+            self.stats[result] += 1
+            self.latency.observe(elapsed)
+        METRICS.increment("dedup_lookups_total", (("result", result),))
+        return match
+
+    def compact(self):
+        """Fold the overlay into the sorted, memory-mapped band file."""
+        with self._lock:
+            self._file.flush()
+            self._close_maps()
+            self._signatures_map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._entries else None
+            self._overlay_records = {}
+            band_keys = [array("Q") for _ in range(self.bands)]
+            for number in range(self._entries):
+                for band, key in enumerate(self._band_keys(self._read_record(number)[2])):
+                    band_keys[band].append(key)
+            temporary = self._bands_path + ".tmp"
+            with open(temporary, "wb") as f:
+                f.write(_BANDS_HEADER.pack(_BANDS_MAGIC, self.bands, self._entries, 0))
+                for keys in band_keys:
+                    order = sorted(range(len(keys)), key=keys.__getitem__)
+                    f.write(array("Q", (keys[number] for number in order)).tobytes())
+                    f.write(array("I", order).tobytes())
+            os.replace(temporary, self._bands_path)
+            self._map_files()
+
+    def close(self):
+        with self._lock:
+            self._close_maps()
+            self._file.close()
+
+    def __len__(self) -> int:
+        return self._entries
+
+    def report(self) -> str:
+        """Dedup rate and lookup latency summary."""
+        with self._lock:
+            stats = dict(self.stats)
+            p50, p99 = self.latency.quantile(0.5), self.latency.quantile(0.99)
+        lookups = stats["lookups"] or 1
+        return (
+            f"{stats['lookups']} lookups over {self._entries} indexed stories: "
+            f"{stats['served']} served ({stats['served'] / lookups:.0%}), "
+            f"{stats['seeded']} seeded ({stats['seeded'] / lookups:.0%}), "
+            f"{stats['misses']} new; lookup p50 {p50 * 1000:.2f} ms, p99 {p99 * 1000:.2f} ms"
+        )
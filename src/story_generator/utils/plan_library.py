@@ -0,0 +1,148 @@
+"""Persistent library of story outlines reused across repeated requests.
+
+Plans are keyed by the normalized request (lowercased, punctuation and stop
+words dropped), the age, and the genre, so "A dragon who is afraid of the
+dark!" and "dragon afraid of the dark" share outlines. Each key collects a few
+variants before it starts serving them, and hits rotate through the variants
+so a child asking for the same story twice does not get the same one.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+from .instrumentation import METRICS
+
+# Variants planned for a key before lookups start serving from the library
+DEFAULT_VARIANTS_PER_KEY = 3
+
+# Words that do not change what story is being asked for
+STOP_WORDS = frozenset({
+    "a", "an", "the", "and", "or", "but", "of", "to", "in", "on", "at", "for", "with", "about",
+    "who", "whom", "which", "that", "this", "is", "are", "was", "were", "be", "been",
+    "his", "her", "their", "its", "my", "your", "our",
+    "please", "story", "tell", "me", "write", "bedtime", "some", "can", "you", "i", "want", "would", "like"
+})
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+def normalize_request(request: str) -> str:
+    """Reduce a request to its meaningful words, in order."""
+    words = _WORD.findall(request.lower())
+    return " ".join(word for word in words if word not in STOP_WORDS) or " ".join(words)
+
+class PlanLibrary:
+    """SQLite-backed outline store with per-key variant rotation and hit counters.
+
+    normalizer turns a request into the key's request part; swap in one that
+    buckets by embedding to also match paraphrases.
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        variants_per_key: int = DEFAULT_VARIANTS_PER_KEY,
+        validator: Optional[Callable[[Dict, int], bool]] = None,
+        normalizer: Callable[[str], str] = normalize_request
+    ):
+        if variants_per_key < 1:
+            raise ValueError("variants_per_key must be at least 1")
+        self.path = path
+        self.variants_per_key = variants_per_key
+        self.validator = validator
+        self.normalizer = normalizer
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "rejected": 0}
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS plans (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT NOT NULL,
+                plan TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS plans_key ON plans (key)")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS plan_keys (
+                key TEXT PRIMARY KEY,
+                served INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        self._conn.commit()
+
+    def key(self, request: str, age: int, genre: Optional[str] = None) -> str:
+        return f"{age}|{(genre or '').upper()}|{self.normalizer(request)}"
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+        METRICS.increment("plan_library_events_total", (("result", name),))
+
+    def get(self, request: str, age: int, genre: Optional[str] = None) -> Optional[Dict]:
+        """Return the next stored variant for a request, or None while its variants are still being planned."""
+        key = self.key(request, age, genre)
+        with self._lock:
+            plans = [row[0] for row in self._conn.execute(
+                "SELECT plan FROM plans WHERE key = ? ORDER BY id", (key,)
+            )]
+            plan = None
+            if len(plans) >= self.variants_per_key:
+                row = self._conn.execute("SELECT served FROM plan_keys WHERE key = ?", (key,)).fetchone()
+                served = row[0] if row else 0
+                plan = plans[served % len(plans)]
+                self._conn.execute(
+                    "INSERT INTO plan_keys (key, served) VALUES (?, 1) "
+                    "ON CONFLICT(key) DO UPDATE SET served = served + 1",
+                    (key,)
+                )
+                self._conn.commit()
+        self._count("hits" if plan is not None else "misses")
+        return json.loads(plan) if plan is not None else None
+
+    def add(self, request: str, age: int, plan: Dict, genre: Optional[str] = None) -> bool:
+        """Store a freshly planned outline; plans failing the validator are not kept."""
+        try:
+            valid = self.validator is None or self.validator(plan, age)
+        except (KeyError, TypeError):
+            valid = False
+        if not valid:
+            self._count("rejected")
+            return False
+        key = self.key(request, age, genre)
+        with self._lock:
+            stored = self._conn.execute("SELECT COUNT(*) FROM plans WHERE key = ?", (key,)).fetchone()[0]
+            if stored >= self.variants_per_key:
+                return False
+            self._conn.execute(
+                "INSERT INTO plans (key, plan, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(plan, ensure_ascii=False), time.time())
+            )
+            self._conn.commit()
+        self._count("stored")
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM plans")
+            self._conn.execute("DELETE FROM plan_keys")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+
+    def get_stats(self) -> Dict:
+        """Return lookup counters and the hit rate."""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
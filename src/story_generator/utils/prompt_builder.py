@@ -0,0 +1,140 @@
+"""Token-aware prompt assembly.
+
+Prompts are built from a static prefix followed by dynamic sections. Keeping
+the static text first and byte-identical between calls lets the provider's
+prompt caching reuse it. Sections are rendered as compact structured text
+rather than Python reprs. Optional sections are dropped, lowest priority
+first, until the prompt fits its token budget. With TOKEN_SAVINGS enabled,
+every build also records how many tokens each section saved compared with
+the old rendering; that costs an extra tokenization, so it is off by default.
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+from ..config.settings import MODEL_NAME
+
+# tiktoken is in requirements.txt. Without it, counts fall back to one token per
+# word or punctuation mark, which is close for plain English prose but can differ
+# from the model's count, so prompt budgets then trim at slightly different points.
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_encoding = None
+
+def count_tokens(text: str) -> int:
+    """Count tokens with the model's tokenizer, or estimate them without tiktoken."""
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            try:
+                _encoding = tiktoken.encoding_for_model(MODEL_NAME)
+            except KeyError:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+        return len(_encoding.encode(text))
+    return len(_TOKEN_PATTERN.findall(text))
+
+@lru_cache(maxsize=32)
+def _prefix_tokens(prefix: str) -> int:
+    """Token count of a static prompt prefix; prefixes are module constants, so counted once each."""
+    return count_tokens(prefix)
+
+def render_compact(value: Any, indent: int = 0) -> str:
+    """Render nested dicts and lists as indented "key: value" text."""
+    pad = "  " * indent
+    if isinstance(value, dict):
+        lines = []
+        for key, item in value.items():
+            label = str(key).replace("_", " ")
+            if isinstance(item, (dict, list)) and item and not _is_flat_list(item):
+                lines.append(f"{pad}{label}:")
+                lines.append(render_compact(item, indent + 1))
+            else:
+                lines.append(f"{pad}{label}: {render_compact(item)}".rstrip())
+        return "\n".join(lines)
+    if isinstance(value, list):
+        if _is_flat_list(value):
+            return "; ".join(str(item) for item in value)
+        return "\n".join(
+            f"{pad}- {render_compact(item, indent + 1).lstrip()}" for item in value
+        )
+    return str(value)
+
+def _is_flat_list(value: Any) -> bool:
+    return isinstance(value, list) and all(not isinstance(item, (dict, list)) for item in value)
+
+@dataclass
+class PromptSection:
+    name: str
+    text: str
+    required: bool = True
+    priority: int = 0  # Optional sections with the lowest priority are dropped first
+    baseline: Optional[Callable[[], str]] = None  # Builds the previous rendering; called only while savings are tracked
+
+class TokenSavings:
+    """Thread-safe running totals of tokens saved per prompt section.
+
+    Nothing is recorded until enabled is set.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, int]] = {}
+
+    def record(self, section: str, baseline_tokens: int, actual_tokens: int):
+        with self._lock:
+            totals = self._totals.setdefault(section, {"calls": 0, "baseline": 0, "actual": 0})
+            totals["calls"] += 1
+            totals["baseline"] += baseline_tokens
+            totals["actual"] += actual_tokens
+
+    def report(self) -> Dict[str, Dict[str, int]]:
+        """Return baseline, actual, and saved input tokens per section."""
+        with self._lock:
+            return {
+                section: {**totals, "saved": totals["baseline"] - totals["actual"]}
+                for section, totals in self._totals.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._totals.clear()
+
+TOKEN_SAVINGS = TokenSavings()
+
+def assemble_prompt(
+    prefix: str,
+    sections: List[PromptSection],
+    budget: Optional[int] = None,
+    kind: str = "prompt"
+) -> str:
+    """Join a static prefix and sections, trimming optional ones to fit the budget."""
+    section_tokens = {section.name: count_tokens(section.text) for section in sections}
+    total = _prefix_tokens(prefix) + sum(section_tokens.values())
+
+    dropped = set()
+    if budget is not None and total > budget:
+        optional = sorted(
+            (section for section in sections if not section.required),
+            key=lambda section: section.priority
+        )
+        for section in optional:
+            if total <= budget:
+                break
+            dropped.add(section.name)
+            total -= section_tokens[section.name]
+
+    if TOKEN_SAVINGS.enabled:
+        for section in sections:
+            if section.baseline is not None:
+                actual = 0 if section.name in dropped else section_tokens[section.name]
+                TOKEN_SAVINGS.record(f"{kind}.{section.name}", count_tokens(section.baseline()), actual)
+
+    parts = [prefix] + [section.text for section in sections if section.name not in dropped]
+    return "\n\n".join(part for part in parts if part)
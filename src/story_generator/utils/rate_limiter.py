@@ -0,0 +1,367 @@
+"""Request and token budgeting with prioritised queuing and retries for LLM calls.
+
+Each model gets a requests-per-minute and a tokens-per-minute token bucket.
+A call reserves one request and its estimated tokens (prompt plus max_tokens,
+which is how the provider counts them) before it is sent, and the unused
+part of the estimate is refunded once the real usage is known. Callers wait
+in a priority queue, so interactive stories are served before batch ones.
+
+Retryable failures (429, 5xx, timeouts, dropped connections) are retried
+with jittered exponential backoff. A Retry-After header from a 429 pauses
+every caller of that model, not just the one that got it, so the whole
+process backs off together instead of thrashing the limit.
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from openai import APIConnectionError
+from .instrumentation import METRICS, current_context
+
+# Queue priorities; lower is served first. Pick one with llm_context(priority=...)
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+PRIORITIES = {PRIORITY_INTERACTIVE: 0, PRIORITY_BATCH: 1}
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# How long a queued caller sleeps before re-checking when nothing wakes it
+_IDLE_WAIT_SECONDS = 1.0
+
+@dataclass(frozen=True)
+class RateLimits:
+    requests_per_minute: float
+    tokens_per_minute: float
+
+# Per-model budgets; set these to your account's limits with set_rate_limits()
+DEFAULT_RATE_LIMITS = RateLimits(requests_per_minute=500, tokens_per_minute=200_000)
+MODEL_RATE_LIMITS: Dict[str, RateLimits] = {
+    "gpt-3.5-turbo": RateLimits(requests_per_minute=3_500, tokens_per_minute=200_000),
+    "gpt-4o-mini": RateLimits(requests_per_minute=5_000, tokens_per_minute=2_000_000),
+    "gpt-4o": RateLimits(requests_per_minute=5_000, tokens_per_minute=800_000),
+}
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given (0-based) retry attempt."""
+        return random.uniform(0.0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+class RetryableError(Exception):
+    """Raise from a request to have the scheduler retry it like a 5xx response."""
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Return the server-requested delay in seconds carried by an API error, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after") is not None:
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None  # An HTTP date; fall back to our own backoff
+    return None
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (RetryableError, APIConnectionError)):
+        return True
+    return _status_code(error) in RETRYABLE_STATUS_CODES
+
+class TokenBucket:
+    """Continuously refilling budget of `capacity` units per minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available (0 if they are now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)  # Oversized requests wait for a full bucket
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def give(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+@dataclass
+class Reservation:
+    model: str
+    tokens: int
+    queued_seconds: float = 0.0
+
+class _Waiter:
+    def __init__(self, priority: int, sequence: int, tokens: int, wake: Callable[[], None]):
+        self.priority = priority
+        self.sequence = sequence
+        self.tokens = tokens
+        self.wake = wake
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+class _ModelBudget:
+    def __init__(self, limits: RateLimits):
+        self.requests = TokenBucket(limits.requests_per_minute)
+        self.tokens = TokenBucket(limits.tokens_per_minute)
+        self.paused_until = 0.0
+        self.queue: List[_Waiter] = []
+
+class RateLimitScheduler:
+    """Admits LLM calls within per-model budgets, highest priority first, and retries failures."""
+
+    def __init__(self, retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY):
+        self.retry_policy = retry_policy
+        self._limits = dict(MODEL_RATE_LIMITS)
+        self._budgets: Dict[str, _ModelBudget] = {}
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+
+    def set_rate_limits(self, model: str, requests_per_minute: float, tokens_per_minute: float):
+        """Change a model's budgets; takes effect for calls queued afterwards."""
+        with self._lock:
+            self._limits[model] = RateLimits(requests_per_minute, tokens_per_minute)
+            old = self._budgets.pop(model, None)
+            if old is not None:
+                budget = self._budget(model)
+                budget.queue, budget.paused_until = old.queue, old.paused_until
+
+    def _budget(self, model: str) -> _ModelBudget:
+        budget = self._budgets.get(model)
+        if budget is None:
+            budget = _ModelBudget(self._limits.get(model, DEFAULT_RATE_LIMITS))
+            self._budgets[model] = budget
+        return budget
+
+    def _report_depth(self, model: str, budget: _ModelBudget):
+        for name, priority in PRIORITIES.items():
+            depth = sum(1 for waiter in budget.queue if waiter.priority == priority)
+            METRICS.set_gauge("llm_queue_depth", (("model", model), ("priority", name)), depth)
+
+    def _enqueue(self, model: str, tokens: int, wake: Callable[[], None]) -> _Waiter:
+        priority = PRIORITIES.get(current_context().get("priority", PRIORITY_INTERACTIVE), 0)
+        with self._lock:
+            budget = self._budget(model)
+            waiter = _Waiter(priority, next(self._sequence), tokens, wake)
+            heapq.heappush(budget.queue, waiter)
+            self._report_depth(model, budget)
+            if budget.queue[0] is waiter:
+                waiter.wake()
+            return waiter
+
+    def _try_admit(self, model: str, waiter: _Waiter) -> Optional[float]:
+        """Admit the waiter if it is next in line and the budgets allow; else return how long to wait."""
+        with self._lock:
+            budget = self._budget(model)
+            if not budget.queue or budget.queue[0] is not waiter:
+                return _IDLE_WAIT_SECONDS
+            now = time.monotonic()
+            wait = max(
+                budget.paused_until - now,
+                budget.requests.wait_time(1, now),
+                budget.tokens.wait_time(waiter.tokens, now)
+            )
+            if wait > 0:
+                return wait
+            budget.requests.take(1)
+            budget.tokens.take(waiter.tokens)
+            heapq.heappop(budget.queue)
+            self._report_depth(model, budget)
+            if budget.queue:
+                budget.queue[0].wake()
+            return None
+
+    def _abandon(self, model: str, waiter: _Waiter):
+        """Remove a waiter that gave up (e.g. its task was cancelled)."""
+        with self._lock:
+            budget = self._budget(model)
+            if waiter in budget.queue:
+                was_head = budget.queue[0] is waiter
+                budget.queue.remove(waiter)
+                heapq.heapify(budget.queue)
+                self._report_depth(model, budget)
+                if was_head and budget.queue:
+                    budget.queue[0].wake()
+
+    def _record_wait(self, reservation: Reservation):
+        METRICS.increment(
+            "llm_queue_wait_seconds_total", (("model", reservation.model),), reservation.queued_seconds
+        )
+
+    def acquire(self, model: str, tokens: int) -> Reservation:
+        """Block until one request and `tokens` tokens of the model's budget are ours."""
+        event = threading.Event()
+        start = time.monotonic()
+        waiter = self._enqueue(model, tokens, event.set)
+        admitted = False
+        try:
+            while True:
+                wait = self._try_admit(model, waiter)
+                if wait is None:
+                    admitted = True
+                    break
+                event.wait(wait)
+                event.clear()
+        finally:
+            if not admitted:
+                self._abandon(model, waiter)
+        reservation = Reservation(model, tokens, time.monotonic() - start)
+        self._record_wait(reservation)
+        return reservation
+
+    async def async_acquire(self, model: str, tokens: int) -> Reservation:
+        """Wait, without blocking the event loop, until the model's budget admits the call."""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        start = time.monotonic()
+        waiter = self._enqueue(model, tokens, lambda: loop.call_soon_threadsafe(event.set))
+        admitted = False
+        try:
+            while True:
+                wait = self._try_admit(model, waiter)
+                if wait is None:
+                    admitted = True
+                    break
+                try:
+                    await asyncio.wait_for(event.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                event.clear()
+        finally:
+            if not admitted:
+                self._abandon(model, waiter)
+        reservation = Reservation(model, tokens, time.monotonic() - start)
+        self._record_wait(reservation)
+        return reservation
+
+    def settle(self, reservation: Reservation, used_tokens: int):
+        """Refund the part of a reservation the call did not use."""
+        unused = reservation.tokens - used_tokens
+        if unused <= 0:
+            return
+        with self._lock:
+            budget = self._budget(reservation.model)
+            budget.tokens.give(unused)
+            if budget.queue:
+                budget.queue[0].wake()
+
+    def retry_delay(self, model: str, attempt: int, error: Exception) -> Optional[float]:
+        """Return how long to wait before retrying after `error`, or None to give up.
+
+        A rate-limit response also pauses every other caller of the model.
+        """
+        status = _status_code(error)
+        if status == 429:
+            METRICS.increment("llm_rate_limited_total", (("model", model),))
+        if not is_retryable(error) or attempt + 1 >= self.retry_policy.max_attempts:
+            return None
+        server_delay = retry_after(error)
+        delay = self.retry_policy.backoff(attempt)
+        if server_delay is not None:
+            # Honour the server, plus a little jitter so paused callers don't return in lockstep
+            delay = server_delay + random.uniform(0.0, min(1.0, server_delay * 0.1 + 0.05))
+        if status == 429:
+            with self._lock:
+                budget = self._budget(model)
+                budget.paused_until = max(budget.paused_until, time.monotonic() + delay)
+        METRICS.increment("llm_retries_total", (("model", model), ("status", str(status or "connection"))))
+        return delay
+
+    def call(
+        self,
+        model: str,
+        tokens: int,
+        request: Callable[[], Any],
+        used_tokens: Optional[Callable[[Any], Optional[int]]] = None
+    ) -> Tuple[Any, Reservation]:
+        """Run request() within the model's budgets, retrying retryable failures.
+
+        used_tokens(response) reports the real usage to settle the reservation
+        with; leave it out (or return None) to settle later with settle().
+        """
+        attempt = 0
+        while True:
+            reservation = self.acquire(model, tokens)
+            try:
+                response = request()
+            except Exception as e:
+                self.settle(reservation, 0)
+                delay = self.retry_delay(model, attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            used = used_tokens(response) if used_tokens else None
+            if used is not None:
+                self.settle(reservation, used)
+            return response, reservation
+
+    async def async_call(
+        self,
+        model: str,
+        tokens: int,
+        request: Callable[[], Awaitable[Any]],
+        used_tokens: Optional[Callable[[Any], Optional[int]]] = None
+    ) -> Tuple[Any, Reservation]:
+        """Asynchronous twin of call()."""
+        attempt = 0
+        while True:
+            reservation = await self.async_acquire(model, tokens)
+            try:
+                response = await request()
+            except Exception as e:
+                self.settle(reservation, 0)
+                delay = self.retry_delay(model, attempt, e)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            used = used_tokens(response) if used_tokens else None
+            if used is not None:
+                self.settle(reservation, used)
+            return response, reservation
+
+    def queue_depth(self, model: str) -> Dict[str, int]:
+        """Number of callers waiting for the model, per priority."""
+        with self._lock:
+            budget = self._budget(model)
+            return {
+                name: sum(1 for waiter in budget.queue if waiter.priority == priority)
+                for name, priority in PRIORITIES.items()
+            }
+
+# Shared scheduler used by every call_llm invocation
+SCHEDULER = RateLimitScheduler()
+
+def set_rate_limits(model: str, requests_per_minute: float, tokens_per_minute: float):
+    """Configure the shared scheduler's budgets for a model."""
+    SCHEDULER.set_rate_limits(model, requests_per_minute, tokens_per_minute)
@@ -0,0 +1,222 @@
+"""Strict, forgiving parsing of JSON responses from the language model.
+
+Responses are decoded with orjson when it is installed (falling back to the
+standard json module). When the model wraps its JSON in code fences or prose,
+or produces near-JSON (single quotes, trailing commas, Python literals, a
+truncated tail), the text is repaired locally before anything is re-asked.
+Only when local repair fails is a short repair request sent to the model.
+"""
+
+import json
+from typing import Any, Dict
+from openai import OpenAI, AsyncOpenAI
+from .llm_utils import call_llm, async_call_llm
+from .instrumentation import llm_context
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional speedup
+    orjson = None
+
+class ResponseParseError(ValueError):
+    """Raised when a model response cannot be turned into valid, schema-conforming JSON."""
+
+def _loads(text: str) -> Any:
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+def extract_json(text: str) -> str:
+    """Return the outermost JSON object in the text, dropping fences and surrounding prose."""
+    start = text.find("{")
+    if start < 0:
+        raise ResponseParseError("No JSON object found in response")
+    depth = 0
+    quote = None
+    escaped = False
+    for index in range(start, len(text)):
+        ch = text[index]
+        if quote:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == quote:
+                quote = None
+        elif ch in "\"'":
+            quote = ch
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    # Unterminated (usually a truncated response); repair will close it
+    return text[start:]
+
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+def repair_json(text: str) -> str:
+    """Fix the common ways model output deviates from JSON.
+
+    Handles single-quoted strings, unquoted keys, Python True/False/None,
+    trailing commas, // and /* */ comments, and unclosed strings, arrays,
+    and objects.
+    """
+    out = []
+    closers = []
+    index = 0
+    length = len(text)
+    while index < length:
+        ch = text[index]
+        if ch in "\"'":
+            # Copy a string, normalising it to double quotes
+            quote = ch
+            out.append('"')
+            index += 1
+            while index < length and text[index] != quote:
+                if text[index] == "\\" and index + 1 < length:
+                    if quote == "'" and text[index + 1] == "'":
+                        out.append("'")
+                    else:
+                        out.append(text[index:index + 2])
+                    index += 2
+                    continue
+                if text[index] == '"':
+                    out.append('\\"')
+                elif text[index] == "\n":
+                    out.append("\\n")
+                else:
+                    out.append(text[index])
+                index += 1
+            out.append('"')
+            index += 1
+            continue
+        if text.startswith("//", index):
+            newline = text.find("\n", index)
+            index = length if newline < 0 else newline
+            continue
+        if text.startswith("/*", index):
+            close = text.find("*/", index + 2)
+            index = length if close < 0 else close + 2
+            continue
+        if ch in "{[":
+            closers.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            # Drop a trailing comma before the closing bracket
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            if closers:
+                closers.pop()
+        elif ch.isalpha():
+            end = index
+            while end < length and (text[end].isalnum() or text[end] == "_"):
+                end += 1
+            word = text[index:end]
+            if text[end:].lstrip().startswith(":"):
+                out.append(f'"{word}"')  # Unquoted object key
+            else:
+                out.append(_PYTHON_LITERALS.get(word, word))
+            index = end
+            continue
+        out.append(ch)
+        index += 1
+
+    # Close anything a truncated response left open
+    while out and (out[-1].isspace() or out[-1] in ",:"):
+        out.pop()
+    out.extend(reversed(closers))
+    return "".join(out)
+
+def validate_schema(value: Any, schema: Any, path: str = "response"):
+    """Check a decoded value against a simple schema.
+
+    A schema is a type (or tuple of types), a dict of required keys to schemas,
+    a one-element list giving the schema of every item, or a predicate function.
+    """
+    if isinstance(schema, dict):
+        if not isinstance(value, dict):
+            raise ResponseParseError(f"{path} should be an object")
+        for key, sub_schema in schema.items():
+            if key not in value:
+                raise ResponseParseError(f"{path} is missing '{key}'")
+            validate_schema(value[key], sub_schema, f"{path}.{key}")
+    elif isinstance(schema, list):
+        if not isinstance(value, list):
+            raise ResponseParseError(f"{path} should be a list")
+        for index, item in enumerate(value):
+            validate_schema(item, schema[0], f"{path}[{index}]")
+    elif isinstance(schema, (type, tuple)):
+        types = schema if isinstance(schema, tuple) else (schema,)
+        # bool is an int subclass, so only accept it where asked for explicitly
+        if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+            raise ResponseParseError(f"{path} has the wrong type")
+    elif not schema(value):
+        raise ResponseParseError(f"{path} has an invalid value: {value!r}")
+
+def parse_json_response(response: str, schema: Any = None) -> Dict:
+    """Decode a model response as JSON, repairing it locally if needed."""
+    candidate = extract_json(response)
+    try:
+        result = _loads(candidate)
+    except ValueError:
+        try:
+            result = _loads(repair_json(candidate))
+        except ValueError as e:
+            raise ResponseParseError(f"Invalid JSON after repair: {e}")
+    if schema is not None:
+        validate_schema(result, schema)
+    return result
+
+REPAIR_SYSTEM_PROMPT = "You fix malformed JSON. Respond only with the corrected JSON and nothing else."
+
+REPAIR_PROMPT = """The JSON below could not be used because: {error}
+
+Return the same content as valid JSON, adding any missing fields. Do not change the wording of existing values.
+
+{response}"""
+
+def _repair_prompt(response: str, error: Exception) -> str:
+    return REPAIR_PROMPT.format(error=error, response=response)
+
+def parse_with_repair(
+    client: OpenAI,
+    response: str,
+    schema: Any = None,
+    max_tokens: int = 1000
+) -> Dict:
+    """Parse a response, asking the model to fix it only when local repair fails."""
+    try:
+        return parse_json_response(response, schema)
+    except ResponseParseError as e:
+        with llm_context(stage="repair"):
+            repaired = call_llm(
+                client=client,
+                system_prompt_content=REPAIR_SYSTEM_PROMPT,
+                user_prompt_content=_repair_prompt(response, e),
+                max_tokens=max_tokens,
+                temperature=0.0
+            )
+        return parse_json_response(repaired, schema)
+
+async def async_parse_with_repair(
+    client: AsyncOpenAI,
+    response: str,
+    schema: Any = None,
+    max_tokens: int = 1000
+) -> Dict:
+    """Parse a response, asking the model to fix it only when local repair fails."""
+    try:
+        return parse_json_response(response, schema)
+    except ResponseParseError as e:
+        with llm_context(stage="repair"):
+            repaired = await async_call_llm(
+                client=client,
+                system_prompt_content=REPAIR_SYSTEM_PROMPT,
+                user_prompt_content=_repair_prompt(response, e),
+                max_tokens=max_tokens,
+                temperature=0.0
+            )
+        return parse_json_response(repaired, schema)
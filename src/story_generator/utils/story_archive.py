@@ -0,0 +1,328 @@
+"""Append-only archive of finished stories, their scores, and their cost.
+
+Every story is stored with its request, age, genre, plan, text, final
+scores (one column per metric), the scores of each revision, tokens, cost,
+and latency. SQLite in WAL mode keeps readers and the writer out of each
+other's way, and indexes on genre, age, and overall score make queries like
+"top 5 fantasy stories for age 7" an index range scan.
+
+Writes are queued and committed in batches by a background thread, so the
+generation hot path never waits on disk.
+
+Example:
+    archive = StoryArchive()
+    archive.record(ArchiveRecord(request="a brave bunny", age=7, story=story, metrics=metrics))
+    archive.flush()
+    best = archive.top_stories(genre="FANTASY", age=7)
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from ..config.metrics import (
+    StoryMetrics,
+    METRIC_NAMES,
+    DEFAULT_METRICS_STORAGE,
+    TOP_STORIES_COUNT,
+    weight_table
+)
+
+# Most records committed in one transaction, and the longest a record waits to be written
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+_STORY_COLUMNS = (
+    "story_id", "created_at", "request", "age", "genre", "plan", "story", "judgment",
+    "revisions", "overall_score", "creativity_score", *METRIC_NAMES,
+    "prompt_tokens", "completion_tokens", "cost", "latency"
+)
+
+_SCHEMA = (
+    f"""CREATE TABLE IF NOT EXISTS stories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        story_id TEXT,
+        created_at REAL NOT NULL,
+        request TEXT NOT NULL,
+        age INTEGER NOT NULL,
+        genre TEXT,
+        plan TEXT,
+        story TEXT NOT NULL,
+        judgment TEXT,
+        revisions INTEGER NOT NULL DEFAULT 0,
+        overall_score REAL NOT NULL,
+        creativity_score REAL NOT NULL,
+        {", ".join(f"{metric} REAL NOT NULL" for metric in METRIC_NAMES)},
+        prompt_tokens INTEGER NOT NULL DEFAULT 0,
+        completion_tokens INTEGER NOT NULL DEFAULT 0,
+        cost REAL NOT NULL DEFAULT 0,
+        latency REAL
+    )""",
+    """CREATE TABLE IF NOT EXISTS revisions (
+        story INTEGER NOT NULL REFERENCES stories (id),
+        revision INTEGER NOT NULL,
+        overall_score REAL NOT NULL,
+        scores TEXT NOT NULL,
+        PRIMARY KEY (story, revision)
+    )""",
+    "CREATE INDEX IF NOT EXISTS stories_genre_age_score ON stories (genre, age, overall_score DESC)",
+    "CREATE INDEX IF NOT EXISTS stories_age_score ON stories (age, overall_score DESC)",
+    "CREATE INDEX IF NOT EXISTS stories_score ON stories (overall_score DESC)",
+    "CREATE INDEX IF NOT EXISTS stories_story_id ON stories (story_id)",
+)
+
+@dataclass
+class ArchiveRecord:
+    request: str
+    age: int
+    story: str
+    metrics: StoryMetrics
+    genre: Optional[str] = None
+    plan: Optional[Dict] = None
+    judgment: str = ""
+    revision_metrics: List[StoryMetrics] = field(default_factory=list)  # Scores of each judged draft, in order
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+    latency: Optional[float] = None
+    story_id: Optional[str] = None
+
+    @classmethod
+    def from_result(cls, result: Any, latency: Optional[float] = None, story_id: Optional[str] = None) -> "ArchiveRecord":
+        """Build a record from a pipeline StoryResult, totalling its spans."""
+        return cls(
+            request=result.request.request,
+            age=result.request.age,
+            story=result.story,
+            metrics=result.metrics,
+            genre=result.request.genre,
+            plan=result.plan,
+            judgment=result.judgment,
+            revision_metrics=list(result.revision_metrics),
+            prompt_tokens=sum(span.prompt_tokens for span in result.spans),
+            completion_tokens=sum(span.completion_tokens for span in result.spans),
+            cost=sum(span.cost for span in result.spans),
+            latency=latency,
+            story_id=story_id
+        )
+
+    def row(self) -> Tuple:
+        # A copy: the caller may still be reading its metrics while the writer thread runs
+        metrics = StoryMetrics(**self.metrics.as_dict()).scored_for(self.genre)
+        scores = metrics.as_dict()
+        return (
+            self.story_id, time.time(), self.request, self.age, self.genre.upper() if self.genre else None,
+            json.dumps(self.plan, ensure_ascii=False) if self.plan is not None else None,
+            self.story, self.judgment, max(len(self.revision_metrics) - 1, 0),
+            metrics.overall_score, metrics.creativity_score, *(scores[metric] for metric in METRIC_NAMES),
+            self.prompt_tokens, self.completion_tokens, self.cost, self.latency
+        )
+
+class StoryArchive:
+    """SQLite story archive with a batched background writer."""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_METRICS_STORAGE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[ArchiveRecord]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+        self.errors = 0
+        self._writer = threading.Thread(target=self._write_loop, name="story-archive-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # WAL stays consistent; only the last commits may be lost on power loss
+        return conn
+
+    def record(self, record: ArchiveRecord):
+        """Queue a finished story for writing; returns immediately."""
+        self._queue.put(record)
+
+    def record_result(self, result: Any, latency: Optional[float] = None, story_id: Optional[str] = None):
+        """Queue a pipeline StoryResult; failed stories are not archived."""
+        if result.error or result.metrics is None:
+            return
+        self.record(ArchiveRecord.from_result(result, latency, story_id))
+
+    def _write_loop(self):
+        conn = self._connect()
+        closing = False
+        while not closing:
+            batch: List[ArchiveRecord] = []
+            try:
+                item = self._queue.get()
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    if item is None:
+                        closing = True
+                    else:
+                        batch.append(item)
+                    if closing or len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                if batch:
+                    self._write_batch(conn, batch)
+            finally:
+                for _ in range(len(batch) + closing):
+                    self._queue.task_done()
+        conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: List[ArchiveRecord]):
+        placeholders = ", ".join("?" for _ in _STORY_COLUMNS)
+        try:
+            with conn:
+                for record in batch:
+                    cursor = conn.execute(
+                        f"INSERT INTO stories ({', '.join(_STORY_COLUMNS)}) VALUES ({placeholders})",
+                        record.row()
+                    )
+                    conn.executemany(
+                        "INSERT INTO revisions (story, revision, overall_score, scores) VALUES (?, ?, ?, ?)",
+                        [
+                            (cursor.lastrowid, revision, metrics.overall_score, json.dumps(metrics.as_dict()))
+                            for revision, metrics in enumerate(record.revision_metrics)
+                        ]
+                    )
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            self.errors += len(batch)
+            print(f"⚠️ Could not archive {len(batch)} stories: {e}")
+
+    def flush(self):
+        """Block until every queued story is written."""
+        self._queue.join()
+
+    def close(self):
+        """Write the remaining stories and stop the writer."""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        with self._lock:
+            self._conn.close()
+
+    def _query(self, sql: str, params: Sequence = ()) -> List[Dict]:
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _filters(genre: Optional[str], age: Optional[int]) -> Tuple[str, List]:
+        clauses, params = [], []
+        if genre is not None:
+            clauses.append("genre = ?")
+            params.append(genre.upper())
+        if age is not None:
+            clauses.append("age = ?")
+            params.append(age)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def top_stories(
+        self,
+        k: int = TOP_STORIES_COUNT,
+        genre: Optional[str] = None,
+        age: Optional[int] = None
+    ) -> List[Dict]:
+        """Best stories by overall score, optionally for one genre and/or age."""
+        where, params = self._filters(genre, age)
+        return self._query(
+            f"SELECT id, request, age, genre, story, overall_score, creativity_score FROM stories{where} "
+            "ORDER BY overall_score DESC LIMIT ?",
+            params + [k]
+        )
+
+    def rescore(
+        self,
+        weights: Optional[Dict[str, float]] = None,
+        k: int = TOP_STORIES_COUNT,
+        genre: Optional[str] = None,
+        age: Optional[int] = None
+    ) -> List[Dict]:
+        """Best stories under other weights (default: each story's genre's current weights), scored in SQL.
+
+        For re-scoring the whole archive under many weightings at once, load it
+        with metrics_store() and use MetricsStore.overall_scores().
+        """
+        where, params = self._filters(genre, age)
+        if weights is not None:
+            unknown = set(weights) - set(METRIC_NAMES)
+            if unknown:
+                raise ValueError(f"Unknown metrics: {', '.join(sorted(unknown))}")
+            expression, values = self._weighted_sum(weights)
+        else:
+            # One branch per genre in the archive; stories without a known genre get the base weights
+            genres = [row["genre"] for row in self._query(f"SELECT DISTINCT genre FROM stories{where}", params)]
+            branches, values = [], []
+            for stored_genre in genres:
+                if stored_genre is None:
+                    continue
+                branch, branch_values = self._weighted_sum(weight_table(stored_genre).weights)
+                branches.append(f"WHEN ? THEN {branch}")
+                values += [stored_genre, *branch_values]
+            fallback, fallback_values = self._weighted_sum(weight_table(None).weights)
+            expression = f"CASE genre {' '.join(branches)} ELSE {fallback} END" if branches else fallback
+            values += fallback_values
+        return self._query(
+            f"SELECT id, request, age, genre, ({expression}) AS score FROM stories{where} "
+            "ORDER BY score DESC LIMIT ?",
+            values + params + [k]
+        )
+
+    @staticmethod
+    def _weighted_sum(weights: Dict[str, float]) -> Tuple[str, List[float]]:
+        return "(" + " + ".join(f"? * {metric}" for metric in weights) + ")", list(weights.values())
+
+    def _with_revisions(self, rows: List[Dict]) -> Optional[Dict]:
+        if not rows:
+            return None
+        row = rows[0]
+        row["plan"] = json.loads(row["plan"]) if row["plan"] else None
+        row["revision_scores"] = [
+            json.loads(revision["scores"])
+            for revision in self._query("SELECT scores FROM revisions WHERE story = ? ORDER BY revision", (row["id"],))
+        ]
+        return row
+
+    def get(self, story: int) -> Optional[Dict]:
+        """One archived story with its plan and the scores of each revision."""
+        return self._with_revisions(self._query("SELECT * FROM stories WHERE id = ?", (story,)))
+
+    def find(self, story_id: str) -> Optional[Dict]:
+        """Like get(), by the pipeline's story_id; None until the story has been written."""
+        return self._with_revisions(self._query("SELECT * FROM stories WHERE story_id = ? LIMIT 1", (story_id,)))
+
+    @staticmethod
+    def metrics_of(row: Dict) -> StoryMetrics:
+        """Final scores of an archived story, weighted for its genre."""
+        return StoryMetrics(**{metric: row[metric] for metric in METRIC_NAMES}).scored_for(row["genre"])
+
+    def metrics_store(self, genre: Optional[str] = None, age: Optional[int] = None):
+        """Load final scores into a MetricsStore (needs numpy) for vectorized re-scoring."""
+        from .metrics_store import MetricsStore
+        where, params = self._filters(genre, age)
+        store = MetricsStore()
+        with self._lock:
+            for row in self._conn.execute(f"SELECT id, genre, {', '.join(METRIC_NAMES)} FROM stories{where}", params):
+                store.add_scores(dict(zip(METRIC_NAMES, row[2:])), str(row[0]), row[1])
+        return store
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM stories").fetchone()[0]
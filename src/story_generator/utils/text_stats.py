@@ -0,0 +1,164 @@
+"""Single-pass text statistics shared by the local story checks.
+
+A story is tokenized once, either whole or chunk by chunk as it streams, and
+word count, long words, sentence and paragraph lengths, and a vocabulary
+histogram are all collected in that one pass. The length and complexity
+checks, the streaming safety check, and the pre-judge all read the same
+TextStats instead of re-splitting the text for each metric.
+"""
+
+import re
+import statistics
+import string
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Iterable, List, Tuple
+
+# Words longer than this (punctuation stripped) count as long/complex
+LONG_WORD_LENGTH = 8
+
+_TOKEN = re.compile(r"(\s*)(\S+)")
+_PUNCTUATION = string.punctuation + "“”‘’—–…"
+_CLOSERS = "\"')]}”’"
+_SENTENCE_ENDS = (".", "!", "?", "…")
+_VOWEL_GROUP = re.compile(r"[aeiouy]+")
+
+@lru_cache(maxsize=8192)
+def count_syllables(word: str) -> int:
+    """Estimate syllables by counting vowel groups."""
+    word = word.lower()
+    syllables = len(_VOWEL_GROUP.findall(word))
+    if word.endswith("e") and not word.endswith(("le", "ee")) and syllables > 1:
+        syllables -= 1
+    return max(1, syllables)
+
+@dataclass
+class TextStats:
+    words: int  # Whitespace-separated tokens, as str.split() counts them
+    long_words: int
+    paragraphs: int
+    syllables: int
+    sentence_lengths: List[int] = field(default_factory=list)  # Words per sentence
+    vocabulary: Counter = field(default_factory=Counter)  # Lowercased word -> occurrences
+
+    @classmethod
+    def from_text(cls, text: str) -> "TextStats":
+        builder = TextStatsBuilder()
+        builder.feed(text)
+        return builder.finish()
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[str]) -> "TextStats":
+        builder = TextStatsBuilder()
+        for chunk in chunks:
+            builder.feed(chunk)
+        return builder.finish()
+
+    @property
+    def sentences(self) -> int:
+        return len(self.sentence_lengths)
+
+    @property
+    def words_per_sentence(self) -> float:
+        words = sum(self.sentence_lengths)
+        return words / self.sentences if self.sentences else float(words)
+
+    @property
+    def sentence_length_stdev(self) -> float:
+        return statistics.pstdev(self.sentence_lengths) if len(self.sentence_lengths) > 1 else 0.0
+
+    @property
+    def long_word_ratio(self) -> float:
+        return self.long_words / self.words if self.words else 0.0
+
+    @property
+    def unique_words(self) -> int:
+        return len(self.vocabulary)
+
+    @property
+    def grade_level(self) -> float:
+        """Flesch-Kincaid grade level."""
+        words = sum(self.vocabulary.values())
+        if not words:
+            return 0.0
+        return 0.39 * self.words_per_sentence + 11.8 * self.syllables / words - 15.59
+
+class TextStatsBuilder:
+    """Accumulates TextStats from text fed in arbitrary chunks.
+
+    A token cut off at the end of a chunk is held back until the next chunk
+    (or finish()) shows where it ends.
+    """
+
+    def __init__(self):
+        self.words = 0
+        self.paragraphs = 0
+        self.sentence_lengths: List[int] = []
+        self._tokens: List[str] = []  # Lowercased words, counted into the vocabulary at the end
+        self._sentence = 0
+        self._in_paragraph = False
+        self._pending = ""
+
+    @property
+    def word_count(self) -> int:
+        """Words seen so far, including one still being streamed."""
+        return self.words + (1 if self._pending.strip() else 0)
+
+    def _add(self, matches: List[Tuple[str, str]]):
+        # Hot loop: attributes are kept in locals and written back once
+        words = self._tokens
+        sentence_lengths = self.sentence_lengths
+        sentence = self._sentence
+        in_paragraph = self._in_paragraph
+        paragraphs = self.paragraphs
+        for space, token in matches:
+            if "\n" in space and space.count("\n") >= 2:
+                if sentence:
+                    sentence_lengths.append(sentence)
+                    sentence = 0
+                in_paragraph = False
+            if not in_paragraph:
+                paragraphs += 1
+                in_paragraph = True
+            word = token.strip(_PUNCTUATION)
+            if word:
+                sentence += 1
+                words.append(word.lower())
+            if token.rstrip(_CLOSERS).endswith(_SENTENCE_ENDS) and sentence:
+                sentence_lengths.append(sentence)
+                sentence = 0
+        self.words += len(matches)
+        self._sentence = sentence
+        self._in_paragraph = in_paragraph
+        self.paragraphs = paragraphs
+
+    def feed(self, chunk: str):
+        text = self._pending + chunk
+        matches = _TOKEN.findall(text)
+        if not matches:
+            self._pending = text
+            return
+        # The last token may continue in the next chunk unless whitespace follows it
+        if text[-1].isspace():
+            self._pending = text[len(text.rstrip()):]
+        else:
+            space, token = matches.pop()
+            self._pending = space + token
+        self._add(matches)
+
+    def finish(self) -> TextStats:
+        self._add(_TOKEN.findall(self._pending))
+        self._pending = ""
+        if self._sentence:
+            self.sentence_lengths.append(self._sentence)
+            self._sentence = 0
+        vocabulary = Counter(self._tokens)
+        return TextStats(
+            words=self.words,
+            long_words=sum(count for word, count in vocabulary.items() if len(word) > LONG_WORD_LENGTH),
+            paragraphs=self.paragraphs,
+            syllables=sum(count * count_syllables(word) for word, count in vocabulary.items()),
+            sentence_lengths=self.sentence_lengths,
+            vocabulary=vocabulary
+        )
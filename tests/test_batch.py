@@ -0,0 +1,63 @@
+"""Tests for the batch output file doubling as a checkpoint."""
+
+import json
+import sys
+import pytest
+from src.story_generator import batch
+from src.story_generator.batch import _append_record, _trim_partial_line, load_completed_ids
+
+def test_unfinished_last_line_is_dropped_before_appending(tmp_path):
+    path = tmp_path / "stories.jsonl"
+    path.write_text('{"id": "a", "story": "Done."}\n{"id": "b", "story": "Once', encoding="utf-8")
+    _trim_partial_line(str(path))
+    with open(path, "a", encoding="utf-8") as f:
+        _append_record(f, {"id": "c", "story": "Also done."})
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ["a", "c"]
+    assert load_completed_ids(str(path)) == {"a", "c"}
+
+def test_complete_files_are_left_alone(tmp_path):
+    path = tmp_path / "stories.jsonl"
+    content = '{"id": "a"}\n{"id": "b"}\n'
+    path.write_text(content, encoding="utf-8")
+    _trim_partial_line(str(path))
+    assert path.read_text(encoding="utf-8") == content
+
+def test_single_unfinished_line_empties_the_file(tmp_path):
+    path = tmp_path / "stories.jsonl"
+    path.write_text('{"id": "a", "sto' + "x" * 10_000, encoding="utf-8")
+    _trim_partial_line(str(path))
+    assert path.read_text(encoding="utf-8") == ""
+
+def test_missing_file_is_fine(tmp_path):
+    _trim_partial_line(str(tmp_path / "missing.jsonl"))
+    assert load_completed_ids(str(tmp_path / "missing.jsonl")) == set()
+
+def test_stores_are_closed_when_the_batch_fails(tmp_path, monkeypatch):
+    closed = []
+
+    class TrackedLibrary(batch.PlanLibrary):
+        def close(self):
+            closed.append("plan_library")
+            super().close()
+
+    class TrackedIndex(batch.NearDuplicateIndex):
+        def close(self):
+            closed.append("dedup")
+            super().close()
+
+    async def failing_batch(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(batch, "PlanLibrary", TrackedLibrary)
+    monkeypatch.setattr(batch, "NearDuplicateIndex", TrackedIndex)
+    monkeypatch.setattr(batch, "run_batch", failing_batch)
+    monkeypatch.setattr(sys, "argv", [
+        "batch", str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"),
+        "--plan-library", str(tmp_path / "plans.db"),
+        "--archive", str(tmp_path / "archive.db"),
+        "--dedup", str(tmp_path / "dedup"),
+    ])
+    with pytest.raises(RuntimeError):
+        batch.main()
+    assert sorted(closed) == ["dedup", "plan_library"]
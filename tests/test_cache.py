@@ -0,0 +1,77 @@
+"""Tests for the in-memory, SQLite, and tiered response caches."""
+
+import asyncio
+import time
+from src.story_generator.utils.cache import LRUCache, SQLiteCache, TieredCache, make_cache_key
+
+def stored_bytes(cache: SQLiteCache) -> int:
+    return cache._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+def test_cache_key_covers_every_request_field():
+    key = make_cache_key("model", "system", "user", 0.2, 100)
+    assert key == make_cache_key("model", "system", "user", 0.2, 100)
+    assert key != make_cache_key("model", "system", "user", 0.3, 100)
+    assert key != make_cache_key("model", "system", "user", 0.2, 101)
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+
+def test_sqlite_cache_keeps_a_running_size_and_evicts_oldest(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), max_bytes=250)
+    cache.set("a", "x" * 100)
+    cache.set("b", "x" * 100)
+    cache.get("a")  # Recorded in memory, written before the next eviction
+    cache.set("c", "x" * 100)
+    assert cache.get("b") is None
+    assert cache.get("a") == cache.get("c") == "x" * 100
+    assert cache.total_bytes == stored_bytes(cache) == 200
+    # Replacing a value adjusts the total instead of adding to it
+    cache.set("c", "y" * 10)
+    assert cache.total_bytes == stored_bytes(cache) == 110
+    cache.close()
+
+def test_sqlite_cache_total_survives_reopening(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SQLiteCache(path)
+    cache.set("a", "hello")
+    cache.set("b", "world!")
+    cache.close()
+    cache = SQLiteCache(path)
+    assert cache.total_bytes == 11
+    assert cache.get("a") == "hello"
+    cache.close()
+
+def test_sqlite_cache_expires_old_entries(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=0.05)
+    cache.set("old", "value")
+    time.sleep(0.1)
+    assert cache.get("old") is None
+    cache.set("stale", "value")
+    time.sleep(0.1)
+    cache.set("new", "value")
+    assert cache.total_bytes == stored_bytes(cache) == 5
+    cache.close()
+
+def test_tiered_cache_promotes_disk_hits(tmp_path):
+    disk = SQLiteCache(str(tmp_path / "cache.sqlite3"))
+    disk.set("key", "value")
+    cache = TieredCache(LRUCache(), disk)
+
+    async def lookups():
+        first = await cache.aget("key")
+        second = await cache.aget("key")
+        missing = await cache.aget("other")
+        await cache.aset("other", "new")
+        return first, second, missing
+
+    assert asyncio.run(lookups()) == ("value", "value", None)
+    assert disk.get("other") == "new"
+    stats = cache.get_stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+    disk.close()
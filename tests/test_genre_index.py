@@ -0,0 +1,18 @@
+"""Tests for ranking genres from a story request."""
+
+from src.story_generator.utils.genre_index import DEFAULT_GENRE, GENRE_INDEX, MAX_PHRASE_WEIGHT
+
+def test_whole_words_and_plurals():
+    assert GENRE_INDEX.best_genre("two dragons and a wizard") == "FANTASY"
+    # "cat" is not matched inside "education"
+    assert GENRE_INDEX.classify("an education") == []
+
+def test_nothing_matching_falls_back_to_the_default():
+    assert GENRE_INDEX.best_genre("zzz") == DEFAULT_GENRE
+
+def test_long_phrases_are_capped():
+    top = GENRE_INDEX.classify("once upon a time", limit=1)[0]
+    assert top.key == "CLASSIC_FAIRY_TALE"
+    assert top.score == MAX_PHRASE_WEIGHT
+    # Two plain keyword hits outweigh one long phrase
+    assert GENRE_INDEX.best_genre("once upon a time a dog lived on a farm") == "ANIMAL_STORIES"
@@ -0,0 +1,25 @@
+"""Tests for turning judge responses into metrics."""
+
+import json
+from src.story_generator.benchmarks import fixtures
+from src.story_generator.benchmarks.mock_llm import LatencyModel, MockLLM, MockOpenAI
+from src.story_generator.core.judge import StoryJudge
+from src.story_generator.utils import llm_utils
+
+class ExtraScoreLLM(MockLLM):
+    """Judge that also scores a metric nobody asked for."""
+
+    def _pick_response(self, messages, rng):
+        judge = json.loads(fixtures.JUDGE_RESPONSE)
+        judge["scores"]["humor"] = 0.9
+        return json.dumps(judge)
+
+def test_extra_score_keys_are_ignored_without_a_repair_call(monkeypatch):
+    monkeypatch.setattr(llm_utils, "_response_cache", None)
+    llm = ExtraScoreLLM(LatencyModel(median_seconds=0.0, seconds_per_token=0.0))
+    judge = StoryJudge(client=MockOpenAI(llm))
+    metrics, feedback, judgment = judge.evaluate_story(fixtures.STORY, 6, genre="ANIMAL_STORIES")
+    assert llm.stats["calls"] == 1
+    assert "humor" not in metrics.as_dict()
+    assert metrics.plot_structure == fixtures.JUDGE["scores"]["plot_structure"]
+    assert judgment == fixtures.JUDGE["judgment"]
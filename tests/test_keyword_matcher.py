@@ -0,0 +1,82 @@
+"""Tests for the forbidden-topic keyword matcher."""
+
+import pytest
+from src.story_generator.config.content_filter import FORBIDDEN_TOPICS
+from src.story_generator.utils.keyword_matcher import FORBIDDEN_MATCHER, KeywordMatcher
+
+def baseline_flags(text: str) -> bool:
+    """The original substring check the matcher replaced (stems without their marker)."""
+    text = text.lower()
+    return any(keyword.rstrip("*") in text for info in FORBIDDEN_TOPICS.values() for keyword in info["keywords"])
+
+# Stories the substring check caught; whole-word matching must still catch them
+BASELINE_POSITIVES = [
+    "The knight killed the dragon.",
+    "He murdered them in their sleep.",
+    "The killing went on all night.",
+    "A killer was loose in the village.",
+    "She kept a gun under the bed.",
+    "Two guns were on the table.",
+    "The blade of the knife was bloody.",
+    "The pirates drew their knives.",
+    "A ghostly light filled the hall.",
+    "Ghosts lived in the attic.",
+    "The monstrous wave came closer.",
+    "His friends were mean to him.",
+    "The meanest boy in class laughed.",
+    "The witch was cruelly punished.",
+    "They were fighting in the yard.",
+    "Grandpa was smoking on the porch.",
+]
+
+@pytest.mark.parametrize("text", BASELINE_POSITIVES)
+def test_baseline_positives_are_still_caught(text):
+    assert baseline_flags(text)
+    assert FORBIDDEN_MATCHER.search(text)
+
+# Forms the substring check caught that plain whole-word matching let through
+@pytest.mark.parametrize("word", [
+    "terrorized", "bloodshed", "bloodthirsty", "gunpoint", "gunman", "knifepoint",
+    "weaponized", "sexually", "cruelest", "meanness", "bloodier",
+])
+def test_stems_and_inflections_are_caught(word):
+    text = f"The story mentioned something {word} near the end."
+    assert baseline_flags(text)
+    matches = FORBIDDEN_MATCHER.find_all(text)
+    assert [text[match.start:match.end] for match in matches] == [word]
+
+@pytest.mark.parametrize("text", [
+    "She had a special skill for painting.",
+    "The bloodhound followed the trail home.",
+    "The sailor checked his sextant.",
+    "Grandma weeded the garden.",
+    "He wondered about the meaning of the word.",
+    "The gunnysack was full of apples.",
+    "Everyone cheered for the demonstration.",
+])
+def test_words_containing_keywords_are_not_flagged(text):
+    assert not FORBIDDEN_MATCHER.search(text)
+
+def test_find_all_reports_topic_and_offsets():
+    text = "A Ghost and two weapons."
+    matches = FORBIDDEN_MATCHER.find_all(text)
+    assert [(match.keyword, match.topic) for match in matches] == [
+        ("ghost", "SCARY_CONTENT"), ("weapon", "VIOLENCE")
+    ]
+    assert text[matches[0].start:matches[0].end] == "Ghost"
+    assert text[matches[1].start:matches[1].end] == "weapons"
+
+def test_overlapping_keywords_are_all_found():
+    matcher = KeywordMatcher([("love", "A"), ("love story", "B"), ("story", "C")])
+    found = [match.keyword for match in matcher.find_all("a love story")]
+    assert found == ["love", "love story", "story"]
+
+def test_suffixes_can_be_disabled():
+    matcher = KeywordMatcher([("ghost", "SCARY")], suffixes=())
+    assert matcher.search("a ghost")
+    assert not matcher.search("two ghosts")
+
+def test_stem_keywords_match_compounds_unless_allowed():
+    matcher = KeywordMatcher([("sun*", "A"), ("moon", "B")], allowed_words=["sunday"])
+    assert [match.keyword for match in matcher.find_all("Sunshine, moons and moonlight")] == ["sun", "moon"]
+    assert not matcher.search("See you on Sunday")
@@ -0,0 +1,57 @@
+"""Tests for the near-duplicate request index."""
+
+import os
+import uuid
+from src.story_generator.utils.near_duplicates import NearDuplicateIndex
+
+def story_id() -> str:
+    return uuid.uuid4().hex
+
+def test_exact_and_reworded_requests_are_found(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path))
+    approved = story_id()
+    index.add("a dragon who is afraid of the dark", 6, approved)
+    match = index.lookup("A dragon who is afraid of the dark!", 5)
+    assert match.story_id == approved and match.similarity >= index.serve_threshold
+    # Same request, different age band
+    assert index.find("a dragon who is afraid of the dark", 9) == []
+    index.close()
+
+def test_requests_differing_in_a_key_word_are_not_seeds(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path))
+    index.add("a cat who loves to swim in the lake", 7, story_id())
+    index.add("a dragon who is afraid of the dark", 7, story_id())
+    assert index.find("a dog who loves to swim in the lake", 7) == []
+    assert index.find("a dragon who is not afraid of the dark", 7) == []
+    index.close()
+
+def test_entries_survive_reopening_and_compaction(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path))
+    first, second = story_id(), story_id()
+    index.add("a bunny who learns to count", 5, first)
+    index.compact()
+    index.add("a robot who plants a garden", 8, second)
+    index.close()
+
+    index = NearDuplicateIndex(str(tmp_path))
+    assert len(index) == 2
+    assert index.find("a bunny who learns to count", 5)[0].story_id == first
+    assert index.find("a robot who plants a garden", 8)[0].story_id == second
+    index.close()
+
+def test_torn_record_is_dropped_on_open(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path))
+    index.add("a bunny who learns to count", 5, story_id())
+    index.close()
+    with open(os.path.join(tmp_path, "signatures.bin"), "ab") as f:
+        f.write(b"\x01\x02")  # A crash partway through writing the next record
+
+    index = NearDuplicateIndex(str(tmp_path))
+    added = story_id()
+    index.add("a robot who plants a garden", 8, added)
+    index.close()
+
+    index = NearDuplicateIndex(str(tmp_path))
+    assert len(index) == 2
+    assert index.find("a robot who plants a garden", 8)[0].story_id == added
+    index.close()
@@ -0,0 +1,28 @@
+"""Tests for the asynchronous story pipeline."""
+
+import asyncio
+from src.story_generator.benchmarks.mock_llm import LatencyModel, MockAsyncOpenAI, MockLLM
+from src.story_generator.core.pipeline import StoryPipeline, StoryRequest
+from src.story_generator.utils import llm_utils
+from src.story_generator.utils.near_duplicates import NearDuplicateIndex
+from src.story_generator.utils.story_archive import StoryArchive
+
+def test_repeated_request_is_served_from_the_archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_utils, "_response_cache", None)
+    llm = MockLLM(LatencyModel(median_seconds=0.0, seconds_per_token=0.0))
+    archive = StoryArchive(str(tmp_path / "archive.db"))
+    dedup = NearDuplicateIndex(str(tmp_path / "dedup"))
+    pipeline = StoryPipeline(MockAsyncOpenAI(llm), archive=archive, dedup=dedup)
+    request = StoryRequest("a dragon who is afraid of the dark", 6)
+
+    first = asyncio.run(pipeline.run(request))
+    assert first.judgment == "APPROVED" and first.duplicate_of is None
+    archive.flush()
+    calls = llm.stats["calls"]
+
+    second = asyncio.run(pipeline.run(request))
+    assert second.duplicate_of is not None
+    assert second.story == first.story
+    assert llm.stats["calls"] == calls
+    archive.close()
+    dedup.close()
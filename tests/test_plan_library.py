@@ -0,0 +1,48 @@
+"""Tests for the persistent plan library."""
+
+import asyncio
+import copy
+from src.story_generator.benchmarks import fixtures
+from src.story_generator.benchmarks.mock_llm import LatencyModel, MockAsyncOpenAI, MockLLM
+from src.story_generator.core.planner import AsyncStoryPlanner, validate_plan
+from src.story_generator.utils.plan_library import PlanLibrary, normalize_request
+
+def test_requests_are_keyed_by_their_meaningful_words():
+    assert normalize_request("Please tell me a story about a Dragon!") == "dragon"
+    library = PlanLibrary()
+    assert library.key("a dragon", 6, "fantasy") == library.key("The dragon", 6, "FANTASY")
+    library.close()
+
+def test_variants_are_served_in_rotation_once_all_are_planned():
+    library = PlanLibrary(variants_per_key=2, validator=validate_plan)
+    first, second = copy.deepcopy(fixtures.PLAN), copy.deepcopy(fixtures.PLAN)
+    second["title"] = "Another title"
+    assert library.add("a dragon", 6, first)
+    assert library.get("a dragon", 6) is None  # Still collecting variants
+    assert library.add("a dragon", 6, second)
+    served = [library.get("a dragon", 6)["title"] for _ in range(3)]
+    assert served == [first["title"], second["title"], first["title"]]
+    library.close()
+
+def test_invalid_plans_are_not_stored():
+    library = PlanLibrary(validator=validate_plan)
+    plan = copy.deepcopy(fixtures.PLAN)
+    plan["engagement_elements"] = []
+    assert not library.add("a dragon", 6, plan)
+    assert not library.add("a dragon", 6, {"title": "No outline"})
+    assert library.stats["rejected"] == 2
+    library.close()
+
+def test_async_planner_serves_stored_plans_from_a_worker_thread():
+    llm = MockLLM(LatencyModel(median_seconds=0.0, seconds_per_token=0.0))
+    library = PlanLibrary(variants_per_key=1, validator=validate_plan)
+    planner = AsyncStoryPlanner(client=MockAsyncOpenAI(llm), library=library)
+
+    async def plan_twice():
+        return await planner.create_outline("a dragon", 6), await planner.create_outline("the dragon", 6)
+
+    first, second = asyncio.run(plan_twice())
+    assert first == second == fixtures.PLAN
+    assert llm.stats["calls"] == 1
+    assert library.stats["hits"] == 1
+    library.close()
@@ -0,0 +1,39 @@
+"""Tests for the local pre-judge's decisions."""
+
+from src.story_generator.benchmarks import fixtures
+from src.story_generator.core.prejudge import ACCEPT, REJECT, PreJudge, PreJudgment
+
+def test_forbidden_content_is_rejected_without_the_judge():
+    prejudge = PreJudge()
+    judgment = prejudge.assess(fixtures.UNSAFE_STORY, 7)
+    assert judgment.decision == REJECT
+    assert judgment.estimates["emotional_safety"] < 0.5
+    assert prejudge.skips_judge(judgment)
+
+def test_accept_never_skips_the_judge_without_a_safety_estimate():
+    judgment = PreJudgment(ACCEPT, {"age_appropriate_vocabulary": 0.95, "plot_structure": 0.95})
+    assert "emotional_safety" in judgment.unestimated()
+    assert not PreJudge(trust_accepts=True).skips_judge(judgment)
+
+def test_trusted_accept_with_every_required_estimate_skips_the_judge():
+    judgment = PreJudgment(ACCEPT, {"emotional_safety": 0.97, "plot_structure": 0.95})
+    assert PreJudge(trust_accepts=True).skips_judge(judgment)
+    assert not PreJudge().skips_judge(judgment)
+
+def test_unestimated_metrics_are_filled_at_their_threshold():
+    judgment = PreJudgment(REJECT, {"plot_structure": 0.2})
+    scores = judgment.scores()
+    assert scores["plot_structure"] == 0.2
+    assert set(judgment.unestimated()) == set(scores) - {"plot_structure"}
+
+def test_calm_story_gets_a_safety_estimate_and_a_trusted_accept():
+    judgment = PreJudge().assess(fixtures.STORY, 6)
+    assert judgment.decision == ACCEPT
+    assert "emotional_safety" not in judgment.unestimated()
+    assert PreJudge(trust_accepts=True).skips_judge(judgment)
+
+def test_upsetting_paragraph_lowers_the_safety_estimate():
+    judgment = PreJudge().assess(fixtures.DISTRESSING_STORY, 6)
+    assert judgment.estimates["emotional_safety"] < 0.75
+    assert judgment.decision == REJECT
+    assert any("terrified" in line for line in judgment.feedback)
@@ -0,0 +1,54 @@
+"""Tests for token-aware prompt assembly."""
+
+from src.story_generator.utils import prompt_builder
+from src.story_generator.utils.prompt_builder import TOKEN_SAVINGS, PromptSection, assemble_prompt
+
+def test_optional_sections_are_dropped_lowest_priority_first():
+    sections = [
+        PromptSection("story", "word " * 10),
+        PromptSection("themes", "word " * 10, required=False, priority=1),
+        PromptSection("guidelines", "word " * 10, required=False, priority=2),
+    ]
+    prompt = assemble_prompt("PREFIX", sections, budget=25)
+    assert prompt.count("word") == 20
+    assert prompt.startswith("PREFIX")
+
+def test_baselines_are_only_built_while_savings_are_tracked(monkeypatch):
+    built = []
+
+    def baseline():
+        built.append(True)
+        return "old rendering " * 5
+
+    section = PromptSection("plan", "new", baseline=baseline)
+    monkeypatch.setattr(TOKEN_SAVINGS, "enabled", False)
+    assemble_prompt("PREFIX", [section], kind="test")
+    assert built == []
+
+    monkeypatch.setattr(TOKEN_SAVINGS, "enabled", True)
+    TOKEN_SAVINGS.reset()
+    assemble_prompt("PREFIX", [section], kind="test")
+    report = TOKEN_SAVINGS.report()["test.plan"]
+    assert built == [True]
+    assert report["baseline"] > report["actual"] and report["saved"] > 0
+    TOKEN_SAVINGS.reset()
+
+def test_prefix_tokens_are_counted_once(monkeypatch):
+    prompt_builder._prefix_tokens.cache_clear()
+    counted = []
+    real_count = prompt_builder.count_tokens
+
+    def counting(text):
+        counted.append(text)
+        return real_count(text)
+
+    monkeypatch.setattr(prompt_builder, "count_tokens", counting)
+    for _ in range(3):
+        assemble_prompt("STATIC PREFIX", [PromptSection("story", "text")])
+    assert counted.count("STATIC PREFIX") == 1
+    prompt_builder._prefix_tokens.cache_clear()
+
+def test_token_count_falls_back_to_words_and_punctuation(monkeypatch):
+    monkeypatch.setattr(prompt_builder, "tiktoken", None)
+    assert prompt_builder.count_tokens("Once upon a time, Pip slept.") == 8
+    assert prompt_builder.count_tokens("") == 0
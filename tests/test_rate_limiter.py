@@ -0,0 +1,135 @@
+"""Tests for the token buckets, priority queue, and retry scheduling of LLM calls."""
+
+import asyncio
+import pytest
+from src.story_generator.utils.instrumentation import llm_context
+from src.story_generator.utils.rate_limiter import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    RateLimitScheduler,
+    RetryableError,
+    RetryPolicy,
+    TokenBucket,
+    is_retryable,
+    retry_after
+)
+
+class FakeResponse:
+    def __init__(self, status_code: int, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code: int, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = FakeResponse(status_code, headers)
+
+NO_WAIT = RetryPolicy(max_attempts=3, base_delay=0.0, max_delay=0.0)
+
+def scheduler(requests_per_minute=600, tokens_per_minute=60_000, policy=NO_WAIT) -> RateLimitScheduler:
+    limiter = RateLimitScheduler(policy)
+    limiter.set_rate_limits("test-model", requests_per_minute, tokens_per_minute)
+    return limiter
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(per_minute=60)
+    now = bucket.updated
+    assert bucket.wait_time(60, now) == 0.0
+    bucket.take(60)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 1.0) == 0.0
+    # Requests larger than the bucket wait for a full bucket instead of forever
+    assert bucket.wait_time(1000, now + 1.0) == pytest.approx(59.0)
+
+def test_token_bucket_refund_is_capped():
+    bucket = TokenBucket(per_minute=10)
+    bucket.give(100)
+    assert bucket.tokens == 10
+
+def test_settle_refunds_unused_tokens():
+    limiter = scheduler(tokens_per_minute=1000)
+    reservation = limiter.acquire("test-model", 800)
+    limiter.settle(reservation, 300)
+    assert limiter._budget("test-model").tokens.tokens == pytest.approx(700, abs=1)
+
+def test_retry_classification():
+    assert is_retryable(FakeAPIError(429))
+    assert is_retryable(FakeAPIError(503))
+    assert is_retryable(RetryableError())
+    assert not is_retryable(FakeAPIError(400))
+    assert not is_retryable(ValueError())
+    assert retry_after(FakeAPIError(429, {"retry-after": "2"})) == 2.0
+    assert retry_after(FakeAPIError(429, {"retry-after-ms": "250"})) == 0.25
+    assert retry_after(FakeAPIError(429, {"retry-after": "Wed, 21 Oct 2026 07:28:00 GMT"})) is None
+
+def test_call_retries_retryable_failures():
+    limiter = scheduler()
+    attempts = []
+
+    def request():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise FakeAPIError(503)
+        return "ok"
+
+    response, _ = limiter.call("test-model", 10, request)
+    assert response == "ok"
+    assert len(attempts) == 3
+
+def test_call_gives_up_on_client_errors_and_after_max_attempts():
+    limiter = scheduler()
+    with pytest.raises(FakeAPIError):
+        limiter.call("test-model", 10, lambda: (_ for _ in ()).throw(FakeAPIError(400)))
+    attempts = []
+
+    def always_busy():
+        attempts.append(1)
+        raise FakeAPIError(503)
+
+    with pytest.raises(FakeAPIError):
+        limiter.call("test-model", 10, always_busy)
+    assert len(attempts) == NO_WAIT.max_attempts
+
+def test_rate_limit_pauses_every_caller():
+    limiter = scheduler()
+    delay = limiter.retry_delay("test-model", 0, FakeAPIError(429, {"retry-after": "5"}))
+    assert 5.0 <= delay <= 6.0
+    assert limiter._budget("test-model").paused_until > 0
+
+def test_interactive_calls_are_admitted_before_batch():
+    # Ten requests a second, with the bucket emptied so both callers have to queue
+    limiter = scheduler(requests_per_minute=600)
+    order = []
+
+    async def call(name, priority):
+        with llm_context(priority=priority):
+            await limiter.async_acquire("test-model", 1)
+        order.append(name)
+
+    async def main():
+        await limiter.async_acquire("test-model", 1)
+        limiter._budget("test-model").requests.tokens = 0.0
+        batch = asyncio.create_task(call("batch", PRIORITY_BATCH))
+        await asyncio.sleep(0.01)
+        interactive = asyncio.create_task(call("interactive", PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0.01)
+        assert limiter.queue_depth("test-model") == {PRIORITY_INTERACTIVE: 1, PRIORITY_BATCH: 1}
+        await asyncio.gather(batch, interactive)
+
+    asyncio.run(main())
+    assert order == ["interactive", "batch"]
+
+def test_cancelled_waiter_leaves_the_queue():
+    limiter = scheduler(requests_per_minute=1)
+
+    async def main():
+        await limiter.async_acquire("test-model", 1)
+        waiting = asyncio.create_task(limiter.async_acquire("test-model", 1))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+    asyncio.run(main())
+    assert limiter.queue_depth("test-model") == {PRIORITY_INTERACTIVE: 0, PRIORITY_BATCH: 0}
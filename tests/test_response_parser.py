@@ -0,0 +1,55 @@
+"""Tests for local parsing and repair of model JSON output."""
+
+import json
+import pytest
+from src.story_generator.utils.response_parser import (
+    ResponseParseError,
+    extract_json,
+    parse_json_response,
+    repair_json,
+    validate_schema
+)
+
+@pytest.mark.parametrize("broken, expected", [
+    ("{'title': 'Milo', 'age': 5}", {"title": "Milo", "age": 5}),
+    ('{title: "Milo", ready: True, note: None}', {"title": "Milo", "ready": True, "note": None}),
+    ('{"items": [1, 2, 3,], "done": false,}', {"items": [1, 2, 3], "done": False}),
+    ('{"a": 1, // a comment\n "b": /* inline */ 2}', {"a": 1, "b": 2}),
+    ("{'text': 'She said \"hi\"'}", {"text": 'She said "hi"'}),
+    ("{'text': 'it\\'s late'}", {"text": "it's late"}),
+    ("{'text': 'line one\nline two'}", {"text": "line one\nline two"}),
+])
+def test_repair_json_fixes_near_json(broken, expected):
+    assert json.loads(repair_json(broken)) == expected
+
+@pytest.mark.parametrize("truncated, expected", [
+    ('{"scores": {"clarity": 0.9, "fun": 0.8', {"scores": {"clarity": 0.9, "fun": 0.8}}),
+    ('{"feedback": ["good", "short"', {"feedback": ["good", "short"]}),
+    ('{"feedback": ["good",', {"feedback": ["good"]}),
+    ('{"title": "Milo', {"title": "Milo"}),
+])
+def test_repair_json_closes_truncated_output(truncated, expected):
+    assert json.loads(repair_json(truncated)) == expected
+
+def test_repair_json_leaves_valid_json_unchanged():
+    text = '{"a": [1, {"b": "c, d"}], "e": null}'
+    assert json.loads(repair_json(text)) == json.loads(text)
+
+def test_extract_json_drops_fences_and_prose():
+    response = 'Here you go:\n```json\n{"a": {"b": "}"}}\n```\nEnjoy!'
+    assert extract_json(response) == '{"a": {"b": "}"}}'
+
+def test_extract_json_without_object_raises():
+    with pytest.raises(ResponseParseError):
+        extract_json("no json here")
+
+def test_parse_json_response_repairs_and_validates():
+    schema = {"scores": {"fun": float}, "feedback": [str]}
+    result = parse_json_response("```\n{scores: {fun: 0.7}, feedback: ['more jokes',]}\n```", schema)
+    assert result == {"scores": {"fun": 0.7}, "feedback": ["more jokes"]}
+
+def test_validate_schema_reports_the_failing_path():
+    with pytest.raises(ResponseParseError, match=r"response\.scores\.fun has the wrong type"):
+        validate_schema({"scores": {"fun": "high"}}, {"scores": {"fun": float}})
+    with pytest.raises(ResponseParseError, match="wrong type"):
+        validate_schema({"count": True}, {"count": int})
@@ -0,0 +1,30 @@
+"""Tests for splicing paragraph edits into a judged story."""
+
+from src.story_generator.core.generator import StoryGenerator, split_paragraphs
+
+STORY = "Milo the bunny hopped home.\n\nThe moon was bright.\n\nHe fell asleep."
+
+def apply(edits, age=7):
+    generator = StoryGenerator(client=object())
+    return generator._apply_patch(split_paragraphs(STORY), edits, age)
+
+def test_edited_paragraphs_replace_the_originals():
+    story = apply([{"paragraph": 2, "text": "  The moon smiled down at him.  "}])
+    assert story == "Milo the bunny hopped home.\n\nThe moon smiled down at him.\n\nHe fell asleep."
+
+def test_later_edit_of_the_same_paragraph_wins():
+    story = apply([{"paragraph": 3, "text": "He yawned."}, {"paragraph": 3, "text": "He slept."}])
+    assert split_paragraphs(story)[2] == "He slept."
+
+def test_out_of_range_or_empty_edits_are_rejected():
+    assert apply([{"paragraph": 0, "text": "Hi."}]) is None
+    assert apply([{"paragraph": 4, "text": "Hi."}]) is None
+    assert apply([{"paragraph": 1, "text": "   "}]) is None
+    assert apply([]) is None
+
+def test_unsafe_edits_are_rejected():
+    assert apply([{"paragraph": 2, "text": "A ghost killed the moon."}]) is None
+
+def test_edits_that_make_the_story_too_hard_are_rejected():
+    hard = "Extraordinarily magnificent constellations illuminated everything."
+    assert apply([{"paragraph": 2, "text": hard}], age=5) is None
@@ -0,0 +1,65 @@
+"""Tests for the SQLite story archive and its background writer."""
+
+from src.story_generator.config.metrics import METRIC_NAMES, StoryMetrics, weight_table
+from src.story_generator.utils.story_archive import ArchiveRecord, StoryArchive
+
+def make_metrics(value: float = 0.8, **overrides) -> StoryMetrics:
+    return StoryMetrics(**{metric: overrides.get(metric, value) for metric in METRIC_NAMES})
+
+def make_record(**fields) -> ArchiveRecord:
+    return ArchiveRecord(**{"request": "a brave bunny", "age": 7, "story": "Once upon a time.",
+                            "metrics": make_metrics(), **fields})
+
+def test_queued_stories_are_written_on_close(tmp_path):
+    path = str(tmp_path / "archive.db")
+    archive = StoryArchive(path, flush_interval=60)
+    archive.record(make_record(story_id="a"))
+    archive.close()
+    archive = StoryArchive(path)
+    assert len(archive) == 1
+    assert archive.find("a")["request"] == "a brave bunny"
+    archive.close()
+
+def test_find_is_empty_until_the_story_is_written(tmp_path):
+    archive = StoryArchive(str(tmp_path / "archive.db"), flush_interval=0.5)
+    archive.record(make_record(story_id="a"))
+    assert archive.find("a") is None
+    archive.flush()
+    assert archive.find("a")["story_id"] == "a"
+    archive.close()
+
+def test_each_revision_gets_a_score_row(tmp_path):
+    archive = StoryArchive(str(tmp_path / "archive.db"), flush_interval=0.05)
+    drafts = [make_metrics(0.5), make_metrics(0.7), make_metrics(0.9)]
+    archive.record(make_record(story_id="a", metrics=drafts[-1], revision_metrics=drafts))
+    archive.flush()
+    row = archive.find("a")
+    assert row["revisions"] == 2
+    assert [scores["plot_structure"] for scores in row["revision_scores"]] == [0.5, 0.7, 0.9]
+    archive.close()
+
+def test_recording_does_not_rescore_the_callers_metrics(tmp_path):
+    metrics = make_metrics()
+    record = make_record(metrics=metrics, genre="FANTASY")
+    record.row()
+    assert metrics.weights is weight_table(None)
+
+def test_rescore_uses_each_storys_genre_by_default(tmp_path):
+    archive = StoryArchive(str(tmp_path / "archive.db"), flush_interval=0.05)
+    # Each story is strong where its own genre's weights are high
+    archive.record(make_record(story_id="fantasy", genre="FANTASY", metrics=make_metrics(0.5, imagination=1.0)))
+    archive.record(make_record(story_id="mystery", genre="MYSTERY", metrics=make_metrics(0.5, cognitive_elements=1.0)))
+    archive.record(make_record(story_id="none", metrics=make_metrics(0.5, imagination=1.0)))
+    archive.flush()
+
+    stored = {row["id"]: row["overall_score"] for row in archive.top_stories(k=10)}
+    rescored = {row["id"]: row["score"] for row in archive.rescore(k=10)}
+    assert rescored.keys() == stored.keys()
+    for story, score in rescored.items():
+        assert abs(score - stored[story]) < 1e-9
+
+    only_fantasy = archive.rescore(genre="fantasy")
+    assert [row["genre"] for row in only_fantasy] == ["FANTASY"]
+    by_imagination = archive.rescore({"imagination": 1.0}, k=10)
+    assert [row["score"] for row in by_imagination] == [1.0, 1.0, 0.5]
+    archive.close()
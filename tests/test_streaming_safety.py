@@ -0,0 +1,66 @@
+"""Tests for the incremental keyword scanner and the streaming safety check."""
+
+import pytest
+from src.story_generator.core.generator import StoryGenerator, StreamingSafetyCheck
+from src.story_generator.utils.keyword_matcher import FORBIDDEN_MATCHER, KeywordScanner
+
+def chunks(text: str, size: int):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def scan(text: str, size: int):
+    scanner = KeywordScanner(FORBIDDEN_MATCHER)
+    matches = []
+    for chunk in chunks(text, size):
+        matches.extend(scanner.feed(chunk))
+    matches.extend(scanner.finish())
+    return sorted(matches, key=lambda match: (match.start, match.end))
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_chunked_scan_matches_whole_text(size):
+    text = "The ghosts came out. A skill, a knife, and two guns! Then the killer ran to the gunpoint"
+    assert scan(text, size) == FORBIDDEN_MATCHER.find_all(text)
+
+def test_match_waits_for_its_word_boundary():
+    scanner = KeywordScanner(FORBIDDEN_MATCHER)
+    assert scanner.feed("a gun") == []
+    # "gunnysack" is allowed; the pending match is dropped once the word ends
+    assert scanner.feed("nysack of apples") == []
+    assert scanner.finish() == []
+
+def test_long_inflection_is_confirmed_when_its_word_ends():
+    scanner = KeywordScanner(FORBIDDEN_MATCHER)
+    assert scanner.feed("such mean") == []
+    assert scanner.feed("nes") == []
+    assert scanner.safe_offset <= len("such ")
+    assert [match.keyword for match in scanner.feed("s.")] == ["mean"]
+
+def test_safe_offset_never_splits_a_possible_keyword():
+    scanner = KeywordScanner(FORBIDDEN_MATCHER)
+    scanner.feed("Once upon a time a gho")
+    assert scanner.text[:scanner.safe_offset] == "Once upon a time a "
+    scanner.feed("st")
+    assert scanner.safe_offset <= scanner.text.index("ghost")
+    assert [match.keyword for match in scanner.feed(" appeared")] == ["ghost"]
+
+def stream(text: str, size: int, age: int = 8):
+    check = StreamingSafetyCheck(StoryGenerator(client=object()), age)
+    released = "".join(check.feed(chunk) for chunk in chunks(text, size))
+    released += check.finish()
+    return check, released
+
+def test_safe_story_is_released_in_full():
+    text = "Milo the bunny hopped home.\n\nHe hugged his mother and fell asleep."
+    check, released = stream(text, 4)
+    assert not check.violation
+    assert released == text
+
+def test_forbidden_word_stops_the_release_before_it():
+    text = "Milo hopped along the path. Then he found a knife in the grass and more words after it."
+    check, released = stream(text, 5)
+    assert "knife" in check.violation
+    assert "knife" not in released
+    assert text.startswith(released)
+
+def test_overlong_story_is_caught_mid_stream():
+    check, _ = stream("word " * 600, 50, age=5)
+    assert check.violation.startswith("Story is too long for age 5")
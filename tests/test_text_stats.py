@@ -0,0 +1,56 @@
+"""Tests for the single-pass text statistics."""
+
+import pytest
+from src.story_generator.utils.text_stats import TextStats, TextStatsBuilder, count_syllables
+
+STORY = (
+    "Milo the bunny hopped home. He was very, very sleepy!\n\n"
+    "\"Goodnight,\" whispered his mother. Extraordinary adventures awaited tomorrow…\n\n"
+    "The end"
+)
+
+def test_counts_match_the_simple_splits():
+    stats = TextStats.from_text(STORY)
+    assert stats.words == len(STORY.split())
+    assert stats.paragraphs == 3
+    assert stats.sentence_lengths == [5, 5, 4, 4, 2]
+    assert stats.long_words == 4  # Longer than eight letters: goodnight, whispered, extraordinary, adventures
+    assert stats.vocabulary["very"] == 2
+    assert stats.vocabulary["goodnight"] == 1
+
+@pytest.mark.parametrize("size", [1, 2, 5, 13, 10_000])
+def test_chunked_stats_equal_whole_text_stats(size):
+    chunks = [STORY[i:i + size] for i in range(0, len(STORY), size)]
+    assert TextStats.from_chunks(chunks) == TextStats.from_text(STORY)
+
+def test_word_count_includes_the_word_being_streamed():
+    builder = TextStatsBuilder()
+    builder.feed("Once upon a ti")
+    assert builder.word_count == 4
+    builder.feed("me ")
+    assert builder.word_count == 4
+    assert builder.finish().words == 4
+
+def test_empty_text():
+    stats = TextStats.from_text("")
+    assert (stats.words, stats.paragraphs, stats.sentences) == (0, 0, 0)
+    assert stats.long_word_ratio == 0.0
+    assert stats.grade_level == 0.0
+
+def test_text_without_a_final_stop_is_one_sentence():
+    stats = TextStats.from_text("the cat sat on the mat")
+    assert stats.sentence_lengths == [6]
+    assert stats.words_per_sentence == 6.0
+
+@pytest.mark.parametrize("word, syllables", [
+    ("cat", 1), ("bunny", 2), ("little", 2), ("make", 1), ("tree", 1), ("adventure", 3), ("rhythm", 1)
+])
+def test_count_syllables(word, syllables):
+    assert count_syllables(word) == syllables
+
+def test_grade_level_rises_with_harder_text():
+    easy = TextStats.from_text("The cat sat. The dog ran. We had fun.")
+    hard = TextStats.from_text(
+        "Extraordinary circumstances necessitated considerable deliberation among the participants."
+    )
+    assert easy.grade_level < hard.grade_level
@@ -0,0 +1,35 @@
+"""Tests for the precompiled genre weight registry."""
+
+import math
+from src.story_generator.config import metrics
+from src.story_generator.config.metrics import METRIC_NAMES, StoryMetrics, weight_table
+
+def test_every_genre_table_sums_to_one():
+    for genre, table in metrics.WEIGHT_REGISTRY.items():
+        assert math.isclose(sum(table.vector), 1.0), genre
+        assert table.vector == tuple(table.weights[metric] for metric in METRIC_NAMES)
+
+def test_unknown_genres_get_the_base_weights():
+    assert weight_table("not a genre") is weight_table(None)
+    assert weight_table("fantasy") is metrics.WEIGHT_REGISTRY["FANTASY"]
+
+def test_metrics_score_with_their_genre_weights():
+    scores = StoryMetrics(**{metric: 0.5 for metric in METRIC_NAMES})
+    scores.imagination = 1.0
+    fantasy = scores.scored_for("FANTASY").overall_score
+    plain = scores.scored_for(None).overall_score
+    assert fantasy > plain
+
+def test_weights_are_reloaded_only_after_the_file_changes(monkeypatch):
+    monkeypatch.setattr(metrics, "WEIGHT_REGISTRY", metrics.WEIGHT_REGISTRY)
+    monkeypatch.setattr(metrics, "BASE_METRIC_WEIGHTS", metrics.BASE_METRIC_WEIGHTS)
+    monkeypatch.setattr(metrics, "GENRE_METRIC_ADJUSTMENTS", metrics.GENRE_METRIC_ADJUSTMENTS)
+    monkeypatch.setattr(metrics, "_weights_mtime", metrics._weights_mtime)
+    assert not metrics.reload_weights_if_changed()
+
+    before = metrics.WEIGHT_REGISTRY
+    metrics._weights_mtime -= 1  # As if the file had been edited since it was read
+    assert metrics.reload_weights_if_changed()
+    assert metrics.WEIGHT_REGISTRY is not before
+    assert metrics.WEIGHT_REGISTRY["FANTASY"] == before["FANTASY"]
+    assert not metrics.reload_weights_if_changed()